@@ -0,0 +1,197 @@
+import gzip
+import io
+import itertools
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    from .storage import create_storage
+except ImportError:
+    from storage import create_storage
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Next to this module by default, not the CWD: the API runs from backend/
+# and the dream worker from the repo root, and both must see one archive.
+ARCHIVE_DIR = os.environ.get("ARCHIVE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive"))
+ARCHIVE_RETENTION_DAYS = int(os.environ.get("ARCHIVE_RETENTION_DAYS", "30"))
+ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", "5000"))
+
+# zstd when the optional `zstandard` package is installed, gzip otherwise
+ARCHIVE_EXTENSIONS = (".jsonl.zst", ".jsonl.gz")
+
+
+def utc_naive(value):
+    """`value` as a naive UTC datetime, the form chat_logs timestamps take
+    (CURRENT_TIMESTAMP is UTC). Aware values are converted; naive ones are
+    assumed to be UTC already."""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _open_for_write(path):
+    if path.endswith(".zst"):
+        raw = open(path, "wb")
+        return io.TextIOWrapper(zstandard.ZstdCompressor(level=10).stream_writer(raw), encoding="utf-8")
+    return gzip.open(path, "wt", encoding="utf-8")
+
+
+def _open_for_read(path):
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"{path} is zstd-compressed but `zstandard` is not installed.")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, "rb")), encoding="utf-8")
+    return gzip.open(path, "rt", encoding="utf-8")
+
+
+def _snapshot_adenosine(row):
+    snapshot = row.get("biological_state_snapshot")
+    if isinstance(snapshot, str):
+        try:
+            snapshot = json.loads(snapshot)
+        except ValueError:
+            return 0.0
+    if isinstance(snapshot, dict):
+        return float(snapshot.get("adenosine") or 0.0)
+    return 0.0
+
+
+def _write_partition(archive_dir, day, first_id, rows):
+    """Write one date partition atomically (temp file, fsync, rename)."""
+    partition = os.path.join(archive_dir, "chat_logs", f"date={day}")
+    os.makedirs(partition, exist_ok=True)
+    extension = ".jsonl.zst" if zstandard is not None else ".jsonl.gz"
+    # Named after the batch's first id: a retried batch overwrites its own file
+    path = os.path.join(partition, f"part-{first_id:012d}{extension}")
+    tmp_path = path + ".tmp"
+    with _open_for_write(tmp_path) as fh:
+        for row in rows:
+            fh.write(json.dumps(row, default=str) + "\n")
+    with open(tmp_path, "rb") as fh:
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+    return path
+
+
+def _aggregate(rows):
+    aggregates = {}
+    for row in rows:
+        key = (row["user_id"] or "", row["timestamp"].date().isoformat())
+        agg = aggregates.get(key)
+        if agg is None:
+            agg = aggregates[key] = {
+                "user_id": key[0],
+                "day": key[1],
+                "turns": 0,
+                "first_at": row["timestamp"],
+                "last_at": row["timestamp"],
+                "adenosine_total": 0.0,
+            }
+        agg["turns"] += 1
+        agg["first_at"] = min(agg["first_at"], row["timestamp"])
+        agg["last_at"] = max(agg["last_at"], row["timestamp"])
+        agg["adenosine_total"] += _snapshot_adenosine(row)
+    return list(aggregates.values())
+
+
+def archive_chat_logs(storage, archive_dir=ARCHIVE_DIR, retention_days=ARCHIVE_RETENTION_DAYS, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move chat logs older than the retention window into compressed files.
+
+    Rows are processed in id order, one batch at a time: the batch is written
+    to date-partitioned files first, then replaced in the database by
+    per-user/day rows in chat_log_daily within a single transaction. A crash
+    between the two steps just rewrites the same files on the next run.
+    """
+    cutoff = utc_naive(datetime.now(timezone.utc)) - timedelta(days=retention_days)
+    archived = 0
+    conn = storage.connect()
+    try:
+        while True:
+            rows_iter = storage.iter_chat_logs(conn, until=cutoff, page_size=batch_size)
+            rows = list(itertools.islice(rows_iter, batch_size))
+            rows_iter.close()
+            if not rows:
+                break
+
+            first_id, last_id = rows[0]["id"], rows[-1]["id"]
+            by_day = {}
+            for row in rows:
+                by_day.setdefault(row["timestamp"].date().isoformat(), []).append(row)
+            for day, day_rows in by_day.items():
+                _write_partition(archive_dir, day, first_id, day_rows)
+
+            deleted = storage.compact_chat_logs(conn, first_id, last_id, cutoff, _aggregate(rows))
+            archived += deleted
+            logger.info(f"Archived chat logs {first_id}..{last_id} ({deleted} rows).")
+
+            if len(rows) < batch_size:
+                break
+    finally:
+        storage.release(conn)
+    return archived
+
+
+def _partition_files(archive_dir, since=None, until=None, newest_first=False):
+    root = os.path.join(archive_dir, "chat_logs")
+    if not os.path.isdir(root):
+        return
+    days = sorted(
+        (d for d in os.listdir(root) if d.startswith("date=")),
+        reverse=newest_first,
+    )
+    for day_dir in days:
+        day = day_dir[len("date="):]
+        # Cheap partition pruning on the directory name
+        if since and day < since.date().isoformat():
+            continue
+        if until and day > until.date().isoformat():
+            continue
+        files = sorted(
+            (f for f in os.listdir(os.path.join(root, day_dir)) if f.endswith(ARCHIVE_EXTENSIONS)),
+            reverse=newest_first,
+        )
+        for name in files:
+            yield os.path.join(root, day_dir, name)
+
+
+def iter_archived_chat_logs(archive_dir=ARCHIVE_DIR, user_id=None, since=None, until=None, after_id=0, newest_first=False):
+    """Stream archived chat logs with the same row shape as live ones.
+
+    Oldest first by default; `newest_first` walks partitions backwards (each
+    file is small, at most one archive batch, and is reversed in memory).
+    """
+    since, until = utc_naive(since), utc_naive(until)
+    for path in _partition_files(archive_dir, since, until, newest_first):
+        with _open_for_read(path) as fh:
+            lines = reversed(fh.readlines()) if newest_first else fh
+            for line in lines:
+                row = json.loads(line)
+                if row["id"] <= (after_id or 0):
+                    continue
+                if user_id and row["user_id"] != user_id:
+                    continue
+                row["timestamp"] = utc_naive(datetime.fromisoformat(row["timestamp"]))
+                if since and row["timestamp"] < since:
+                    continue
+                if until and row["timestamp"] >= until:
+                    continue
+                yield row
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    storage = create_storage(os.environ.get("DATABASE_URL"))
+    count = archive_chat_logs(storage)
+    print(f"Archived {count} chat logs into {ARCHIVE_DIR}.")
@@ -1,79 +1,107 @@
 import os
-import json
-import psycopg2
-from psycopg2.extras import RealDictCursor
 import tinker
 from tinker import types
 from dotenv import load_dotenv
 import logging
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+try:
+    from .archiver import ARCHIVE_DIR, iter_archived_chat_logs, utc_naive
+    from .cache import TTLCache
+    from .metrics import metrics
+    from .migrate import schema_status
+    from .relationship_buffer import RelationshipBuffer
+    from .storage import create_storage
+except ImportError:
+    from archiver import ARCHIVE_DIR, iter_archived_chat_logs, utc_naive
+    from cache import TTLCache
+    from metrics import metrics
+    from migrate import schema_status
+    from relationship_buffer import RelationshipBuffer
+    from storage import create_storage
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Rolling conversation summaries: once a user has this many unsummarized
+# turns beyond the raw window, older turns are folded into the summary.
+# Set SUMMARY_EVERY_N_TURNS=0 to disable and send raw history only.
+SUMMARY_EVERY_N_TURNS = int(os.environ.get("SUMMARY_EVERY_N_TURNS", "4"))
+SUMMARY_RAW_TURNS = int(os.environ.get("SUMMARY_RAW_TURNS", "4"))
+
+# Long-term memory: full-text recall of older turns, bounded by a hard
+# statement timeout so a slow lookup never holds up the reply.
+MEMORY_RECALL_K = int(os.environ.get("MEMORY_RECALL_K", "3"))
+MEMORY_RECALL_TIMEOUT_MS = int(os.environ.get("MEMORY_RECALL_TIMEOUT_MS", "50"))
+MEMORY_RECALL_CACHE_TTL = float(os.environ.get("MEMORY_RECALL_CACHE_TTL", "120"))
+
+# Sessions idle this long lose their identity; the sweeper job deletes them
+# in chunks of SESSION_SWEEP_BATCH_SIZE rows.
+SESSION_MAX_IDLE_HOURS = float(os.environ.get("SESSION_MAX_IDLE_HOURS", "4"))
+SESSION_SWEEP_BATCH_SIZE = int(os.environ.get("SESSION_SWEEP_BATCH_SIZE", "1000"))
+
+# Affinity/interaction counters are buffered in memory and flushed every
+# RELATIONSHIP_FLUSH_INTERVAL seconds as one upsert; 0 writes every turn.
+RELATIONSHIP_FLUSH_INTERVAL = float(os.environ.get("RELATIONSHIP_FLUSH_INTERVAL", "5"))
+
+# Replies that don't depend on the user; the voice TTS cache is pre-warmed
+# with FIXED_REPLIES at startup.
+WAKE_REPLY = "*Yawn*... I'm awake now. What's up?"
+WHO_IS_THIS_REPLY = "Who is this?"
+SLEEPING_REPLY = "Zzz... (The organism is sleeping)"
+HOSTILE_REPLY = "I don't want to talk to you."
+SECRET_SET_REPLY = "Secret set. I'll remember that."
+FIXED_REPLIES = (WAKE_REPLY, WHO_IS_THIS_REPLY, SLEEPING_REPLY, HOSTILE_REPLY, SECRET_SET_REPLY)
+
+# Past this much adenosine the organism won't talk even if not in sleep mode
+SLEEP_PRESSURE_THRESHOLD = 0.9
+
+def is_asleep(bio_state):
+    return bool(bio_state["sleep_mode"]) or bio_state["adenosine"] > SLEEP_PRESSURE_THRESHOLD
+
 class Brain:
     def __init__(self):
         load_dotenv()
         self.db_url = os.environ.get("DATABASE_URL")
         self.tinker_api_key = os.environ.get("TINKER_API_KEY")
+        # Optional read replicas for history/export reads: "postgresql://...,postgresql://..."
+        self.replica_urls = [u.strip() for u in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+        self.storage = create_storage(self.db_url, self.replica_urls)
         
         self.service_client = None
         self.sampling_client = None
         self.tokenizer = None
         self.init_error = None
+
+        self.summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary")
+        self._summaries_in_flight = set()
+        self._summary_lock = threading.Lock()
+        self.memory_cache = TTLCache(maxsize=2048, ttl=MEMORY_RECALL_CACHE_TTL)
+        self.relationship_buffer = RelationshipBuffer() if RELATIONSHIP_FLUSH_INTERVAL > 0 else None
         
         self._initialize_tinker()
         self._initialize_db()
 
     def _initialize_db(self):
-        """Initialize database connection and ensure tables exist."""
+        """Check the schema version; migrations normally run at deploy time."""
         try:
-            conn = self.get_db_connection()
-            with conn.cursor() as cur:
-                # Ensure biological_state exists
-                cur.execute("CREATE TABLE IF NOT EXISTS biological_state (adenosine FLOAT, sleep_mode BOOLEAN, last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
-                # Ensure relationships exists
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS relationships (
-                        user_id TEXT PRIMARY KEY, 
-                        affinity FLOAT, 
-                        interaction_count INT, 
-                        last_interaction TIMESTAMP,
-                        name TEXT,
-                        secret_phrase TEXT
-                    )
-                """)
-                # Ensure chat_logs exists
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS chat_logs (
-                        id SERIAL PRIMARY KEY,
-                        user_id TEXT,
-                        message TEXT,
-                        response TEXT,
-                        biological_state_snapshot JSONB,
-                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-
-                # Ensure sessions exists
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS sessions (
-                        session_id TEXT PRIMARY KEY,
-                        user_id TEXT REFERENCES relationships(user_id),
-                        last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                
-                # Initialize bio state if empty
-                cur.execute("SELECT COUNT(*) FROM biological_state")
-                if cur.fetchone()[0] == 0:
-                    cur.execute("INSERT INTO biological_state (adenosine, sleep_mode) VALUES (0.0, FALSE)")
-                
-                conn.commit()
-            conn.close()
-            logger.info("Database initialized.")
+            current, latest = schema_status(self.storage)
+            if current >= latest:
+                logger.info(f"Database schema at version {current}.")
+                return
+            # Embedded SQLite has no rolling deploys to protect, so just migrate
+            migrate_on_boot = os.environ.get("MIGRATE_ON_BOOT", str(self.storage.dialect == "sqlite"))
+            if migrate_on_boot.lower() == "true":
+                self.storage.initialize()
+                logger.info(f"Database schema migrated from version {current} to {latest}.")
+            else:
+                logger.error(
+                    f"Database schema at version {current}, code expects {latest}. "
+                    "Run `python migrate.py` (or set MIGRATE_ON_BOOT=true)."
+                )
         except Exception as e:
             logger.error(f"Database initialization failed: {e}")
 
@@ -120,58 +148,77 @@ class Brain:
             self.init_error = "TINKER_API_KEY not set."
 
     def get_db_connection(self):
-        return psycopg2.connect(self.db_url)
+        return self.storage.connect()
+
+    def get_read_connection(self, dedicated=False):
+        """Connection for staleness-tolerant reads (may be a replica)."""
+        return self.storage.connect(readonly=True, dedicated=dedicated)
+
+    def release_db_connection(self, conn):
+        self.storage.release(conn)
 
     def get_biological_state(self, conn):
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("SELECT * FROM biological_state LIMIT 1")
-            return cur.fetchone()
+        return self.storage.get_biological_state(conn)
 
     def update_biological_state(self, conn, adenosine_change=0.05):
-        with conn.cursor() as cur:
-            # Clamp between 0.0 and 1.0
-            cur.execute("""
-                UPDATE biological_state 
-                SET adenosine = GREATEST(LEAST(adenosine + %s, 1.0), 0.0),
-                    last_updated = CURRENT_TIMESTAMP
-                RETURNING adenosine
-            """, (adenosine_change,))
-            conn.commit()
-            return cur.fetchone()[0]
+        return self.storage.update_biological_state(conn, adenosine_change)
 
     def wake_up(self):
         """Force wake the organism."""
         conn = self.get_db_connection()
         try:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    UPDATE biological_state 
-                    SET adenosine = 0.0, 
-                        sleep_mode = FALSE,
-                        last_updated = CURRENT_TIMESTAMP
-                """)
-                conn.commit()
+            self.storage.wake_up(conn)
             logger.info("Organism forced to wake up.")
             return True
         except Exception as e:
             logger.error(f"Failed to wake up: {e}")
             return False
         finally:
-            conn.close()
+            self.release_db_connection(conn)
 
     def update_relationship(self, conn, user_id, affinity_change=0.0):
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                INSERT INTO relationships (user_id, affinity, interaction_count, last_interaction)
-                VALUES (%s, %s, 1, CURRENT_TIMESTAMP)
-                ON CONFLICT (user_id) DO UPDATE 
-                SET affinity = relationships.affinity + %s,
-                    interaction_count = relationships.interaction_count + 1,
-                    last_interaction = CURRENT_TIMESTAMP
-                RETURNING affinity, name, secret_phrase
-            """, (user_id, affinity_change, affinity_change))
-            conn.commit()
-            return cur.fetchone()
+        """Count one interaction and return the relationship with it applied."""
+        if self.relationship_buffer is None:
+            return self.storage.update_relationship(conn, user_id, affinity_change)
+
+        with self.relationship_buffer.reading():
+            rel = self.storage.get_relationship(conn, user_id)
+            if rel is None:
+                # First contact creates the row directly
+                return self.storage.update_relationship(conn, user_id, affinity_change)
+            self.relationship_buffer.add(user_id, affinity_change)
+            affinity, interactions = self.relationship_buffer.pending(user_id)
+
+        rel['affinity'] = (rel['affinity'] or 0.0) + affinity
+        rel['interaction_count'] = (rel['interaction_count'] or 0) + interactions
+        return rel
+
+    def flush_relationships(self):
+        """Write buffered relationship deltas; run periodically and on shutdown."""
+        if self.relationship_buffer is None:
+            return 0
+        return self.relationship_buffer.flush(self.storage)
+
+    def get_job_pauses(self):
+        conn = self.get_db_connection()
+        try:
+            return self.storage.get_job_pauses(conn)
+        finally:
+            self.release_db_connection(conn)
+
+    def set_job_paused(self, name, paused):
+        conn = self.get_db_connection()
+        try:
+            self.storage.set_job_paused(conn, name, paused)
+        finally:
+            self.release_db_connection(conn)
+
+    def clear_job_paused(self, name):
+        conn = self.get_db_connection()
+        try:
+            self.storage.clear_job_paused(conn, name)
+        finally:
+            self.release_db_connection(conn)
 
     def handle_auth_commands(self, conn, user_id, message):
         """Parse message for auth commands and update DB."""
@@ -181,35 +228,79 @@ class Brain:
         name_match = re.search(r"my name is\s+([a-zA-Z]+)", message, re.IGNORECASE)
         if name_match:
             new_name = name_match.group(1)
-            with conn.cursor() as cur:
-                cur.execute("UPDATE relationships SET name = %s WHERE user_id = %s", (new_name, user_id))
-                conn.commit()
+            self.storage.set_name(conn, user_id, new_name)
             
         # 2. Set Secret: "Set secret [Secret]"
         secret_match = re.search(r"set secret\s+(.+)", message, re.IGNORECASE)
         if secret_match:
             new_secret = secret_match.group(1).strip()
-            with conn.cursor() as cur:
-                cur.execute("UPDATE relationships SET secret_phrase = %s WHERE user_id = %s", (new_secret, user_id))
-                conn.commit()
-            response_override = "Secret set. I'll remember that."
+            self.storage.set_secret(conn, user_id, new_secret)
+            response_override = SECRET_SET_REPLY
 
         return response_override
 
-    def get_recent_chat_history(self, conn, user_id, limit=10):
-        """Get recent chat logs for context."""
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT message, response, timestamp 
-                FROM chat_logs 
-                WHERE user_id = %s 
-                ORDER BY timestamp DESC 
-                LIMIT %s
-            """, (user_id, limit))
-            # Reverse to chronological order
-            return cur.fetchall()[::-1]
-
-    def generate_tinker_response(self, user_name, message, chat_history=[]):
+    def get_recent_chat_history(self, conn, user_id, limit=10, after_id=None):
+        """Get recent chat logs for context (only those newer than after_id if given)."""
+        return self.storage.get_recent_chat_history(conn, user_id, limit, after_id)
+
+    def iter_chat_logs(self, user_id=None, since=None, until=None, after_id=0, page_size=1000, include_archived=False):
+        """Stream chat logs in id order with constant memory.
+
+        With `include_archived`, rows already moved to the archive come first;
+        archived ids are always lower than live ones.
+        """
+        since, until = utc_naive(since), utc_naive(until)
+        if include_archived:
+            for row in iter_archived_chat_logs(ARCHIVE_DIR, user_id, since, until, after_id):
+                after_id = max(after_id or 0, row['id'])
+                yield row
+
+        # Its own connection: a streamed response resumes this generator on
+        # whichever threadpool thread is free
+        conn = self.get_read_connection(dedicated=True)
+        try:
+            yield from self.storage.iter_chat_logs(conn, user_id, since, until, after_id, page_size)
+        finally:
+            self.release_db_connection(conn)
+
+    @staticmethod
+    def extract_memory_terms(message):
+        """Content words of a message, used as an OR-ed full-text query."""
+        words = []
+        for word in re.findall(r"[a-z0-9]{3,}", message.lower()):
+            if word not in words:
+                words.append(word)
+        return tuple(words[:12])
+
+    def recall_memories(self, conn, user_id, message, before_id=None, k=MEMORY_RECALL_K):
+        """Fetch the top-k older turns relevant to `message` within the latency budget."""
+        terms = self.extract_memory_terms(message)
+        if not terms or k <= 0:
+            return []
+
+        cache_key = (user_id, terms)
+        memories = self.memory_cache.get(cache_key)
+        if memories is not None:
+            metrics.incr("memory.cache_hit")
+        else:
+            metrics.incr("memory.cache_miss")
+            try:
+                with metrics.timer("memory.recall_latency"):
+                    memories = self.storage.search_chat_logs(conn, user_id, terms, k * 2, MEMORY_RECALL_TIMEOUT_MS)
+            except Exception as e:
+                # Timeouts land here too; recall is best effort
+                conn.rollback()
+                metrics.incr("memory.recall_failed")
+                logger.warning(f"Memory recall skipped for {user_id}: {e}")
+                return []
+            self.memory_cache.set(cache_key, memories)
+
+        # Turns still inside the raw history window are already in the prompt
+        if before_id is not None:
+            memories = [m for m in memories if m['id'] < before_id]
+        return memories[:k]
+
+    def generate_tinker_response(self, user_name, message, chat_history=[], summary=None, memories=None):
         if not self.sampling_client or not self.tokenizer:
             return "[Brain not fully connected]"
 
@@ -219,8 +310,12 @@ class Brain:
             
             # Build Context String
             context_str = ""
+            if memories:
+                context_str += "".join([f"Memory: {identity_label}: {m['message']} / Caz: {m['response']}\n" for m in memories])
+            if summary:
+                context_str += f"Earlier in this conversation: {summary}\n"
             if chat_history:
-                context_str = "\n".join([f"{identity_label}: {log['message']}\nCaz: {log['response']}" for log in chat_history])
+                context_str += "\n".join([f"{identity_label}: {log['message']}\nCaz: {log['response']}" for log in chat_history])
                 context_str += "\n"
             
             prompt_text = f"{system_prompt}\n{context_str}{identity_label}: {message}\nCaz:"
@@ -231,7 +326,10 @@ class Brain:
             if len(tokens) > 1024:
                 # Fallback: try with fewer history items
                 if len(chat_history) > 2:
-                     return self.generate_tinker_response(user_name, message, chat_history[2:])
+                     return self.generate_tinker_response(user_name, message, chat_history[2:], summary, memories)
+
+            metrics.observe("prompt.tokens", len(tokens))
+            metrics.observe("prompt.history_turns", len(chat_history))
             
             model_input = tinker.types.ModelInput.from_ints(tokens)
             
@@ -245,8 +343,10 @@ class Brain:
                 ]
             )
             
+            start = time.perf_counter()
             future = self.sampling_client.sample(prompt=model_input, num_samples=1, sampling_params=sampling_params)
             result = future.result()
+            metrics.observe("sampler.latency", time.perf_counter() - start)
             
             if result.sequences:
                 generated_tokens = result.sequences[0].tokens
@@ -268,57 +368,125 @@ class Brain:
             logger.error(f"Tinker generation failed: {e}")
             return "[Brain Error]"
 
+    def summarize_turns(self, user_name, previous_summary, turns):
+        """Fold older turns (and the previous summary) into a short summary."""
+        if not self.sampling_client or not self.tokenizer:
+            return None
+
+        identity_label = f"User ({user_name})" if user_name else "User (Stranger)"
+        transcript = "\n".join([f"{identity_label}: {t['message']}\nCaz: {t['response']}" for t in turns])
+        prompt_text = (
+            "System: Summarize the conversation between the user and Caz in at most three sentences. "
+            "Keep names, facts about the user and open questions.\n"
+        )
+        if previous_summary:
+            prompt_text += f"Summary so far: {previous_summary}\n"
+        prompt_text += f"{transcript}\nSummary:"
+
+        tokens = self.tokenizer.encode(prompt_text)
+        sampling_params = tinker.types.SamplingParams(
+            max_tokens=120,
+            temperature=0.3,
+            stop_token_ids=[self.tokenizer.encode("\n")[0]]
+        )
+        with metrics.timer("summary.latency"):
+            result = self.sampling_client.sample(
+                prompt=tinker.types.ModelInput.from_ints(tokens),
+                num_samples=1,
+                sampling_params=sampling_params
+            ).result()
+        if not result.sequences:
+            return None
+        summary = self.tokenizer.decode(result.sequences[0].tokens).strip()
+        return summary or None
+
+    def refresh_summary(self, user_id, user_name, previous_summary, turns):
+        """Background job: summarize `turns` and store the result on the relationship."""
+        try:
+            summary = self.summarize_turns(user_name, previous_summary, turns)
+            if not summary:
+                return
+            through_id = turns[-1]['id']
+            conn = self.get_db_connection()
+            try:
+                self.storage.save_summary(conn, user_id, summary, through_id)
+            finally:
+                self.release_db_connection(conn)
+            metrics.incr("summary.refreshed")
+        except Exception as e:
+            metrics.incr("summary.failed")
+            logger.error(f"Summary refresh failed for {user_id}: {e}")
+        finally:
+            with self._summary_lock:
+                self._summaries_in_flight.discard(user_id)
+
+    def schedule_summary_refresh(self, user_id, user_name, previous_summary, chat_history):
+        """Queue a summary refresh once enough unsummarized turns have piled up."""
+        if SUMMARY_EVERY_N_TURNS <= 0:
+            return False
+        if len(chat_history) < SUMMARY_RAW_TURNS + SUMMARY_EVERY_N_TURNS:
+            return False
+        with self._summary_lock:
+            if user_id in self._summaries_in_flight:
+                return False
+            self._summaries_in_flight.add(user_id)
+        turns = chat_history[:len(chat_history) - SUMMARY_RAW_TURNS]
+        self.summary_executor.submit(self.refresh_summary, user_id, user_name, previous_summary, turns)
+        return True
+
     def get_or_create_session(self, conn, session_id):
-        """Get session, checking for timeout (4 hours)."""
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("SELECT * FROM sessions WHERE session_id = %s", (session_id,))
-            session = cur.fetchone()
-            
-            if session:
-                # Check timeout (4 hours)
-                # Note: Postgres timestamp subtraction returns timedelta
-                cur.execute("SELECT (NOW() - %s > INTERVAL '4 hours') as is_expired", (session['last_active'],))
-                is_expired = cur.fetchone()['is_expired']
-                
-                if is_expired:
-                    logger.info(f"Session {session_id} expired. Resetting identity.")
-                    cur.execute("UPDATE sessions SET user_id = NULL, last_active = NOW() WHERE session_id = %s", (session_id,))
-                    conn.commit()
-                    session['user_id'] = None
-                else:
-                    # Update activity
-                    cur.execute("UPDATE sessions SET last_active = NOW() WHERE session_id = %s", (session_id,))
-                    conn.commit()
+        """Get session, checking for timeout (SESSION_MAX_IDLE_HOURS)."""
+        session = self.storage.get_session(conn, session_id)
+
+        if session:
+            # Stale sessions are normally gone via sweep_expired_sessions; this
+            # catches ones that expired since the last sweep.
+            if session['idle_seconds'] > SESSION_MAX_IDLE_HOURS * 3600:
+                logger.info(f"Session {session_id} expired. Resetting identity.")
+                self.storage.touch_session(conn, session_id, reset_user=True)
+                session['user_id'] = None
             else:
-                # Create new session
-                cur.execute("INSERT INTO sessions (session_id) VALUES (%s) RETURNING *", (session_id,))
-                conn.commit()
-                session = cur.fetchone()
-                
-            return session
+                # Update activity
+                self.storage.touch_session(conn, session_id)
+        else:
+            # Create new session
+            session = self.storage.create_session(conn, session_id)
+
+        return session
+
+    def sweep_expired_sessions(self, batch_size=SESSION_SWEEP_BATCH_SIZE):
+        """Delete expired sessions in bounded chunks, committing each one."""
+        deleted = 0
+        conn = self.get_db_connection()
+        try:
+            while True:
+                count = self.storage.delete_expired_sessions(conn, SESSION_MAX_IDLE_HOURS, batch_size)
+                deleted += count
+                if count < batch_size:
+                    break
+        finally:
+            self.release_db_connection(conn)
+        metrics.incr("sessions.expired", deleted)
+        return deleted
 
     def link_session_to_user(self, conn, session_id, user_name):
         """Link a session to a user (creating user if needed)."""
         # Normalize user_id from name (simple lowercase for now)
         user_id = user_name.lower().strip()
-        
-        with conn.cursor() as cur:
-            # Ensure user exists in relationships
-            cur.execute("""
-                INSERT INTO relationships (user_id, name, affinity, interaction_count, last_interaction)
-                VALUES (%s, %s, 0.0, 0, CURRENT_TIMESTAMP)
-                ON CONFLICT (user_id) DO NOTHING
-            """, (user_id, user_name))
-            
-            # Link session
-            cur.execute("UPDATE sessions SET user_id = %s WHERE session_id = %s", (user_id, session_id))
-            conn.commit()
-            
+        self.storage.link_session_to_user(conn, session_id, user_id, user_name)
         return user_id
 
-    def process_message(self, session_id: str, message: str):
-        """Main entry point for processing a message."""
-        conn = self.get_db_connection()
+    def process_message(self, session_id: str, message: str, conn=None):
+        """Main entry point for processing a message.
+
+        Pass `conn` to run several turns on one connection (the caller
+        releases it). Reads then stay on that primary connection as well, so
+        each turn sees the one before it even when replicas lag.
+        """
+        own_conn = conn is None
+        if own_conn:
+            conn = self.get_db_connection()
+        read_conn = None
         try:
             # 1. Get Session & Check Identity
             session = self.get_or_create_session(conn, session_id)
@@ -328,7 +496,7 @@ class Brain:
             clean_msg = message.strip().upper()
             if clean_msg in ["WAKE UP", "WAKE", "RESET"]:
                 if self.wake_up():
-                    return {"response": "*Yawn*... I'm awake now. What's up?", "mood": "awake"}
+                    return {"response": WAKE_REPLY, "mood": "awake"}
 
             # Identity Resolution State Machine
             if not user_id:
@@ -344,12 +512,12 @@ class Brain:
                     user_id = self.link_session_to_user(conn, session_id, user_name)
                     return {"response": f"Hello {user_name}. I remember you.", "mood": "neutral"}
                 else:
-                    return {"response": "Who is this?", "mood": "curious"}
+                    return {"response": WHO_IS_THIS_REPLY, "mood": "curious"}
 
             # 2. Check Biological State
             bio_state = self.get_biological_state(conn)
-            if bio_state["sleep_mode"] or bio_state["adenosine"] > 0.9:
-                return {"response": "Zzz... (The organism is sleeping)", "mood": "asleep"}
+            if is_asleep(bio_state):
+                return {"response": SLEEPING_REPLY, "mood": "asleep"}
 
             # 3. Update Relationship (Preserve existing affinity logic)
             rel = self.update_relationship(conn, user_id, affinity_change=0.1)
@@ -357,7 +525,7 @@ class Brain:
             user_name = rel['name']
             
             if affinity < -5.0:
-                return {"response": "I don't want to talk to you.", "mood": "hostile"}
+                return {"response": HOSTILE_REPLY, "mood": "hostile"}
 
             # 4. Handle Auth Commands (Renaming, Secrets)
             auth_response = self.handle_auth_commands(conn, user_id, message)
@@ -365,9 +533,18 @@ class Brain:
                 return {"response": auth_response, "mood": "neutral"}
 
             # 5. Generate Response
-            # Fetch recent history (last 10 messages)
-            chat_history = self.get_recent_chat_history(conn, user_id, limit=10)
-            response_text = self.generate_tinker_response(user_name, message, chat_history)
+            # Raw history covers only turns not yet folded into the summary (max 10)
+            summary = rel.get('conversation_summary') if SUMMARY_EVERY_N_TURNS > 0 else None
+            after_id = rel.get('summary_through_id') if summary else None
+            # History and recall tolerate replica lag; session/identity stay on the
+            # primary. Without replicas a second connection would only be another
+            # one to the primary, so the turn's own is reused.
+            use_replica = own_conn and self.storage.has_replicas
+            read_conn = self.get_read_connection() if use_replica else conn
+            chat_history = self.get_recent_chat_history(read_conn, user_id, limit=10, after_id=after_id)
+            before_id = chat_history[0]['id'] if chat_history else None
+            memories = self.recall_memories(read_conn, user_id, message, before_id=before_id)
+            response_text = self.generate_tinker_response(user_name, message, chat_history, summary, memories)
 
             # 6. Update State
             self.update_biological_state(conn)
@@ -377,17 +554,18 @@ class Brain:
             if 'last_updated' in bio_state_dict:
                 bio_state_dict['last_updated'] = str(bio_state_dict['last_updated'])
 
-            with conn.cursor() as cur:
-                cur.execute("""
-                    INSERT INTO chat_logs (user_id, message, response, biological_state_snapshot)
-                    VALUES (%s, %s, %s, %s)
-                """, (user_id, message, response_text, json.dumps(bio_state_dict)))
-                conn.commit()
+            self.storage.log_chat(conn, user_id, message, response_text, bio_state_dict)
+
+            # 8. Fold older turns into the rolling summary off the request path
+            self.schedule_summary_refresh(user_id, user_name, summary, chat_history)
 
             return {"response": response_text, "mood": "awake"}
 
         finally:
-            conn.close()
+            if read_conn is not None and read_conn is not conn:
+                self.release_db_connection(read_conn)
+            if own_conn:
+                self.release_db_connection(conn)
 
     async def process_message_async(self, user_id: str, message: str):
         """Async wrapper for process_message."""
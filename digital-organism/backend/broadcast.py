@@ -0,0 +1,65 @@
+import asyncio
+import json
+import threading
+
+try:
+    from .metrics import metrics
+except ImportError:
+    from metrics import metrics
+
+
+class Broadcaster:
+    """Pushes the latest value of one piece of state to subscribed sockets.
+
+    A frame is serialized once per change, not once per subscriber, and
+    handed to every subscriber's VoiceConnection, whose writer sends it on
+    its own; a slow client only ever holds the newest unsent frame (see
+    VoiceConnection.send_state), so publishing never waits on anyone.
+    Frames equal to the last one are not re-sent. `publish()` may be called
+    from any thread; subscriptions belong to the event loop.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.subscribers = set()
+        self.latest = None
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, conn):
+        self._loop = asyncio.get_running_loop()
+        self.subscribers.add(conn)
+        metrics.set_gauge(f"{self.name}.subscribers", len(self.subscribers))
+        if self.latest is not None:
+            # Start the subscriber from the current value
+            conn.send_state(self.latest)
+
+    def unsubscribe(self, conn):
+        self.subscribers.discard(conn)
+        metrics.set_gauge(f"{self.name}.subscribers", len(self.subscribers))
+
+    def publish(self, frame):
+        payload = json.dumps(frame, sort_keys=True)
+        with self._lock:
+            if payload == self.latest:
+                return
+            self.latest = payload
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            on_loop = asyncio.get_running_loop() is loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self._fan_out(payload)
+        else:
+            loop.call_soon_threadsafe(self._fan_out, payload)
+
+    def _fan_out(self, payload):
+        if payload != self.latest:
+            # A newer frame was published meanwhile and fans out itself
+            return
+        for conn in list(self.subscribers):
+            conn.send_state(payload)
+        metrics.incr(f"{self.name}.published")
@@ -6,28 +6,49 @@ import tinker
 from tinker import types
 from dotenv import load_dotenv
 import datetime
+import itertools
+try:
+    from .archiver import iter_archived_chat_logs
+    from .storage import create_storage
+except ImportError:
+    from archiver import iter_archived_chat_logs
+    from storage import create_storage
 
 # Load environment variables
 load_dotenv("backend/.env")
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 TINKER_API_KEY = os.getenv("TINKER_API_KEY")
+REPLICA_URLS = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
 
 def get_db_connection():
     return psycopg2.connect(DATABASE_URL)
 
-def fetch_memories(conn):
-    """Fetch chat logs from the last 24 hours (or all un-processed)."""
+def get_read_connection():
+    """Memories can come from a read replica (falls back to the primary if it lags)."""
+    return create_storage(DATABASE_URL, REPLICA_URLS).connect(readonly=True)
+
+def fetch_memories(conn, limit=100):
+    """Stream chat logs from the last 24 hours (or all un-processed)."""
     # For simplicity, we'll just fetch the last 100 interactions
     # In a real system, we'd track which logs have been "dreamt" about.
-    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+    # Named (server-side) cursor: rows arrive in small batches, never all at once.
+    with conn.cursor(name="dream_memories", cursor_factory=RealDictCursor) as cur:
+        cur.itersize = 50
         cur.execute("""
             SELECT user_id, message, response 
             FROM chat_logs 
             ORDER BY timestamp DESC 
-            LIMIT 100
-        """)
-        return cur.fetchall()
+            LIMIT %s
+        """, (limit,))
+        count = 0
+        for row in cur:
+            count += 1
+            yield row
+
+    # Older memories may already have been moved out to the archive
+    if count < limit:
+        yield from itertools.islice(iter_archived_chat_logs(newest_first=True), limit - count)
 
 def format_data_for_training(memories):
     """Convert chat logs into Tinker Datum objects."""
@@ -74,18 +95,18 @@ def dream_cycle():
         print("Error: TINKER_API_KEY not found.")
         return
 
-    # 1. Initialize Database
-    conn = get_db_connection()
+    # 1. Initialize Database (reads may go to a replica)
+    read_conn = get_read_connection()
     
     # 2. Fetch Memories
     print("Fetching memories...")
-    memories = fetch_memories(conn)
-    if not memories:
+    memories = fetch_memories(read_conn)
+    first_memory = next(memories, None)
+    if first_memory is None:
         print("No memories found. Sleeping without dreaming.")
-        conn.close()
+        read_conn.close()
         return
-    
-    print(f"Found {len(memories)} memories.")
+    memories = itertools.chain([first_memory], memories)
 
     # 3. Initialize Tinker
     print("Initializing Tinker...")
@@ -140,6 +161,9 @@ def dream_cycle():
         )
         training_data.append(datum)
 
+    print(f"Found {len(training_data)} memories.")
+    read_conn.close()
+
     # 5. Load State
     print("Loading biological state (model weights)...")
     try:
@@ -194,6 +218,7 @@ def dream_cycle():
 
     # 9. Reset Biological Markers
     print("Waking up... Resetting adenosine.")
+    conn = get_db_connection()
     with conn.cursor() as cur:
         cur.execute("UPDATE biological_state SET adenosine = 0.0, sleep_mode = FALSE, last_updated = CURRENT_TIMESTAMP")
         conn.commit()
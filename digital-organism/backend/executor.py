@@ -0,0 +1,68 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from .metrics import metrics
+except ImportError:
+    from metrics import metrics
+
+
+class ExecutorFull(Exception):
+    pass
+
+
+class BoundedExecutor:
+    """A dedicated thread pool with a bounded backlog.
+
+    At most `max_workers` calls run at once and at most `max_queue` more wait
+    for a thread; beyond that `run()` raises ExecutorFull immediately so the
+    caller can shed load instead of queueing without limit. Queue time, run
+    time and depth are recorded under `<name>.*` metrics.
+    """
+
+    def __init__(self, name, max_workers, max_queue):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    @property
+    def pending(self):
+        """Calls running or waiting for a thread."""
+        return self._pending
+
+    async def run(self, func, *args):
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                metrics.incr(f"{self.name}.rejected")
+                raise ExecutorFull(self.name)
+            self._pending += 1
+            metrics.set_gauge(f"{self.name}.pending", self._pending)
+
+        submitted = time.perf_counter()
+
+        def call():
+            started = time.perf_counter()
+            metrics.observe(f"{self.name}.queue_time", started - submitted)
+            try:
+                return func(*args)
+            finally:
+                metrics.observe(f"{self.name}.run_time", time.perf_counter() - started)
+
+        # Release the slot when the thread finishes, not when the caller stops
+        # waiting: a cancelled request still occupies its worker until then.
+        future = self._pool.submit(call)
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+            metrics.set_gauge(f"{self.name}.pending", self._pending)
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
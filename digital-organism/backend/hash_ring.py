@@ -0,0 +1,88 @@
+import bisect
+import hashlib
+import math
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes and bounded loads.
+
+    Each node is placed on the ring `vnodes` times so keys spread evenly and
+    adding or removing a node only moves the keys on that node's arcs.
+    Lookups walk clockwise from the key's position and skip any node already
+    carrying more than `load_factor` times the average load, so a hot user
+    cannot pile everything onto one replica.
+    """
+
+    def __init__(self, nodes=(), vnodes=100, load_factor=1.25):
+        self.vnodes = vnodes
+        self.load_factor = load_factor
+        self.loads = {}
+        self._hashes = []
+        self._owners = {}
+        for node in nodes:
+            self.add_node(node)
+
+    @staticmethod
+    def _hash(key):
+        digest = hashlib.md5(key.encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big")
+
+    @property
+    def nodes(self):
+        return list(self.loads)
+
+    def add_node(self, node):
+        if node in self.loads:
+            return
+        self.loads[node] = 0
+        for i in range(self.vnodes):
+            h = self._hash(f"{node}#{i}")
+            if h in self._owners:
+                continue
+            self._owners[h] = node
+            bisect.insort(self._hashes, h)
+
+    def remove_node(self, node):
+        if node not in self.loads:
+            return
+        del self.loads[node]
+        self._hashes = [h for h in self._hashes if self._owners[h] != node]
+        self._owners = {h: n for h, n in self._owners.items() if n != node}
+
+    def _capacity(self):
+        total = sum(self.loads.values()) + 1
+        return math.ceil(self.load_factor * total / len(self.loads))
+
+    def get_node(self, key, exclude=()):
+        """Return the owner of `key`, honouring the bounded-load limit."""
+        candidates = [n for n in self.loads if n not in exclude]
+        if not candidates:
+            return None
+
+        capacity = self._capacity()
+        start = bisect.bisect(self._hashes, self._hash(key))
+        seen = set()
+        first_choice = None
+        for i in range(len(self._hashes)):
+            node = self._owners[self._hashes[(start + i) % len(self._hashes)]]
+            if node in seen or node in exclude:
+                continue
+            seen.add(node)
+            if first_choice is None:
+                first_choice = node
+            if self.loads[node] < capacity:
+                return node
+            if len(seen) == len(candidates):
+                break
+        return first_choice
+
+    def acquire(self, key, exclude=()):
+        """Pick a node for `key` and count the request against its load."""
+        node = self.get_node(key, exclude)
+        if node is not None:
+            self.loads[node] += 1
+        return node
+
+    def release(self, node):
+        if node in self.loads and self.loads[node] > 0:
+            self.loads[node] -= 1
@@ -0,0 +1,63 @@
+import asyncio
+import hashlib
+import json
+
+try:
+    from .cache import TTLCache
+    from .metrics import metrics
+except ImportError:
+    from cache import TTLCache
+    from metrics import metrics
+
+
+class IdempotencyConflict(Exception):
+    """The key was already used for a different request."""
+    pass
+
+
+def fingerprint(*parts):
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """Runs each idempotency key at most once within `ttl` seconds.
+
+    A repeat of a finished request gets the stored result; a repeat of one
+    still running waits on the same task instead of starting another. Only
+    successful results are stored, so a failed request can be retried.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, ttl, maxsize=10000):
+        self.results = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight = {}
+
+    async def run(self, key, request_fingerprint, func, *args):
+        """Return (result, replayed) for `await func(*args)` under `key`."""
+        cached = self.results.get(key)
+        if cached is not None:
+            stored_fingerprint, result = cached
+            if stored_fingerprint != request_fingerprint:
+                raise IdempotencyConflict(key)
+            metrics.incr("idempotency.replays")
+            return result, True
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            stored_fingerprint, task = inflight
+            if stored_fingerprint != request_fingerprint:
+                raise IdempotencyConflict(key)
+            metrics.incr("idempotency.attached")
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(func(*args))
+        self._inflight[key] = (request_fingerprint, task)
+
+        def finish(task):
+            self._inflight.pop(key, None)
+            if not task.cancelled() and task.exception() is None:
+                self.results.set(key, (request_fingerprint, task.result()))
+
+        task.add_done_callback(finish)
+        # Shielded: a retry can still pick the result up if this caller leaves
+        return await asyncio.shield(task), False
@@ -0,0 +1,72 @@
+import asyncio
+
+try:
+    from .metrics import metrics
+except ImportError:
+    from metrics import metrics
+
+
+class LaneFull(Exception):
+    pass
+
+
+class _Lane:
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.depth = 0
+
+
+class UserLanes:
+    """Per-key serialization: calls sharing a key run one at a time, in
+    arrival order, while different keys run in parallel.
+
+    A lane holds at most `max_depth` calls (running plus waiting); further
+    calls raise LaneFull. Lanes exist only while they have calls, so idle
+    users cost nothing. Must be used from a single event loop.
+    """
+
+    def __init__(self, name, max_depth):
+        self.name = name
+        self.max_depth = max_depth
+        self._lanes = {}
+
+    def depth(self, key):
+        lane = self._lanes.get(key)
+        return lane.depth if lane else 0
+
+    async def run(self, key, func, *args):
+        """Await `func(*args)` inside `key`'s lane and return its result.
+
+        The lane stays held until the call finishes, even if the caller is
+        cancelled meanwhile (e.g. the client disconnected): the underlying
+        work may still be writing, so the next turn has to wait for it.
+        """
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = _Lane()
+        if lane.depth >= self.max_depth:
+            metrics.incr(f"{self.name}.lane_rejected")
+            raise LaneFull(key)
+        lane.depth += 1
+        metrics.set_gauge(f"{self.name}.lanes", len(self._lanes))
+
+        try:
+            await lane.lock.acquire()
+        except BaseException:
+            self._leave(key, lane)
+            raise
+
+        task = asyncio.ensure_future(func(*args))
+
+        def release(_):
+            lane.lock.release()
+            self._leave(key, lane)
+
+        task.add_done_callback(release)
+        return await asyncio.shield(task)
+
+    def _leave(self, key, lane):
+        lane.depth -= 1
+        if lane.depth == 0 and self._lanes.get(key) is lane:
+            del self._lanes[key]
+        metrics.set_gauge(f"{self.name}.lanes", len(self._lanes))
@@ -1,20 +1,37 @@
-from fastapi import FastAPI, HTTPException, Depends, Request, Security, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, Response, Security, BackgroundTasks
 import asyncio
 from fastapi.security.api_key import APIKeyHeader, APIKeyQuery
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 try:
-    from .brain import Brain
-    from .voice_router import router as voice_router
+    from .archiver import archive_chat_logs
+    from .brain import Brain, FIXED_REPLIES, RELATIONSHIP_FLUSH_INTERVAL, is_asleep
+    from .executor import BoundedExecutor, ExecutorFull
+    from .idempotency import IdempotencyConflict, IdempotencyStore, fingerprint
+    from .lanes import LaneFull, UserLanes
+    from .metrics import metrics
+    from .scheduler import JobAlreadyRunning, Scheduler
+    from .voice_router import router as voice_router, state_broadcaster, stt_service, tts_service
 except ImportError:
-    from brain import Brain
-    from voice_router import router as voice_router
+    from archiver import archive_chat_logs
+    from brain import Brain, FIXED_REPLIES, RELATIONSHIP_FLUSH_INTERVAL, is_asleep
+    from executor import BoundedExecutor, ExecutorFull
+    from idempotency import IdempotencyConflict, IdempotencyStore, fingerprint
+    from lanes import LaneFull, UserLanes
+    from metrics import metrics
+    from scheduler import JobAlreadyRunning, Scheduler
+    from voice_router import router as voice_router, state_broadcaster, stt_service, tts_service
 import os
+import threading
 from dotenv import load_dotenv
 
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from datetime import datetime
+from typing import List, Optional
+import json
 import logging
+import zlib
 
 load_dotenv()
 
@@ -68,37 +85,125 @@ app.add_middleware(
 
 # Initialize Brain
 brain = Brain()
+
+# Chat turns hold a DB connection and a Tinker call for their whole duration,
+# so they get their own pool instead of FastAPI's shared one. Size it to what
+# the database and sampler can serve; beyond CHAT_MAX_QUEUE waiting turns,
+# /chat answers 503.
+CHAT_WORKERS = int(os.environ.get("CHAT_WORKERS", "8"))
+CHAT_MAX_QUEUE = int(os.environ.get("CHAT_MAX_QUEUE", "32"))
+chat_executor = BoundedExecutor("chat", CHAT_WORKERS, CHAT_MAX_QUEUE)
+
+# A user's turns run one at a time, in order (double-sends, two tabs); at most
+# LANE_MAX_DEPTH of them may be running or waiting before we answer 429.
+LANE_MAX_DEPTH = int(os.environ.get("LANE_MAX_DEPTH", "4"))
+chat_lanes = UserLanes("chat", LANE_MAX_DEPTH)
+
+# Idempotency-Key on /chat: a retried request gets the original response
+# (or waits for it) instead of generating, logging and tiring twice.
+IDEMPOTENCY_TTL = float(os.environ.get("IDEMPOTENCY_TTL", "600"))
+chat_idempotency = IdempotencyStore(ttl=IDEMPOTENCY_TTL)
+
+# /chat/batch: per-request item cap and how many users one batch may run at
+# once (leaving the rest of the chat pool to interactive /chat traffic)
+CHAT_BATCH_MAX_ITEMS = int(os.environ.get("CHAT_BATCH_MAX_ITEMS", "500"))
+CHAT_BATCH_CONCURRENCY = int(os.environ.get("CHAT_BATCH_CONCURRENCY", str(max(1, CHAT_WORKERS // 2))))
+
 app.state.brain = brain
+app.state.chat_executor = chat_executor
+app.state.chat_lanes = chat_lanes
 
 app.include_router(voice_router)
 
-# --- Background Tasks ---
-async def adenosine_decay_loop():
-    """Background task to decay adenosine over time."""
-    while True:
-        try:
-            await asyncio.sleep(60) # Run every minute
-            conn = brain.get_db_connection()
-            try:
-                # Decay by 0.2% per minute (~12% per hour)
-                new_level = brain.update_biological_state(conn, adenosine_change=-0.002)
-                
-                # Auto-wake if rested
-                state = brain.get_biological_state(conn)
-                if state and state['sleep_mode'] and state['adenosine'] < 0.1:
-                    with conn.cursor() as cur:
-                        cur.execute("UPDATE biological_state SET sleep_mode = FALSE, last_updated = CURRENT_TIMESTAMP")
-                        conn.commit()
-                    logger.info("Organism woke up naturally (adenosine < 0.1).")
-                    
-            finally:
-                conn.close()
-        except Exception as e:
-            logger.error(f"Error in decay loop: {e}")
+# --- Background Jobs ---
+def publish_bio_state(state):
+    """Push mood/sleep state to subscribed websocket clients."""
+    if not state:
+        return
+    state_broadcaster.publish({
+        "type": "state",
+        "adenosine": round(float(state["adenosine"]), 3),
+        "sleep_mode": bool(state["sleep_mode"]),
+        "mood": "asleep" if is_asleep(state) else "awake",
+    })
+
+def adenosine_decay():
+    """Decay adenosine over time and wake the organism once rested."""
+    conn = brain.get_db_connection()
+    try:
+        # Decay by 0.2% per minute (~12% per hour)
+        brain.update_biological_state(conn, adenosine_change=-0.002)
+        
+        # Auto-wake if rested
+        state = brain.get_biological_state(conn)
+        if state and state['sleep_mode'] and state['adenosine'] < 0.1:
+            brain.storage.set_sleep_mode(conn, False)
+            state = dict(state, sleep_mode=False)
+            logger.info("Organism woke up naturally (adenosine < 0.1).")
+        publish_bio_state(state)
+    finally:
+        brain.release_db_connection(conn)
+
+def watch_bio_state():
+    """Publish state changed elsewhere: chat turns, other workers, dreams."""
+    if not state_broadcaster.subscribers:
+        return
+    # Primary, not a replica: a lagging read could undo a fresher publish
+    conn = brain.get_db_connection()
+    try:
+        publish_bio_state(brain.get_biological_state(conn))
+    finally:
+        brain.release_db_connection(conn)
+
+def sweep_sessions():
+    count = brain.sweep_expired_sessions()
+    if count:
+        logger.info(f"Deleted {count} expired sessions.")
+
+def archive_old_chat_logs():
+    count = archive_chat_logs(brain.storage)
+    logger.info(f"Archived {count} chat logs.")
+
+# Singleton jobs run only on the worker holding the leader lock
+# Pauses live in the database so they apply on whichever worker leads
+scheduler = Scheduler(leader_lock=brain.storage.leader_lock("brain-scheduler"), pause_store=brain)
+scheduler.add_job("adenosine_decay", adenosine_decay, interval=60, jitter=5, singleton=True)
+# Every worker has its own subscribers, so every worker watches
+scheduler.add_job("bio_state_watch", watch_bio_state, interval=float(os.environ.get("BIO_STATE_WATCH_INTERVAL", "5")))
+scheduler.add_job(
+    "session_sweep",
+    sweep_sessions,
+    interval=float(os.environ.get("SESSION_SWEEP_INTERVAL_SECONDS", "600")),
+    jitter=60,
+    singleton=True,
+)
+if brain.relationship_buffer is not None:
+    # Every worker buffers its own users' deltas, so this is not a singleton
+    scheduler.add_job("relationship_flush", brain.flush_relationships, interval=RELATIONSHIP_FLUSH_INTERVAL)
+scheduler.add_job(
+    "archive_chat_logs",
+    archive_old_chat_logs,
+    interval=float(os.environ.get("ARCHIVE_INTERVAL_SECONDS", "21600")),
+    jitter=600,
+    singleton=True,
+    paused=os.environ.get("ARCHIVE_ENABLED", "false").lower() != "true",
+)
 
 @app.on_event("startup")
 async def startup_event():
-    asyncio.create_task(adenosine_decay_loop())
+    await scheduler.start()
+    # Off the startup path: the server takes traffic while the cache fills
+    app.state.tts_prewarm = asyncio.create_task(tts_service.prewarm(FIXED_REPLIES))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await scheduler.stop()
+    app.state.tts_prewarm.cancel()
+    chat_executor.shutdown(wait=False)
+    tts_service.shutdown()
+    stt_service.shutdown()
+    # Don't lose the last few seconds of affinity changes
+    await asyncio.to_thread(brain.flush_relationships)
 
 # --- Models ---
 class ChatRequest(BaseModel):
@@ -109,22 +214,195 @@ class ChatResponse(BaseModel):
     response: str
     mood: str
 
+class ChatBatchRequest(BaseModel):
+    items: List[ChatRequest]
+
 # --- Routes ---
 @app.get("/")
 def read_root():
     return brain.status()
 
+async def run_chat_turn(user_id, message):
+    return await chat_lanes.run(user_id, chat_executor.run, brain.process_message, user_id, message)
+
 @app.post("/chat", response_model=ChatResponse)
-def chat(request: ChatRequest):
+async def chat(
+    request: ChatRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
     try:
-        result = brain.process_message(request.user_id, request.message)
+        if idempotency_key:
+            if len(idempotency_key) > 255:
+                raise HTTPException(status_code=400, detail="Idempotency-Key must be at most 255 characters")
+            result, replayed = await chat_idempotency.run(
+                (request.user_id, idempotency_key),
+                fingerprint(request.user_id, request.message),
+                run_chat_turn, request.user_id, request.message,
+            )
+            if replayed:
+                response.headers["Idempotent-Replayed"] = "true"
+        else:
+            result = await run_chat_turn(request.user_id, request.message)
         return ChatResponse(response=result["response"], mood=result["mood"])
+    except HTTPException:
+        raise
+    except IdempotencyConflict:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    except LaneFull:
+        raise HTTPException(status_code=429, detail="Too many messages in flight for this user", headers={"Retry-After": "1"})
+    except ExecutorFull:
+        raise HTTPException(status_code=503, detail="Too many chats in progress, retry shortly", headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def run_user_turns(user_id, turns, emit, cancelled):
+    """Run one user's batch items in order on a single connection."""
+    conn = brain.get_db_connection()
+    try:
+        for index, message in turns:
+            if cancelled.is_set():
+                return
+            try:
+                result = brain.process_message(user_id, message, conn=conn)
+                emit({"index": index, "user_id": user_id, **result})
+            except Exception as e:
+                conn.rollback()
+                emit({"index": index, "user_id": user_id, "error": str(e), "status": 500})
+    finally:
+        brain.release_db_connection(conn)
+
+@app.post("/chat/batch")
+async def chat_batch(request: ChatBatchRequest):
+    """Run many turns; different users concurrently, each user's in order.
+
+    Streams one NDJSON line per item as it completes, tagged with the item's
+    index in the request.
+    """
+    if len(request.items) > CHAT_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {CHAT_BATCH_MAX_ITEMS} items per batch")
+
+    groups = {}
+    for index, item in enumerate(request.items):
+        groups.setdefault(item.user_id, []).append((index, item.message))
+
+    loop = asyncio.get_running_loop()
+    results = asyncio.Queue()
+    answered = set()
+    cancelled = threading.Event()
+    slots = asyncio.Semaphore(CHAT_BATCH_CONCURRENCY)
+
+    def deliver(result):
+        answered.add(result["index"])
+        results.put_nowait(result)
+
+    def emit(result):
+        loop.call_soon_threadsafe(deliver, result)
+
+    async def run_group(user_id, turns):
+        async with slots:
+            try:
+                await chat_lanes.run(user_id, chat_executor.run, run_user_turns, user_id, turns, emit, cancelled)
+            except LaneFull:
+                error, status = "Too many messages in flight for this user", 429
+            except ExecutorFull:
+                error, status = "Too many chats in progress", 503
+            except Exception as e:
+                error, status = str(e), 500
+            else:
+                return
+        # Every item gets exactly one line, even when its group failed outright
+        for index, _ in turns:
+            if index not in answered:
+                deliver({"index": index, "user_id": user_id, "error": error, "status": status})
+
+    async def stream():
+        tasks = [asyncio.create_task(run_group(user_id, turns)) for user_id, turns in groups.items()]
+        try:
+            for _ in range(len(request.items)):
+                result = await results.get()
+                yield json.dumps(result) + "\n"
+        finally:
+            # Client went away: stop after each group's current turn
+            cancelled.set()
+            for task in tasks:
+                task.cancel()
+
+    metrics.incr("chat.batch_items", len(request.items))
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @app.post("/wake")
 def wake_organism(authorized: bool = Depends(get_api_key)):
     """Force wake the organism (Admin only)."""
     if brain.wake_up():
+        publish_bio_state({"adenosine": 0.0, "sleep_mode": False})
         return {"status": "woken", "message": "The organism is now awake and alert."}
     raise HTTPException(status_code=500, detail="Failed to wake organism")
+
+@app.get("/metrics")
+def get_metrics(authorized: bool = Depends(get_api_key)):
+    """Process-local counters and timings (prompt tokens, sampler latency, ...)."""
+    return metrics.snapshot()
+
+def gzip_stream(chunks):
+    """Gzip an iterator of str chunks without buffering the whole body."""
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    for chunk in chunks:
+        out = compressor.compress(chunk.encode("utf-8"))
+        if out:
+            yield out
+    yield compressor.flush()
+
+@app.get("/admin/chat_logs/export")
+def export_chat_logs(
+    user_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    after_id: int = 0,
+    gzip: bool = False,
+    include_archived: bool = False,
+    authorized: bool = Depends(get_api_key),
+):
+    """Stream chat logs as NDJSON, ordered by id (Admin only).
+
+    Pass the last `id` you received as `after_id` to resume an export.
+    """
+    rows = brain.iter_chat_logs(
+        user_id=user_id, since=since, until=until, after_id=after_id, include_archived=include_archived
+    )
+    body = (json.dumps(row, default=str) + "\n" for row in rows)
+    headers = {}
+    if gzip:
+        body = gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type="application/x-ndjson", headers=headers)
+
+# --- Job Admin ---
+def get_job_or_404(name: str):
+    if name not in scheduler.jobs:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {name}")
+    return name
+
+@app.get("/admin/jobs")
+async def list_jobs(authorized: bool = Depends(get_api_key)):
+    return scheduler.status()
+
+@app.post("/admin/jobs/{name}/run")
+async def run_job(name: str, authorized: bool = Depends(get_api_key)):
+    """Run a job now on this worker, even if paused or not the leader."""
+    get_job_or_404(name)
+    try:
+        return await scheduler.run_job(name)
+    except JobAlreadyRunning:
+        raise HTTPException(status_code=409, detail=f"Job {name} is already running")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/admin/jobs/{name}/pause")
+async def pause_job(name: str, authorized: bool = Depends(get_api_key)):
+    """Pause a job on every worker until it is resumed (persisted)."""
+    return await scheduler.pause(get_job_or_404(name))
+
+@app.post("/admin/jobs/{name}/resume")
+async def resume_job(name: str, authorized: bool = Depends(get_api_key)):
+    return await scheduler.resume(get_job_or_404(name))
@@ -0,0 +1,53 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Metrics:
+    """Process-local counters, gauges and timings, exposed on /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.timings = {}
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name, value):
+        """Record one sample (seconds, tokens, ...) for `name`."""
+        with self._lock:
+            stat = self.timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0})
+            stat["count"] += 1
+            stat["total"] += value
+            stat["max"] = max(stat["max"], value)
+            stat["last"] = value
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        with self._lock:
+            timings = {
+                name: dict(stat, avg=stat["total"] / stat["count"] if stat["count"] else 0.0)
+                for name, stat in self.timings.items()
+            }
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "timings": timings,
+            }
+
+
+metrics = Metrics()
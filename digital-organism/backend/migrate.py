@@ -0,0 +1,92 @@
+import argparse
+import logging
+import os
+import re
+
+from dotenv import load_dotenv
+
+try:
+    from .storage import create_storage
+except ImportError:
+    from storage import create_storage
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+# migrations/<dialect>/NNNN_description.sql
+MIGRATION_FILE = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+
+def load_migrations(dialect, migrations_dir=MIGRATIONS_DIR):
+    """All migrations for a dialect as (version, name, sql), oldest first."""
+    directory = os.path.join(migrations_dir, dialect)
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = MIGRATION_FILE.match(filename)
+        if not match:
+            continue
+        with open(os.path.join(directory, filename), encoding="utf-8") as fh:
+            migrations.append((int(match.group(1)), match.group(2), fh.read()))
+    versions = [version for version, _, _ in migrations]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+
+def latest_version(dialect, migrations_dir=MIGRATIONS_DIR):
+    migrations = load_migrations(dialect, migrations_dir)
+    return migrations[-1][0] if migrations else 0
+
+
+def schema_status(storage, migrations_dir=MIGRATIONS_DIR):
+    """(current, latest) schema version; a single indexed read."""
+    conn = storage.connect()
+    try:
+        current = storage.schema_version(conn)
+    finally:
+        storage.release(conn)
+    return current, latest_version(storage.dialect, migrations_dir)
+
+
+def migrate(storage, target=None, migrations_dir=MIGRATIONS_DIR):
+    """Apply pending migrations up to `target` (default: latest) in order.
+
+    Each migration runs in its own transaction together with its
+    schema_version row, so a failure leaves the schema at the last good
+    version. Safe to run from several processes at once: the storage
+    serializes appliers and skips versions that are already recorded.
+    """
+    applied = []
+    conn = storage.connect()
+    try:
+        for version, name, sql in load_migrations(storage.dialect, migrations_dir):
+            if target is not None and version > target:
+                break
+            if storage.schema_version(conn) >= version:
+                continue
+            if storage.apply_migration(conn, version, name, sql):
+                logger.info(f"Applied migration {version:04d}_{name}.")
+                applied.append(version)
+    finally:
+        storage.release(conn)
+    return applied
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Apply or inspect schema migrations.")
+    parser.add_argument("command", nargs="?", default="up", choices=["up", "status"])
+    parser.add_argument("--target", type=int, help="stop after this version")
+    args = parser.parse_args()
+
+    storage = create_storage(os.environ.get("DATABASE_URL"))
+    if args.command == "status":
+        current, latest = schema_status(storage)
+        print(f"Schema version {current} of {latest} ({storage.dialect}).")
+    else:
+        applied = migrate(storage, args.target)
+        current, latest = schema_status(storage)
+        print(f"Applied {len(applied)} migration(s); schema version {current} of {latest}.")
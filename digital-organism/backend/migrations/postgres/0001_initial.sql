@@ -0,0 +1,38 @@
+-- Base tables. IF NOT EXISTS so databases created before versioned
+-- migrations (by init_db.py, migrate_auth.py or DDL-on-startup) adopt them.
+CREATE TABLE IF NOT EXISTS biological_state (
+    adenosine FLOAT,
+    sleep_mode BOOLEAN,
+    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS relationships (
+    user_id TEXT PRIMARY KEY,
+    affinity FLOAT,
+    interaction_count INT,
+    last_interaction TIMESTAMP,
+    name TEXT,
+    secret_phrase TEXT
+);
+ALTER TABLE relationships ADD COLUMN IF NOT EXISTS name TEXT;
+ALTER TABLE relationships ADD COLUMN IF NOT EXISTS secret_phrase TEXT;
+
+CREATE TABLE IF NOT EXISTS chat_logs (
+    id SERIAL PRIMARY KEY,
+    user_id TEXT,
+    message TEXT,
+    response TEXT,
+    biological_state_snapshot JSONB,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    user_id TEXT REFERENCES relationships(user_id),
+    last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO biological_state (adenosine, sleep_mode)
+SELECT 0.0, FALSE
+WHERE NOT EXISTS (SELECT 1 FROM biological_state);
@@ -0,0 +1,9 @@
+-- schema.sql created biological_state_snapshot as TEXT; the app writes JSON
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'chat_logs' AND column_name = 'biological_state_snapshot') = 'text' THEN
+        ALTER TABLE chat_logs
+            ALTER COLUMN biological_state_snapshot TYPE JSONB USING biological_state_snapshot::jsonb;
+    END IF;
+END $$;
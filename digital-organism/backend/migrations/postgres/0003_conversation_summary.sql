@@ -0,0 +1,3 @@
+-- Rolling conversation summary lives next to the relationship
+ALTER TABLE relationships ADD COLUMN IF NOT EXISTS conversation_summary TEXT;
+ALTER TABLE relationships ADD COLUMN IF NOT EXISTS summary_through_id INT;
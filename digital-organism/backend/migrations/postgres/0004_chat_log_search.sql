@@ -0,0 +1,5 @@
+-- Full-text index over past turns for long-term memory recall
+ALTER TABLE chat_logs ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(message, '') || ' ' || coalesce(response, ''))) STORED;
+CREATE INDEX IF NOT EXISTS chat_logs_search_idx ON chat_logs USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS chat_logs_user_id_idx ON chat_logs (user_id, id);
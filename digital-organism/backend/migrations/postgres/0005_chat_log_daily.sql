@@ -0,0 +1,10 @@
+-- Per-user/day rollups that replace archived chat_logs rows
+CREATE TABLE IF NOT EXISTS chat_log_daily (
+    user_id TEXT,
+    day DATE,
+    turns INT,
+    first_at TIMESTAMP,
+    last_at TIMESTAMP,
+    adenosine_total FLOAT,
+    PRIMARY KEY (user_id, day)
+);
@@ -0,0 +1,2 @@
+-- Lets the session sweeper find idle sessions without a full scan
+CREATE INDEX IF NOT EXISTS sessions_last_active_idx ON sessions (last_active);
@@ -0,0 +1,50 @@
+CREATE TABLE IF NOT EXISTS biological_state (
+    id INTEGER PRIMARY KEY,
+    adenosine REAL,
+    sleep_mode BOOLEAN,
+    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS relationships (
+    user_id TEXT PRIMARY KEY,
+    affinity REAL,
+    interaction_count INTEGER,
+    last_interaction TIMESTAMP,
+    name TEXT,
+    secret_phrase TEXT,
+    conversation_summary TEXT,
+    summary_through_id INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS chat_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT,
+    message TEXT,
+    response TEXT,
+    biological_state_snapshot TEXT,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS chat_logs_user_id_idx ON chat_logs (user_id, id);
+
+-- Per-user/day rollups that replace archived chat_logs rows
+CREATE TABLE IF NOT EXISTS chat_log_daily (
+    user_id TEXT,
+    day TEXT,
+    turns INTEGER,
+    first_at TIMESTAMP,
+    last_at TIMESTAMP,
+    adenosine_total REAL,
+    PRIMARY KEY (user_id, day)
+);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    user_id TEXT REFERENCES relationships(user_id),
+    last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS sessions_last_active_idx ON sessions (last_active);
+
+INSERT INTO biological_state (adenosine, sleep_mode)
+SELECT 0.0, 0
+WHERE NOT EXISTS (SELECT 1 FROM biological_state);
@@ -0,0 +1,11 @@
+-- FTS5 mirrors chat_logs for long-term memory recall
+CREATE VIRTUAL TABLE IF NOT EXISTS chat_logs_fts USING fts5(
+    message, response, content='chat_logs', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS chat_logs_fts_insert AFTER INSERT ON chat_logs BEGIN
+    INSERT INTO chat_logs_fts (rowid, message, response) VALUES (new.id, new.message, new.response);
+END;
+CREATE TRIGGER IF NOT EXISTS chat_logs_fts_delete AFTER DELETE ON chat_logs BEGIN
+    INSERT INTO chat_logs_fts (chat_logs_fts, rowid, message, response)
+    VALUES ('delete', old.id, old.message, old.response);
+END;
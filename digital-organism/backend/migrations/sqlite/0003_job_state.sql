@@ -0,0 +1,6 @@
+-- Pause/resume overrides for scheduler jobs, shared by every worker
+CREATE TABLE IF NOT EXISTS job_state (
+    name TEXT PRIMARY KEY,
+    paused BOOLEAN NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,445 @@
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+
+try:
+    import psycopg2
+    from psycopg2.extras import RealDictCursor, execute_values
+except ImportError:
+    psycopg2 = None
+
+try:
+    from .metrics import metrics
+    from .storage import Storage
+except ImportError:
+    from metrics import metrics
+    from storage import Storage
+
+logger = logging.getLogger(__name__)
+
+# Replicas further behind the primary than this are skipped for reads
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get("REPLICA_MAX_LAG_SECONDS", "5"))
+# How long a replica's measured lag (or failure) is trusted before re-checking
+REPLICA_CHECK_INTERVAL = float(os.environ.get("REPLICA_CHECK_INTERVAL", "10"))
+
+# Advisory lock key serializing schema migrations
+MIGRATION_LOCK_KEY = zlib.crc32(b"schema_migrations")
+
+
+class AdvisoryLeaderLock:
+    """Session-level advisory lock held on a dedicated connection.
+
+    Postgres drops the lock as soon as that connection goes away, so a
+    crashed leader frees it for the next worker automatically.
+    """
+
+    def __init__(self, db_url, name):
+        self.db_url = db_url
+        self.key = zlib.crc32(name.encode("utf-8"))
+        self.conn = None
+
+    def try_acquire(self):
+        if self.conn is None or self.conn.closed:
+            self.conn = psycopg2.connect(self.db_url)
+            self.conn.autocommit = True
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_lock(%s)", (self.key,))
+            return cur.fetchone()[0]
+
+    def check(self):
+        """True while our lock connection is still alive (and so the lock held)."""
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except psycopg2.Error:
+            self.conn.close()
+            self.conn = None
+            return False
+
+    def release(self):
+        if self.conn is None:
+            return
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (self.key,))
+        finally:
+            self.conn.close()
+            self.conn = None
+
+
+class PostgresStorage(Storage):
+    """Storage backed by Postgres through psycopg2.
+
+    Read-only, staleness-tolerant callers may ask for `connect(readonly=True)`
+    and get a streaming replica instead of the primary. Replicas are used
+    round-robin, skipped while lagging or unreachable, and the primary is the
+    fallback when none qualifies.
+    """
+
+    dialect = "postgres"
+
+    def __init__(self, db_url, replica_urls=None):
+        if psycopg2 is None:
+            raise RuntimeError("psycopg2 is not installed; use a sqlite:/// DATABASE_URL or install psycopg2-binary.")
+        self.db_url = db_url
+        self.replica_urls = list(replica_urls or [])
+        self._replica_cycle = itertools.cycle(self.replica_urls)
+        # replica url -> (healthy, checked_at)
+        self._replica_health = {}
+        self._replica_lock = threading.Lock()
+
+    @property
+    def has_replicas(self):
+        return bool(self.replica_urls)
+
+    def connect(self, readonly=False, dedicated=False):
+        # Every connection is already dedicated; release() closes it
+        if readonly and self.replica_urls:
+            conn = self._connect_replica()
+            if conn is not None:
+                metrics.incr("db.replica_reads")
+                return conn
+            metrics.incr("db.replica_fallbacks")
+        return psycopg2.connect(self.db_url)
+
+    def _connect_replica(self):
+        now = time.monotonic()
+        for _ in range(len(self.replica_urls)):
+            with self._replica_lock:
+                url = next(self._replica_cycle)
+                healthy, checked_at = self._replica_health.get(url, (True, 0.0))
+            fresh = now - checked_at < REPLICA_CHECK_INTERVAL
+            if fresh and not healthy:
+                continue
+
+            try:
+                conn = psycopg2.connect(url)
+            except psycopg2.Error as e:
+                logger.warning(f"Replica unreachable, skipping for {REPLICA_CHECK_INTERVAL}s: {e}")
+                self._mark_replica(url, False, now)
+                continue
+            if fresh:
+                return conn
+
+            lag = self._replica_lag(conn)
+            if lag is not None and lag <= REPLICA_MAX_LAG_SECONDS:
+                self._mark_replica(url, True, now)
+                return conn
+            logger.warning(f"Replica lagging ({lag}s), falling back.")
+            self._mark_replica(url, False, now)
+            conn.close()
+        return None
+
+    def _mark_replica(self, url, healthy, checked_at):
+        with self._replica_lock:
+            self._replica_health[url] = (healthy, checked_at)
+
+    @staticmethod
+    def _replica_lag(conn):
+        """Seconds of replay lag; 0 when the replica has replayed everything it received."""
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT CASE
+                        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+                    END
+                """)
+                lag = cur.fetchone()[0]
+            conn.commit()
+            return float(lag) if lag is not None else None
+        except psycopg2.Error:
+            conn.rollback()
+            return None
+
+    def release(self, conn):
+        conn.close()
+
+    def leader_lock(self, name):
+        return AdvisoryLeaderLock(self.db_url, name)
+
+    # --- Schema migrations ---
+    def schema_version(self, conn):
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('schema_version') IS NOT NULL")
+            version = 0
+            if cur.fetchone()[0]:
+                cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+                version = cur.fetchone()[0]
+            conn.commit()
+            return version
+
+    def apply_migration(self, conn, version, name, sql):
+        try:
+            with conn.cursor() as cur:
+                # One applier at a time across all workers and deploy hooks
+                cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_KEY,))
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS schema_version (
+                        version INT PRIMARY KEY,
+                        name TEXT,
+                        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                cur.execute("SELECT 1 FROM schema_version WHERE version = %s", (version,))
+                if cur.fetchone():
+                    conn.rollback()
+                    return False
+                cur.execute(sql)
+                cur.execute("INSERT INTO schema_version (version, name) VALUES (%s, %s)", (version, name))
+            conn.commit()
+            return True
+        except Exception:
+            conn.rollback()
+            raise
+
+    # --- Biological state ---
+    def get_biological_state(self, conn):
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SELECT * FROM biological_state LIMIT 1")
+            return cur.fetchone()
+
+    def update_biological_state(self, conn, adenosine_change):
+        with conn.cursor() as cur:
+            # Clamp between 0.0 and 1.0
+            cur.execute("""
+                UPDATE biological_state
+                SET adenosine = GREATEST(LEAST(adenosine + %s, 1.0), 0.0),
+                    last_updated = CURRENT_TIMESTAMP
+                RETURNING adenosine
+            """, (adenosine_change,))
+            conn.commit()
+            return cur.fetchone()[0]
+
+    def set_sleep_mode(self, conn, sleep_mode):
+        with conn.cursor() as cur:
+            cur.execute("UPDATE biological_state SET sleep_mode = %s, last_updated = CURRENT_TIMESTAMP", (sleep_mode,))
+            conn.commit()
+
+    def wake_up(self, conn):
+        with conn.cursor() as cur:
+            cur.execute("""
+                    UPDATE biological_state 
+                    SET adenosine = 0.0, 
+                        sleep_mode = FALSE,
+                        last_updated = CURRENT_TIMESTAMP
+                """)
+            conn.commit()
+
+    # --- Relationships ---
+    def update_relationship(self, conn, user_id, affinity_change):
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                INSERT INTO relationships (user_id, affinity, interaction_count, last_interaction)
+                VALUES (%s, %s, 1, CURRENT_TIMESTAMP)
+                ON CONFLICT (user_id) DO UPDATE
+                SET affinity = relationships.affinity + %s,
+                    interaction_count = relationships.interaction_count + 1,
+                    last_interaction = CURRENT_TIMESTAMP
+                RETURNING affinity, name, secret_phrase, conversation_summary, summary_through_id
+            """, (user_id, affinity_change, affinity_change))
+            conn.commit()
+            return cur.fetchone()
+
+    def get_relationship(self, conn, user_id):
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SELECT * FROM relationships WHERE user_id = %s", (user_id,))
+            return cur.fetchone()
+
+    def apply_relationship_deltas(self, conn, deltas):
+        with conn.cursor() as cur:
+            execute_values(cur, """
+                INSERT INTO relationships (user_id, affinity, interaction_count, last_interaction)
+                VALUES %s
+                ON CONFLICT (user_id) DO UPDATE
+                SET affinity = COALESCE(relationships.affinity, 0.0) + EXCLUDED.affinity,
+                    interaction_count = COALESCE(relationships.interaction_count, 0) + EXCLUDED.interaction_count,
+                    last_interaction = EXCLUDED.last_interaction
+            """, [(d["user_id"], d["affinity"], d["interactions"]) for d in deltas],
+                template="(%s, %s, %s, CURRENT_TIMESTAMP)", page_size=len(deltas))
+            conn.commit()
+
+    def set_name(self, conn, user_id, name):
+        with conn.cursor() as cur:
+            cur.execute("UPDATE relationships SET name = %s WHERE user_id = %s", (name, user_id))
+            conn.commit()
+
+    def set_secret(self, conn, user_id, secret):
+        with conn.cursor() as cur:
+            cur.execute("UPDATE relationships SET secret_phrase = %s WHERE user_id = %s", (secret, user_id))
+            conn.commit()
+
+    def save_summary(self, conn, user_id, summary, through_id):
+        with conn.cursor() as cur:
+            # Never move the watermark backwards if refreshes overlap
+            cur.execute("""
+                UPDATE relationships
+                SET conversation_summary = %s, summary_through_id = %s
+                WHERE user_id = %s AND COALESCE(summary_through_id, 0) < %s
+            """, (summary, through_id, user_id, through_id))
+            conn.commit()
+
+    # --- Sessions ---
+    def get_session(self, conn, session_id):
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT *, EXTRACT(EPOCH FROM NOW() - last_active)::float AS idle_seconds
+                FROM sessions WHERE session_id = %s
+            """, (session_id,))
+            return cur.fetchone()
+
+    def create_session(self, conn, session_id):
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("INSERT INTO sessions (session_id) VALUES (%s) RETURNING *", (session_id,))
+            conn.commit()
+            return cur.fetchone()
+
+    def touch_session(self, conn, session_id, reset_user=False):
+        with conn.cursor() as cur:
+            if reset_user:
+                cur.execute("UPDATE sessions SET user_id = NULL, last_active = NOW() WHERE session_id = %s", (session_id,))
+            else:
+                cur.execute("UPDATE sessions SET last_active = NOW() WHERE session_id = %s", (session_id,))
+            conn.commit()
+
+    def link_session_to_user(self, conn, session_id, user_id, user_name):
+        with conn.cursor() as cur:
+            # Ensure user exists in relationships
+            cur.execute("""
+                INSERT INTO relationships (user_id, name, affinity, interaction_count, last_interaction)
+                VALUES (%s, %s, 0.0, 0, CURRENT_TIMESTAMP)
+                ON CONFLICT (user_id) DO NOTHING
+            """, (user_id, user_name))
+
+            # Link session
+            cur.execute("UPDATE sessions SET user_id = %s WHERE session_id = %s", (user_id, session_id))
+            conn.commit()
+
+    def delete_expired_sessions(self, conn, max_idle_hours, limit):
+        with conn.cursor() as cur:
+            # SKIP LOCKED: never wait on a session a live request is touching
+            cur.execute("""
+                DELETE FROM sessions WHERE session_id IN (
+                    SELECT session_id FROM sessions
+                    WHERE last_active < NOW() - %s * INTERVAL '1 hour'
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+            """, (max_idle_hours, limit))
+            deleted = cur.rowcount
+            conn.commit()
+            return deleted
+
+    # --- Chat logs ---
+    def log_chat(self, conn, user_id, message, response, bio_state_snapshot):
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO chat_logs (user_id, message, response, biological_state_snapshot)
+                VALUES (%s, %s, %s, %s)
+            """, (user_id, message, response, json.dumps(bio_state_snapshot)))
+            conn.commit()
+
+    def get_recent_chat_history(self, conn, user_id, limit=10, after_id=None):
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT id, message, response, timestamp
+                FROM chat_logs
+                WHERE user_id = %s AND id > %s
+                ORDER BY timestamp DESC
+                LIMIT %s
+            """, (user_id, after_id or 0, limit))
+            # Reverse to chronological order
+            return cur.fetchall()[::-1]
+
+    def search_chat_logs(self, conn, user_id, terms, limit, timeout_ms):
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SET LOCAL statement_timeout = %s", (timeout_ms,))
+            cur.execute("""
+                SELECT id, message, response, timestamp,
+                       ts_rank(search_vector, query) AS rank
+                FROM chat_logs, to_tsquery('english', %s) query
+                WHERE user_id = %s AND search_vector @@ query
+                ORDER BY rank DESC
+                LIMIT %s
+            """, (" | ".join(terms), user_id, limit))
+            rows = cur.fetchall()
+        conn.commit()
+        return rows
+
+    def iter_chat_logs(self, conn, user_id=None, since=None, until=None, after_id=0, page_size=1000):
+        # Keyset pages through a named server-side cursor: neither the client
+        # nor a long-lived transaction ever holds the whole result.
+        last_id = after_id or 0
+        while True:
+            conditions, params = ["id > %s"], [last_id]
+            if user_id:
+                conditions.append("user_id = %s")
+                params.append(user_id)
+            if since:
+                conditions.append("timestamp >= %s")
+                params.append(since)
+            if until:
+                conditions.append("timestamp < %s")
+                params.append(until)
+
+            rows = 0
+            with conn.cursor(name="chat_log_export", cursor_factory=RealDictCursor) as cur:
+                cur.itersize = min(page_size, 500)
+                cur.execute(f"""
+                    SELECT id, user_id, message, response, biological_state_snapshot, timestamp
+                    FROM chat_logs
+                    WHERE {" AND ".join(conditions)}
+                    ORDER BY id
+                    LIMIT %s
+                """, params + [page_size])
+                for row in cur:
+                    rows += 1
+                    last_id = row['id']
+                    yield row
+            conn.commit()
+
+            if rows < page_size:
+                break
+
+    def compact_chat_logs(self, conn, first_id, last_id, until, aggregates):
+        with conn.cursor() as cur:
+            cur.executemany("""
+                INSERT INTO chat_log_daily (user_id, day, turns, first_at, last_at, adenosine_total)
+                VALUES (%(user_id)s, %(day)s, %(turns)s, %(first_at)s, %(last_at)s, %(adenosine_total)s)
+                ON CONFLICT (user_id, day) DO UPDATE
+                SET turns = chat_log_daily.turns + EXCLUDED.turns,
+                    first_at = LEAST(chat_log_daily.first_at, EXCLUDED.first_at),
+                    last_at = GREATEST(chat_log_daily.last_at, EXCLUDED.last_at),
+                    adenosine_total = chat_log_daily.adenosine_total + EXCLUDED.adenosine_total
+            """, aggregates)
+            cur.execute(
+                "DELETE FROM chat_logs WHERE id BETWEEN %s AND %s AND timestamp < %s",
+                (first_id, last_id, until)
+            )
+            deleted = cur.rowcount
+            conn.commit()
+            return deleted
+
+    # --- Scheduler ---
+    def get_job_pauses(self, conn):
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SELECT name, paused FROM job_state")
+            return {row["name"]: row["paused"] for row in cur.fetchall()}
+
+    def set_job_paused(self, conn, name, paused):
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO job_state (name, paused, updated_at) VALUES (%s, %s, CURRENT_TIMESTAMP)
+                ON CONFLICT (name) DO UPDATE SET paused = EXCLUDED.paused, updated_at = CURRENT_TIMESTAMP
+            """, (name, paused))
+            conn.commit()
+
+    def clear_job_paused(self, conn, name):
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM job_state WHERE name = %s", (name,))
+            conn.commit()
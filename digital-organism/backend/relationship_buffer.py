@@ -0,0 +1,98 @@
+import threading
+from contextlib import contextmanager
+
+try:
+    from .metrics import metrics
+except ImportError:
+    from metrics import metrics
+
+
+class RelationshipBuffer:
+    """Per-user relationship deltas held in memory between flushes.
+
+    Turns add their affinity change here instead of rewriting the user's row;
+    `flush()` writes everything accumulated as one multi-row upsert. Callers
+    read the stored row inside `reading()` and add `pending(user_id)`, so the
+    value they see always counts every delta exactly once: a flush waits for
+    in-progress reads and holds new ones back only while its upsert commits.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pending = {}
+        # Deltas taken by a flush that has not committed yet
+        self._flushing = {}
+        self._readers = 0
+        self._committing = False
+
+    @contextmanager
+    def reading(self):
+        with self._cond:
+            while self._committing:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    def add(self, user_id, affinity_change, interactions=1):
+        with self._cond:
+            delta = self._pending.setdefault(user_id, [0.0, 0])
+            delta[0] += affinity_change
+            delta[1] += interactions
+            metrics.set_gauge("relationships.pending_users", len(self._pending))
+
+    def pending(self, user_id):
+        """(affinity, interactions) not yet committed for this user."""
+        with self._cond:
+            affinity, interactions = 0.0, 0
+            for deltas in (self._flushing, self._pending):
+                delta = deltas.get(user_id)
+                if delta:
+                    affinity += delta[0]
+                    interactions += delta[1]
+            return affinity, interactions
+
+    def flush(self, storage):
+        """Write all pending deltas in one upsert; returns how many users."""
+        with self._cond:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            self._flushing = batch
+            metrics.set_gauge("relationships.pending_users", 0)
+
+        deltas = [
+            {"user_id": user_id, "affinity": affinity, "interactions": interactions}
+            for user_id, (affinity, interactions) in sorted(batch.items())
+        ]
+        conn = storage.connect()
+        try:
+            with self._cond:
+                self._committing = True
+                while self._readers:
+                    self._cond.wait()
+            try:
+                storage.apply_relationship_deltas(conn, deltas)
+            except Exception:
+                # Keep the deltas for the next flush
+                with self._cond:
+                    for user_id, (affinity, interactions) in batch.items():
+                        delta = self._pending.setdefault(user_id, [0.0, 0])
+                        delta[0] += affinity
+                        delta[1] += interactions
+                raise
+            finally:
+                with self._cond:
+                    self._flushing = {}
+                    self._committing = False
+                    self._cond.notify_all()
+        finally:
+            storage.release(conn)
+
+        metrics.incr("relationships.flushed_users", len(deltas))
+        return len(deltas)
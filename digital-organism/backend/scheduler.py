@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import random
+import time
+
+try:
+    from .metrics import metrics
+except ImportError:
+    from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class JobAlreadyRunning(Exception):
+    pass
+
+
+class Job:
+    """A periodic task run by the Scheduler.
+
+    `func` is a plain (blocking) callable and runs in a worker thread.
+    Singleton jobs only run on the worker currently holding the leader lock;
+    the others run on every worker. `paused` is the default until the job is
+    paused or resumed through the scheduler.
+    """
+
+    def __init__(self, name, func, interval, jitter=0.0, singleton=False, paused=False):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.singleton = singleton
+        self.default_paused = paused
+        self.paused = paused
+
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.last_started = None
+        self.last_duration = None
+        self.last_error = None
+
+    def status(self):
+        return {
+            "name": self.name,
+            "interval": self.interval,
+            "jitter": self.jitter,
+            "singleton": self.singleton,
+            "paused": self.paused,
+            "running": self.running,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_started": self.last_started,
+            "last_duration": self.last_duration,
+            "last_error": self.last_error,
+        }
+
+
+class Scheduler:
+    """Runs periodic jobs on the event loop with jitter and leader election.
+
+    `leader_lock` (see Storage.leader_lock) decides which worker runs the
+    singleton jobs; leadership is re-checked every `leader_check_interval`
+    seconds so a crashed leader is replaced.
+
+    With a `pause_store` (an object with blocking `get_job_pauses()`,
+    `set_job_paused(name, paused)` and `clear_job_paused(name)`, e.g. the
+    Brain), pausing is shared by every worker and survives restarts: the
+    stored state is re-read at most every `leader_check_interval` seconds.
+    Only a state that differs from the job's default is stored; pausing or
+    resuming a job back to its default clears it. Without a store, pauses
+    are per process.
+    """
+
+    def __init__(self, leader_lock=None, leader_check_interval=15.0, pause_store=None):
+        self.jobs = {}
+        self.leader_lock = leader_lock
+        self.pause_store = pause_store
+        self.leader_check_interval = leader_check_interval
+        self.is_leader = leader_lock is None
+        self._tasks = []
+        self._pauses_checked_at = None
+
+    def add_job(self, name, func, interval, jitter=0.0, singleton=False, paused=False):
+        job = Job(name, func, interval, jitter, singleton, paused)
+        self.jobs[name] = job
+        return job
+
+    async def start(self):
+        await self._load_pauses()
+        if self.leader_lock is not None:
+            await self._check_leadership()
+            self._tasks.append(asyncio.create_task(self._leadership_loop()))
+        for job in self.jobs.values():
+            self._tasks.append(asyncio.create_task(self._job_loop(job)))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.leader_lock is not None and self.is_leader:
+            await asyncio.to_thread(self.leader_lock.release)
+            self.is_leader = False
+
+    async def _check_leadership(self):
+        try:
+            if self.is_leader:
+                held = await asyncio.to_thread(self.leader_lock.check)
+            else:
+                held = await asyncio.to_thread(self.leader_lock.try_acquire)
+        except Exception as e:
+            logger.error(f"Leader lock check failed: {e}")
+            held = False
+        if held != self.is_leader:
+            logger.info("Became scheduler leader." if held else "Lost scheduler leadership.")
+        self.is_leader = held
+        metrics.set_gauge("scheduler.is_leader", int(held))
+
+    async def _leadership_loop(self):
+        while True:
+            await asyncio.sleep(self.leader_check_interval)
+            await self._check_leadership()
+
+    async def _load_pauses(self):
+        """Refresh `paused` from the store; keeps the last known state if the
+        store can't be read."""
+        if self.pause_store is None:
+            return
+        # Set before reading so concurrent job loops (and a failing store)
+        # hit the store once per interval, not once per tick
+        self._pauses_checked_at = time.monotonic()
+        try:
+            pauses = await asyncio.to_thread(self.pause_store.get_job_pauses)
+        except Exception as e:
+            logger.error(f"Reading job pauses failed: {e}")
+            return
+        for job in self.jobs.values():
+            job.paused = pauses.get(job.name, job.default_paused)
+
+    async def _refresh_pauses(self):
+        if self._pauses_checked_at is None or time.monotonic() - self._pauses_checked_at >= self.leader_check_interval:
+            await self._load_pauses()
+
+    async def _job_loop(self, job):
+        while True:
+            await asyncio.sleep(job.interval + random.uniform(0, job.jitter))
+            if job.running:
+                continue
+            if job.singleton and not self.is_leader:
+                continue
+            await self._refresh_pauses()
+            if job.paused:
+                continue
+            try:
+                await self.run_job(job.name)
+            except Exception:
+                # Already counted and logged by run_job
+                pass
+
+    async def run_job(self, name):
+        """Run a job now (also used by the admin API) and return its status."""
+        job = self.jobs[name]
+        if job.running:
+            raise JobAlreadyRunning(name)
+
+        job.running = True
+        job.last_started = time.time()
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(job.func)
+            job.last_error = None
+        except Exception as e:
+            job.failures += 1
+            job.last_error = str(e)
+            metrics.incr(f"job.{name}.failures")
+            logger.error(f"Job {name} failed: {e}")
+            raise
+        finally:
+            job.running = False
+            job.runs += 1
+            job.last_duration = time.perf_counter() - start
+            metrics.incr(f"job.{name}.runs")
+            metrics.observe(f"job.{name}.duration", job.last_duration)
+        return job.status()
+
+    async def set_paused(self, name, paused):
+        job = self.jobs[name]
+        if self.pause_store is not None:
+            if paused == job.default_paused:
+                await asyncio.to_thread(self.pause_store.clear_job_paused, name)
+            else:
+                await asyncio.to_thread(self.pause_store.set_job_paused, name, paused)
+        job.paused = paused
+        return job.status()
+
+    async def pause(self, name):
+        return await self.set_paused(name, True)
+
+    async def resume(self, name):
+        return await self.set_paused(name, False)
+
+    def status(self):
+        return {
+            "is_leader": self.is_leader,
+            "jobs": [job.status() for job in self.jobs.values()],
+        }
@@ -0,0 +1,349 @@
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+try:
+    from .storage import Storage
+except ImportError:
+    from storage import Storage
+
+logger = logging.getLogger(__name__)
+
+sqlite3.register_adapter(datetime, lambda dt: dt.isoformat(" "))
+sqlite3.register_converter("TIMESTAMP", lambda raw: datetime.fromisoformat(raw.decode()))
+
+
+class FileLeaderLock:
+    """flock() on a file next to the database; released when the process exits."""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def try_acquire(self):
+        if self.fd is None:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def check(self):
+        return self.fd is not None
+
+    def release(self):
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            self.fd = None
+
+
+class SQLiteStorage(Storage):
+    """Embedded storage for single-node deployments and local tests.
+
+    Each thread keeps one open connection in WAL mode, so a turn costs no
+    connect and no network hop. Readers never block the writer; concurrent
+    writers wait on `busy_timeout` instead of failing. Dedicated connections
+    (see Storage.connect) are opened fresh and closed on release.
+    """
+
+    dialect = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._dedicated = set()
+        self._dedicated_lock = threading.Lock()
+        self.fts_enabled = None
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def connect(self, readonly=False, dedicated=False):
+        if dedicated:
+            conn = self._open()
+            with self._dedicated_lock:
+                self._dedicated.add(conn)
+            return conn
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        return conn
+
+    def release(self, conn):
+        with self._dedicated_lock:
+            dedicated = conn in self._dedicated
+            self._dedicated.discard(conn)
+        if dedicated:
+            conn.close()
+            return
+        # Connections are reused per thread; just make sure nothing is left open
+        if conn.in_transaction:
+            conn.rollback()
+
+    def leader_lock(self, name):
+        return FileLeaderLock(f"{self.path}.{name}.lock")
+
+    # --- Schema migrations ---
+    def schema_version(self, conn):
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+        ).fetchone()
+        if not exists:
+            return 0
+        return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+    def apply_migration(self, conn, version, name, sql):
+        if self.schema_version(conn) >= version:
+            return False
+        # executescript can't take parameters; version and name come from the
+        # migration's file name (NNNN_word.sql), so they are safe to inline.
+        try:
+            conn.executescript(f"""
+                BEGIN IMMEDIATE;
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+                {sql}
+                ;
+                INSERT INTO schema_version (version, name) VALUES ({int(version)}, '{name}');
+                COMMIT;
+            """)
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        return True
+
+    # --- Biological state ---
+    def get_biological_state(self, conn):
+        row = conn.execute("SELECT adenosine, sleep_mode, last_updated FROM biological_state LIMIT 1").fetchone()
+        if row is None:
+            return None
+        state = dict(row)
+        state["sleep_mode"] = bool(state["sleep_mode"])
+        return state
+
+    def update_biological_state(self, conn, adenosine_change):
+        # Clamp between 0.0 and 1.0
+        row = conn.execute("""
+            UPDATE biological_state
+            SET adenosine = MAX(MIN(adenosine + ?, 1.0), 0.0),
+                last_updated = CURRENT_TIMESTAMP
+            RETURNING adenosine
+        """, (adenosine_change,)).fetchone()
+        conn.commit()
+        return row[0]
+
+    def set_sleep_mode(self, conn, sleep_mode):
+        conn.execute("UPDATE biological_state SET sleep_mode = ?, last_updated = CURRENT_TIMESTAMP", (bool(sleep_mode),))
+        conn.commit()
+
+    def wake_up(self, conn):
+        conn.execute("UPDATE biological_state SET adenosine = 0.0, sleep_mode = 0, last_updated = CURRENT_TIMESTAMP")
+        conn.commit()
+
+    # --- Relationships ---
+    def update_relationship(self, conn, user_id, affinity_change):
+        row = conn.execute("""
+            INSERT INTO relationships (user_id, affinity, interaction_count, last_interaction)
+            VALUES (?, ?, 1, CURRENT_TIMESTAMP)
+            ON CONFLICT (user_id) DO UPDATE
+            SET affinity = COALESCE(affinity, 0.0) + excluded.affinity,
+                interaction_count = COALESCE(interaction_count, 0) + 1,
+                last_interaction = CURRENT_TIMESTAMP
+            RETURNING affinity, name, secret_phrase, conversation_summary, summary_through_id
+        """, (user_id, affinity_change)).fetchone()
+        conn.commit()
+        return dict(row)
+
+    def get_relationship(self, conn, user_id):
+        row = conn.execute("SELECT * FROM relationships WHERE user_id = ?", (user_id,)).fetchone()
+        return dict(row) if row else None
+
+    def apply_relationship_deltas(self, conn, deltas):
+        with conn:
+            conn.executemany("""
+                INSERT INTO relationships (user_id, affinity, interaction_count, last_interaction)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (user_id) DO UPDATE
+                SET affinity = COALESCE(affinity, 0.0) + excluded.affinity,
+                    interaction_count = COALESCE(interaction_count, 0) + excluded.interaction_count,
+                    last_interaction = CURRENT_TIMESTAMP
+            """, [(d["user_id"], d["affinity"], d["interactions"]) for d in deltas])
+
+    def set_name(self, conn, user_id, name):
+        conn.execute("UPDATE relationships SET name = ? WHERE user_id = ?", (name, user_id))
+        conn.commit()
+
+    def set_secret(self, conn, user_id, secret):
+        conn.execute("UPDATE relationships SET secret_phrase = ? WHERE user_id = ?", (secret, user_id))
+        conn.commit()
+
+    def save_summary(self, conn, user_id, summary, through_id):
+        conn.execute("""
+            UPDATE relationships
+            SET conversation_summary = ?, summary_through_id = ?
+            WHERE user_id = ? AND COALESCE(summary_through_id, 0) < ?
+        """, (summary, through_id, user_id, through_id))
+        conn.commit()
+
+    # --- Sessions ---
+    def get_session(self, conn, session_id):
+        row = conn.execute("""
+            SELECT *, (julianday('now') - julianday(last_active)) * 86400 AS idle_seconds
+            FROM sessions WHERE session_id = ?
+        """, (session_id,)).fetchone()
+        return dict(row) if row else None
+
+    def create_session(self, conn, session_id):
+        row = conn.execute("INSERT INTO sessions (session_id) VALUES (?) RETURNING *", (session_id,)).fetchone()
+        conn.commit()
+        return dict(row)
+
+    def touch_session(self, conn, session_id, reset_user=False):
+        if reset_user:
+            conn.execute("UPDATE sessions SET user_id = NULL, last_active = CURRENT_TIMESTAMP WHERE session_id = ?", (session_id,))
+        else:
+            conn.execute("UPDATE sessions SET last_active = CURRENT_TIMESTAMP WHERE session_id = ?", (session_id,))
+        conn.commit()
+
+    def link_session_to_user(self, conn, session_id, user_id, user_name):
+        conn.execute("""
+            INSERT INTO relationships (user_id, name, affinity, interaction_count, last_interaction)
+            VALUES (?, ?, 0.0, 0, CURRENT_TIMESTAMP)
+            ON CONFLICT (user_id) DO NOTHING
+        """, (user_id, user_name))
+        conn.execute("UPDATE sessions SET user_id = ? WHERE session_id = ?", (user_id, session_id))
+        conn.commit()
+
+    def delete_expired_sessions(self, conn, max_idle_hours, limit):
+        cur = conn.execute("""
+            DELETE FROM sessions WHERE session_id IN (
+                SELECT session_id FROM sessions
+                WHERE last_active < datetime('now', ?)
+                LIMIT ?
+            )
+        """, (f"-{max_idle_hours} hours", limit))
+        conn.commit()
+        return cur.rowcount
+
+    # --- Chat logs ---
+    def log_chat(self, conn, user_id, message, response, bio_state_snapshot):
+        conn.execute("""
+            INSERT INTO chat_logs (user_id, message, response, biological_state_snapshot)
+            VALUES (?, ?, ?, ?)
+        """, (user_id, message, response, json.dumps(bio_state_snapshot)))
+        conn.commit()
+
+    def get_recent_chat_history(self, conn, user_id, limit=10, after_id=None):
+        rows = conn.execute("""
+            SELECT id, message, response, timestamp
+            FROM chat_logs
+            WHERE user_id = ? AND id > ?
+            ORDER BY id DESC
+            LIMIT ?
+        """, (user_id, after_id or 0, limit)).fetchall()
+        # Reverse to chronological order
+        return [dict(row) for row in rows[::-1]]
+
+    def search_chat_logs(self, conn, user_id, terms, limit, timeout_ms):
+        if self.fts_enabled is None:
+            # Created by migration 0002_chat_logs_fts
+            self.fts_enabled = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'chat_logs_fts'"
+            ).fetchone() is not None
+        if not self.fts_enabled:
+            return []
+
+        # Abort the query once the latency budget is spent
+        deadline = time.monotonic() + timeout_ms / 1000.0
+        conn.set_progress_handler(lambda: time.monotonic() > deadline, 1000)
+        try:
+            rows = conn.execute("""
+                SELECT c.id, c.message, c.response, c.timestamp, bm25(chat_logs_fts) AS rank
+                FROM chat_logs_fts
+                JOIN chat_logs c ON c.id = chat_logs_fts.rowid
+                WHERE chat_logs_fts MATCH ? AND c.user_id = ?
+                ORDER BY rank
+                LIMIT ?
+            """, (" OR ".join(f'"{t}"' for t in terms), user_id, limit)).fetchall()
+        finally:
+            conn.set_progress_handler(None, 0)
+        return [dict(row) for row in rows]
+
+    def iter_chat_logs(self, conn, user_id=None, since=None, until=None, after_id=0, page_size=1000):
+        last_id = after_id or 0
+        while True:
+            conditions, params = ["id > ?"], [last_id]
+            if user_id:
+                conditions.append("user_id = ?")
+                params.append(user_id)
+            if since:
+                conditions.append("timestamp >= ?")
+                params.append(since)
+            if until:
+                conditions.append("timestamp < ?")
+                params.append(until)
+
+            rows = conn.execute(f"""
+                SELECT id, user_id, message, response, biological_state_snapshot, timestamp
+                FROM chat_logs
+                WHERE {" AND ".join(conditions)}
+                ORDER BY id
+                LIMIT ?
+            """, params + [page_size]).fetchall()
+            for row in rows:
+                last_id = row['id']
+                log = dict(row)
+                if log['biological_state_snapshot']:
+                    log['biological_state_snapshot'] = json.loads(log['biological_state_snapshot'])
+                yield log
+
+            if len(rows) < page_size:
+                break
+
+    def compact_chat_logs(self, conn, first_id, last_id, until, aggregates):
+        with conn:
+            conn.executemany("""
+                INSERT INTO chat_log_daily (user_id, day, turns, first_at, last_at, adenosine_total)
+                VALUES (:user_id, :day, :turns, :first_at, :last_at, :adenosine_total)
+                ON CONFLICT (user_id, day) DO UPDATE
+                SET turns = turns + excluded.turns,
+                    first_at = MIN(first_at, excluded.first_at),
+                    last_at = MAX(last_at, excluded.last_at),
+                    adenosine_total = adenosine_total + excluded.adenosine_total
+            """, aggregates)
+            cur = conn.execute(
+                "DELETE FROM chat_logs WHERE id BETWEEN ? AND ? AND timestamp < ?",
+                (first_id, last_id, until)
+            )
+        return cur.rowcount
+
+    # --- Scheduler ---
+    def get_job_pauses(self, conn):
+        return {row["name"]: bool(row["paused"]) for row in conn.execute("SELECT name, paused FROM job_state")}
+
+    def set_job_paused(self, conn, name, paused):
+        conn.execute("""
+            INSERT INTO job_state (name, paused, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (name) DO UPDATE SET paused = excluded.paused, updated_at = CURRENT_TIMESTAMP
+        """, (name, paused))
+        conn.commit()
+
+    def clear_job_paused(self, conn, name):
+        conn.execute("DELETE FROM job_state WHERE name = ?", (name,))
+        conn.commit()
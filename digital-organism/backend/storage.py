@@ -0,0 +1,197 @@
+from abc import ABC, abstractmethod
+
+
+class Storage(ABC):
+    """Persistence for sessions, relationships, biological state and chat logs.
+
+    Methods take a connection obtained from `connect()` so one turn can run
+    all of its reads and writes on a single connection; hand it back with
+    `release()` when done. Rows are returned as plain dicts. A backend that
+    leaves an abstract method out fails when it is constructed.
+    """
+
+    # Picks the migrations/<dialect>/ directory
+    dialect = None
+
+    @property
+    def has_replicas(self):
+        """Whether `connect(readonly=True)` can reach anything but the primary."""
+        return False
+
+    @abstractmethod
+    def connect(self, readonly=False, dedicated=False):
+        """Open a connection; `readonly` allows a (possibly stale) replica.
+
+        `dedicated` asks for a connection no other caller shares, for
+        iterators that may be resumed on a different thread (streamed
+        responses); `release()` closes it.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def release(self, conn):
+        raise NotImplementedError
+
+    def initialize(self):
+        """Bring the schema up to date by applying pending migrations."""
+        try:
+            from .migrate import migrate
+        except ImportError:
+            from migrate import migrate
+        return migrate(self)
+
+    # --- Schema migrations ---
+    @abstractmethod
+    def schema_version(self, conn):
+        """Highest applied migration version, 0 on an empty database."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def apply_migration(self, conn, version, name, sql):
+        """Run one migration and record it in schema_version atomically.
+
+        Returns False (and changes nothing) if another process applied the
+        version first.
+        """
+        raise NotImplementedError
+
+    # --- Biological state ---
+    @abstractmethod
+    def get_biological_state(self, conn):
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_biological_state(self, conn, adenosine_change):
+        """Add `adenosine_change` (clamped to 0..1) and return the new level."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_sleep_mode(self, conn, sleep_mode):
+        raise NotImplementedError
+
+    @abstractmethod
+    def wake_up(self, conn):
+        """Reset adenosine and leave sleep mode."""
+        raise NotImplementedError
+
+    # --- Relationships ---
+    @abstractmethod
+    def update_relationship(self, conn, user_id, affinity_change):
+        """Upsert the relationship, bump its counters and return the row."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_relationship(self, conn, user_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def apply_relationship_deltas(self, conn, deltas):
+        """Add buffered deltas (dicts of user_id, affinity, interactions) to
+        their users' rows in one statement and stamp last_interaction."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_name(self, conn, user_id, name):
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_secret(self, conn, user_id, secret):
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_summary(self, conn, user_id, summary, through_id):
+        """Store a conversation summary unless a newer one is already saved."""
+        raise NotImplementedError
+
+    # --- Sessions ---
+    @abstractmethod
+    def get_session(self, conn, session_id):
+        """The session row plus `idle_seconds` since last_active (DB clock)."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def create_session(self, conn, session_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def touch_session(self, conn, session_id, reset_user=False):
+        raise NotImplementedError
+
+    @abstractmethod
+    def link_session_to_user(self, conn, session_id, user_id, user_name):
+        """Create the user if needed and attach the session to it."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_expired_sessions(self, conn, max_idle_hours, limit):
+        """Delete up to `limit` sessions idle for longer than max_idle_hours
+        and return how many were deleted."""
+        raise NotImplementedError
+
+    # --- Chat logs ---
+    @abstractmethod
+    def log_chat(self, conn, user_id, message, response, bio_state_snapshot):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_recent_chat_history(self, conn, user_id, limit=10, after_id=None):
+        """Most recent turns (newer than after_id), oldest first."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def search_chat_logs(self, conn, user_id, terms, limit, timeout_ms):
+        """Full-text search over a user's turns, best match first."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_chat_logs(self, conn, user_id=None, since=None, until=None, after_id=0, page_size=1000):
+        """Yield chat logs in id order without loading them all at once."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def compact_chat_logs(self, conn, first_id, last_id, until, aggregates):
+        """Atomically fold archived rows into chat_log_daily and delete them.
+
+        `aggregates` is a list of dicts with user_id, day, turns, first_at,
+        last_at and adenosine_total; counts are added to existing days.
+        """
+        raise NotImplementedError
+
+    # --- Scheduler ---
+    @abstractmethod
+    def get_job_pauses(self, conn):
+        """Jobs paused or resumed through the admin API, as {name: paused}."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_job_paused(self, conn, name, paused):
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear_job_paused(self, conn, name):
+        """Forget a stored pause/resume so the job's default applies again."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def leader_lock(self, name):
+        """A lock at most one worker holds at a time, used to elect the
+        scheduler leader. Returns an object with try_acquire(), check() and
+        release(); the lock must die with the process holding it.
+        """
+        raise NotImplementedError
+
+
+def create_storage(db_url, replica_urls=None):
+    """Pick a backend from DATABASE_URL (`sqlite:///path` selects SQLite)."""
+    if db_url and db_url.startswith("sqlite:///"):
+        try:
+            from .sqlite_storage import SQLiteStorage
+        except ImportError:
+            from sqlite_storage import SQLiteStorage
+        return SQLiteStorage(db_url[len("sqlite:///"):])
+
+    try:
+        from .postgres_storage import PostgresStorage
+    except ImportError:
+        from postgres_storage import PostgresStorage
+    return PostgresStorage(db_url, replica_urls)
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from vosk import KaldiRecognizer, Model as VoskModel
+except ImportError:
+    VoskModel = None
+
+try:
+    import numpy
+    from faster_whisper import WhisperModel
+except ImportError:
+    WhisperModel = None
+
+try:
+    from .metrics import metrics
+except ImportError:
+    from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Which recognizer transcribes voice input: "whisper" (faster-whisper),
+# "vosk", or "auto" for the first one installed. Both run locally on CPU.
+STT_ENGINE = os.environ.get("STT_ENGINE", "auto").lower()
+STT_WORKERS = int(os.environ.get("STT_WORKERS", "2"))
+STT_TIMEOUT = float(os.environ.get("STT_TIMEOUT", "30"))
+WHISPER_MODEL = os.environ.get("WHISPER_MODEL", "base.en")
+WHISPER_COMPUTE_TYPE = os.environ.get("WHISPER_COMPUTE_TYPE", "int8")
+VOSK_MODEL_PATH = os.environ.get("VOSK_MODEL_PATH")
+
+
+class STTTimeout(Exception):
+    pass
+
+
+class STTUnavailable(Exception):
+    pass
+
+
+class STTEngine:
+    """A blocking recognizer: `transcribe(pcm, sample_rate)` returns text for
+    16-bit mono PCM. Models load on first use, not at construction."""
+
+    name = None
+    # Sample rates `transcribe` accepts; None for any
+    sample_rates = None
+
+    def __init__(self):
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    def model(self):
+        with self._load_lock:
+            if self._model is None:
+                logger.info(f"Loading {self.name} speech model...")
+                self._model = self.load()
+            return self._model
+
+    def load(self):
+        raise NotImplementedError
+
+    def transcribe(self, pcm, sample_rate):
+        raise NotImplementedError
+
+
+class WhisperEngine(STTEngine):
+    name = "whisper"
+    sample_rates = (16000,)
+
+    def __init__(self, model_size=WHISPER_MODEL, compute_type=WHISPER_COMPUTE_TYPE):
+        super().__init__()
+        self.model_size = model_size
+        self.compute_type = compute_type
+
+    @classmethod
+    def available(cls):
+        return WhisperModel is not None
+
+    def load(self):
+        return WhisperModel(self.model_size, device="cpu", compute_type=self.compute_type)
+
+    def transcribe(self, pcm, sample_rate):
+        if sample_rate != 16000:
+            raise ValueError("faster-whisper expects 16 kHz audio")
+        audio = numpy.frombuffer(pcm, dtype="<i2").astype(numpy.float32) / 32768.0
+        segments, _ = self.model().transcribe(audio, beam_size=1)
+        return " ".join(segment.text.strip() for segment in segments).strip()
+
+
+class VoskEngine(STTEngine):
+    name = "vosk"
+
+    def __init__(self, model_path=VOSK_MODEL_PATH):
+        super().__init__()
+        self.model_path = model_path
+
+    @classmethod
+    def available(cls):
+        return VoskModel is not None and bool(VOSK_MODEL_PATH)
+
+    def load(self):
+        return VoskModel(self.model_path)
+
+    def transcribe(self, pcm, sample_rate):
+        # Recognizers are cheap and not thread-safe; one per utterance
+        recognizer = KaldiRecognizer(self.model(), sample_rate)
+        recognizer.AcceptWaveform(pcm)
+        return json.loads(recognizer.FinalResult()).get("text", "")
+
+
+ENGINES = {"whisper": WhisperEngine, "vosk": VoskEngine}
+
+
+def create_stt_engine(name=STT_ENGINE):
+    """The configured recognizer, or None if none is installed."""
+    if name == "auto":
+        for engine_class in ENGINES.values():
+            if engine_class.available():
+                return engine_class()
+        logger.info("No speech recognizer installed; voice input is disabled.")
+        return None
+    if name not in ENGINES:
+        raise ValueError(f"Unknown STT_ENGINE {name!r}; expected one of {', '.join(ENGINES)} or auto")
+    return ENGINES[name]()
+
+
+class STTService:
+    """Async front for a blocking STTEngine, on its own thread pool."""
+
+    def __init__(self, engine=None, workers=STT_WORKERS, timeout=STT_TIMEOUT):
+        self.engine = engine if engine is not None else create_stt_engine()
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stt")
+
+    @property
+    def available(self):
+        return self.engine is not None
+
+    def supports(self, sample_rate):
+        return self.engine is not None and (
+            self.engine.sample_rates is None or sample_rate in self.engine.sample_rates
+        )
+
+    async def transcribe(self, pcm, sample_rate):
+        if self.engine is None:
+            raise STTUnavailable("No speech recognizer is installed on this server.")
+        loop = asyncio.get_running_loop()
+        with metrics.timer("stt.latency"), metrics.timer(f"stt.{self.engine.name}.latency"):
+            future = loop.run_in_executor(self._pool, self.engine.transcribe, pcm, sample_rate)
+            try:
+                return await asyncio.wait_for(future, self.timeout)
+            except asyncio.TimeoutError:
+                metrics.incr("stt.timeouts")
+                raise STTTimeout(f"STT took longer than {self.timeout}s")
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
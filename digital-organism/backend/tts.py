@@ -0,0 +1,251 @@
+import asyncio
+import io
+import logging
+import os
+import re
+import shutil
+import subprocess
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    from gtts import gTTS
+except ImportError:
+    gTTS = None
+
+try:
+    from .metrics import metrics
+    from .tts_cache import cache_key
+except ImportError:
+    from metrics import metrics
+    from tts_cache import cache_key
+
+logger = logging.getLogger(__name__)
+
+# Which synthesizer voices replies: "espeak" (local espeak-ng, CPU only, no
+# network), "gtts" (Google), or "auto" to use espeak-ng when it is installed.
+TTS_ENGINE = os.environ.get("TTS_ENGINE", "auto").lower()
+ESPEAK_BINARY = os.environ.get("ESPEAK_BINARY", "espeak-ng")
+ESPEAK_VOICE = os.environ.get("ESPEAK_VOICE", "en-us")
+ESPEAK_RATE = int(os.environ.get("ESPEAK_RATE", "175"))
+
+# gTTS is network-bound, so threads are enough; CPU-bound engines can set
+# TTS_USE_PROCESSES=true to synthesize in worker processes instead.
+TTS_WORKERS = int(os.environ.get("TTS_WORKERS", "4"))
+TTS_MAX_CONCURRENCY = int(os.environ.get("TTS_MAX_CONCURRENCY", "8"))
+TTS_TIMEOUT = float(os.environ.get("TTS_TIMEOUT", "15"))
+TTS_USE_PROCESSES = os.environ.get("TTS_USE_PROCESSES", "false").lower() == "true"
+
+# Replies are synthesized sentence by sentence, up to TTS_PIPELINE_DEPTH
+# chunks at a time, so the first audio only waits for the first sentence.
+TTS_PIPELINE_DEPTH = int(os.environ.get("TTS_PIPELINE_DEPTH", "3"))
+TTS_MAX_CHUNK_CHARS = int(os.environ.get("TTS_MAX_CHUNK_CHARS", "200"))
+TTS_MIN_CHUNK_CHARS = 20
+
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+CLAUSE_END = re.compile(r"(?<=[,;:])\s+")
+
+
+class TTSTimeout(Exception):
+    pass
+
+
+class TTSEngine:
+    """A blocking synthesizer: `synthesize(text)` returns audio in `codec`.
+
+    `name` labels the engine's metrics; `voice` identifies everything that
+    changes the audio besides the text (it is part of the cache key).
+    Engines must be picklable so they can run in worker processes.
+    """
+
+    name = None
+    codec = None
+    voice = None
+
+    def synthesize(self, text):
+        raise NotImplementedError
+
+
+class GTTSEngine(TTSEngine):
+    """MP3 from Google TTS; one network round trip per call."""
+
+    name = "gtts"
+    codec = "mp3"
+
+    def __init__(self, lang="en"):
+        self.lang = lang
+        self.voice = f"gtts:{lang}"
+
+    def synthesize(self, text):
+        if gTTS is None:
+            raise RuntimeError("gTTS is not installed.")
+        mp3_fp = io.BytesIO()
+        gTTS(text=text, lang=self.lang).write_to_fp(mp3_fp)
+        return mp3_fp.getvalue()
+
+
+class EspeakEngine(TTSEngine):
+    """WAV from a local espeak-ng process; offline and CPU only."""
+
+    name = "espeak"
+    codec = "wav"
+
+    def __init__(self, voice=ESPEAK_VOICE, rate=ESPEAK_RATE, binary=ESPEAK_BINARY, timeout=TTS_TIMEOUT):
+        self.binary = binary
+        self.espeak_voice = voice
+        self.rate = rate
+        self.timeout = timeout
+        self.voice = f"espeak:{voice}:{rate}"
+
+    @classmethod
+    def available(cls, binary=ESPEAK_BINARY):
+        return shutil.which(binary) is not None
+
+    def synthesize(self, text):
+        # Text goes in on stdin so it is never parsed as an option
+        result = subprocess.run(
+            [self.binary, "--stdout", "--stdin", "-v", self.espeak_voice, "-s", str(self.rate)],
+            input=text.encode("utf-8"),
+            capture_output=True,
+            timeout=self.timeout,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"espeak-ng failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+        return result.stdout
+
+
+ENGINES = {"gtts": GTTSEngine, "espeak": EspeakEngine}
+
+
+def create_engine(name=TTS_ENGINE):
+    if name == "auto":
+        name = "espeak" if EspeakEngine.available() else "gtts"
+    if name not in ENGINES:
+        raise ValueError(f"Unknown TTS_ENGINE {name!r}; expected one of {', '.join(ENGINES)} or auto")
+    logger.info(f"TTS engine: {name}")
+    return ENGINES[name]()
+
+
+def split_sentences(text, max_chars=TTS_MAX_CHUNK_CHARS):
+    """Split a reply into speakable chunks: sentences, with overly long ones
+    cut at clause boundaries and very short ones merged into the next."""
+    pieces = []
+    for sentence in SENTENCE_END.split(text.strip()):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        current = ""
+        for clause in CLAUSE_END.split(sentence):
+            if current and len(current) + len(clause) + 1 > max_chars:
+                pieces.append(current)
+                current = clause
+            else:
+                current = f"{current} {clause}" if current else clause
+        pieces.append(current)
+
+    chunks = []
+    carry = ""
+    for piece in pieces:
+        piece = f"{carry} {piece}" if carry else piece
+        if len(piece) < TTS_MIN_CHUNK_CHARS:
+            carry = piece
+        else:
+            chunks.append(piece)
+            carry = ""
+    if carry:
+        if chunks and len(chunks[-1]) + len(carry) < max_chars:
+            chunks[-1] = f"{chunks[-1]} {carry}"
+        else:
+            chunks.append(carry)
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+class TTSService:
+    """Async front for a blocking TTSEngine.
+
+    Synthesis runs on a dedicated pool so it never blocks the event loop.
+    At most `max_concurrency` requests are in the pool at once (the rest wait
+    their turn) and each one gives up after `timeout` seconds. With a
+    `cache` (see tts_cache.AudioCache), audio already synthesized for the
+    same text, voice and codec is served without touching the pool.
+    """
+
+    def __init__(self, engine=None, cache=None, workers=TTS_WORKERS, max_concurrency=TTS_MAX_CONCURRENCY,
+                 timeout=TTS_TIMEOUT, use_processes=TTS_USE_PROCESSES):
+        self.engine = engine if engine is not None else create_engine()
+        self.codec = self.engine.codec
+        self.cache = cache if cache is not None and cache.enabled else None
+        self.timeout = timeout
+        pool_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        self._pool = pool_class(max_workers=workers)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def synthesize(self, text):
+        if self.cache is None:
+            return await self._synthesize_uncached(text)
+        key = cache_key(text, self.engine.voice, self.codec)
+        audio = self.cache.get(key)
+        if audio is None:
+            audio = await asyncio.to_thread(self.cache.load, key)
+        if audio is not None:
+            return audio
+        audio = await self._synthesize_uncached(text)
+        self.cache.remember(key, audio)
+        # The disk copy isn't needed for this reply, so don't wait for it
+        asyncio.get_running_loop().run_in_executor(None, self.cache.persist, key, audio)
+        return audio
+
+    async def _synthesize_uncached(self, text):
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            with metrics.timer("tts.latency"), metrics.timer(f"tts.{self.engine.name}.latency"):
+                future = loop.run_in_executor(self._pool, self.engine.synthesize, text)
+                try:
+                    return await asyncio.wait_for(future, self.timeout)
+                except asyncio.TimeoutError:
+                    # The worker can't be interrupted; it finishes in the
+                    # background and its result is dropped.
+                    metrics.incr("tts.timeouts")
+                    raise TTSTimeout(f"TTS took longer than {self.timeout}s")
+
+    async def synthesize_stream(self, text, depth=TTS_PIPELINE_DEPTH):
+        """Yield (seq, audio, final) per chunk of `text`, in order.
+
+        Up to `depth` chunks are synthesized ahead of the one being yielded.
+        A chunk that fails is skipped, except the last, which is yielded with
+        empty audio so the consumer still sees `final`.
+        """
+        chunks = split_sentences(text)
+        pending = deque()
+        next_chunk = 0
+        try:
+            for seq in range(len(chunks)):
+                while next_chunk < len(chunks) and len(pending) < depth:
+                    pending.append(asyncio.ensure_future(self.synthesize(chunks[next_chunk])))
+                    next_chunk += 1
+                task = pending.popleft()
+                final = seq == len(chunks) - 1
+                try:
+                    audio = await task
+                except Exception as e:
+                    logger.error(f"TTS failed for chunk {seq}: {e}")
+                    if not final:
+                        continue
+                    audio = b""
+                yield seq, audio, final
+        finally:
+            # Consumer stopped early (disconnect, interrupt): drop the rest
+            for task in pending:
+                task.cancel()
+
+    async def prewarm(self, texts):
+        """Synthesize `texts` into the cache, chunked the way replies are."""
+        if self.cache is None:
+            return
+        for text in texts:
+            async for _ in self.synthesize_stream(text):
+                pass
+        logger.info(f"TTS cache pre-warmed with {len(texts)} phrase(s).")
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+try:
+    from .metrics import metrics
+except ImportError:
+    from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Synthesized audio is cached by (text, voice, codec): a small in-memory LRU
+# in front of a larger directory on disk. TTS_CACHE_DISK_BYTES=0 keeps the
+# cache in memory only; TTS_CACHE_MEMORY_BYTES=0 as well disables it.
+TTS_CACHE_MEMORY_BYTES = int(os.environ.get("TTS_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+TTS_CACHE_DISK_BYTES = int(os.environ.get("TTS_CACHE_DISK_BYTES", str(256 * 1024 * 1024)))
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "organism-tts-cache"))
+
+# When the disk tier is over its cap, evict down to this fraction of it so
+# the next few writes don't each trigger another scan.
+DISK_EVICT_TO = 0.9
+
+
+def cache_key(text, voice, codec):
+    return hashlib.sha256(json.dumps([text, voice, codec]).encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """Two-tier cache for synthesized audio.
+
+    `get()` and `remember()` only touch memory and are cheap enough for the
+    event loop; `load()`, `persist()` and `store()` touch the disk tier and
+    belong in a worker thread. A disk hit is promoted back into memory.
+    """
+
+    def __init__(self, memory_bytes=TTS_CACHE_MEMORY_BYTES, disk_dir=TTS_CACHE_DIR, disk_bytes=TTS_CACHE_DISK_BYTES):
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.disk_dir = disk_dir if disk_bytes > 0 else None
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._disk_size = sum(size for _, _, size in self._disk_entries())
+
+    @property
+    def enabled(self):
+        return self.memory_bytes > 0 or self.disk_dir is not None
+
+    def get(self, key):
+        """Audio from the memory tier, or None."""
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+        if audio is not None:
+            metrics.incr("tts.cache.memory_hits")
+        return audio
+
+    def load(self, key):
+        """Audio from either tier, or None (blocking on a memory miss)."""
+        audio = self.get(key)
+        if audio is not None:
+            return audio
+        if self.disk_dir:
+            path = self._path(key)
+            try:
+                with open(path, "rb") as fh:
+                    audio = fh.read()
+                # mtime doubles as last-use time for eviction
+                os.utime(path)
+            except FileNotFoundError:
+                audio = None
+            except OSError as e:
+                logger.warning(f"TTS cache read failed for {key}: {e}")
+                audio = None
+            if audio is not None:
+                metrics.incr("tts.cache.disk_hits")
+                self.remember(key, audio)
+                return audio
+        metrics.incr("tts.cache.misses")
+        return None
+
+    def store(self, key, audio):
+        """Add audio to both tiers (blocking)."""
+        self.remember(key, audio)
+        self.persist(key, audio)
+
+    def remember(self, key, audio):
+        """Add audio to the memory tier."""
+        if not audio or len(audio) > self.memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_size -= len(old)
+            self._memory[key] = audio
+            self._memory_size += len(audio)
+            while self._memory_size > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= len(evicted)
+            metrics.set_gauge("tts.cache.memory_bytes", self._memory_size)
+
+    def persist(self, key, audio):
+        """Add audio to the disk tier (blocking)."""
+        if not audio or not self.disk_dir or len(audio) > self.disk_bytes:
+            return
+        path = self._path(key)
+        try:
+            old_size = os.path.getsize(path)
+        except OSError:
+            old_size = 0
+        tmp_path = None
+        try:
+            # Write-then-rename so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(audio)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"TTS cache write failed for {key}: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self._lock:
+            self._disk_size += len(audio) - old_size
+            over = self._disk_size > self.disk_bytes
+        if over:
+            self._evict_disk()
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.audio")
+
+    def _disk_entries(self):
+        entries = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith(".audio"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, entry.path, stat.st_size))
+        return entries
+
+    def _evict_disk(self):
+        """Remove least recently used files until under DISK_EVICT_TO of the cap."""
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, _, size in entries)
+        target = self.disk_bytes * DISK_EVICT_TO
+        evicted = 0
+        for _, path, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._disk_size = total
+        metrics.incr("tts.cache.disk_evictions", evicted)
+        metrics.set_gauge("tts.cache.disk_bytes", total)
@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Request, Security
+from fastapi.responses import StreamingResponse
+from fastapi.security.api_key import APIKeyHeader
+from pydantic import BaseModel
+
+try:
+    from .hash_ring import HashRing
+except ImportError:
+    from hash_ring import HashRing
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Comma separated list of Brain replicas, e.g. "http://10.0.0.1:8000,http://10.0.0.2:8000"
+REPLICA_URLS = [u.strip().rstrip("/") for u in os.environ.get("REPLICA_URLS", "").split(",") if u.strip()]
+ROUTER_VNODES = int(os.environ.get("ROUTER_VNODES", "100"))
+ROUTER_LOAD_FACTOR = float(os.environ.get("ROUTER_LOAD_FACTOR", "1.25"))
+ROUTER_TIMEOUT = float(os.environ.get("ROUTER_TIMEOUT", "60"))
+
+BRAIN_API_KEY = os.environ.get("BRAIN_API_KEY")
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+
+# Hop-by-hop headers must not be forwarded by a proxy (RFC 7230 section 6.1).
+HOP_BY_HOP = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade", "host", "content-length",
+}
+
+app = FastAPI()
+ring = HashRing(REPLICA_URLS, vnodes=ROUTER_VNODES, load_factor=ROUTER_LOAD_FACTOR)
+client = httpx.AsyncClient(timeout=ROUTER_TIMEOUT)
+
+
+def routing_key(request: Request, body: bytes):
+    """Extract the user/session id a request belongs to."""
+    for param in ("user_id", "session_id"):
+        if request.query_params.get(param):
+            return request.query_params[param]
+    if body and request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = None
+        if isinstance(payload, dict):
+            for field in ("user_id", "session_id"):
+                if payload.get(field):
+                    return str(payload[field])
+    # Keyless requests (status, admin) still land on a stable replica
+    return request.url.path
+
+
+async def require_api_key(api_key: str = Security(api_key_header)):
+    if BRAIN_API_KEY and api_key != BRAIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Could not validate credentials")
+    return True
+
+
+class Replica(BaseModel):
+    url: str
+
+
+# The ring is only touched from the event loop: these handlers are async so
+# they don't run in the threadpool while proxy() reads it.
+@app.get("/router/replicas")
+async def list_replicas(authorized: bool = Security(require_api_key)):
+    return {"replicas": ring.nodes, "loads": ring.loads}
+
+
+@app.post("/router/replicas")
+async def add_replica(replica: Replica, authorized: bool = Security(require_api_key)):
+    ring.add_node(replica.url.rstrip("/"))
+    logger.info(f"Replica joined: {replica.url}")
+    return {"replicas": ring.nodes}
+
+
+@app.delete("/router/replicas")
+async def remove_replica(url: str, authorized: bool = Security(require_api_key)):
+    ring.remove_node(url.rstrip("/"))
+    logger.info(f"Replica left: {url}")
+    return {"replicas": ring.nodes}
+
+
+@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+async def proxy(path: str, request: Request):
+    body = await request.body()
+    key = routing_key(request, body)
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP}
+
+    tried = set()
+    while True:
+        node = ring.acquire(key, exclude=tried)
+        if node is None:
+            raise HTTPException(status_code=502, detail="No replica available")
+        tried.add(node)
+        upstream = client.build_request(
+            request.method,
+            f"{node}/{path}",
+            params=request.query_params,
+            headers=headers,
+            content=body,
+        )
+        try:
+            response = await client.send(upstream, stream=True)
+        except httpx.TransportError as e:
+            ring.release(node)
+            logger.warning(f"Replica {node} unreachable for key {key}: {e}")
+            continue
+        except BaseException:
+            ring.release(node)
+            raise
+        break
+
+    async def body_stream():
+        # Runs on every exit, including a client disconnecting mid-stream
+        # (which skips background tasks) and upstream errors.
+        try:
+            async for chunk in response.aiter_raw():
+                yield chunk
+        finally:
+            try:
+                await response.aclose()
+            finally:
+                ring.release(node)
+
+    return StreamingResponse(
+        body_stream(),
+        status_code=response.status_code,
+        headers={k: v for k, v in response.headers.items() if k.lower() not in HOP_BY_HOP},
+    )
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await client.aclose()
@@ -0,0 +1,138 @@
+import math
+import os
+import sys
+from array import array
+from operator import mul
+
+# Energy-based endpointing for 16-bit mono PCM. Speech starts after
+# VAD_START_MS of frames louder than VAD_ENERGY_THRESHOLD (RMS) and ends
+# after VAD_END_SILENCE_MS of quieter ones; VAD_PREROLL_MS of audio from
+# before the start is kept so the first syllable isn't clipped.
+VAD_FRAME_MS = 20
+VAD_ENERGY_THRESHOLD = float(os.environ.get("VAD_ENERGY_THRESHOLD", "500"))
+VAD_START_MS = int(os.environ.get("VAD_START_MS", "60"))
+VAD_END_SILENCE_MS = int(os.environ.get("VAD_END_SILENCE_MS", "700"))
+VAD_PREROLL_MS = int(os.environ.get("VAD_PREROLL_MS", "300"))
+VAD_MAX_UTTERANCE_SECONDS = float(os.environ.get("VAD_MAX_UTTERANCE_SECONDS", "30"))
+
+SAMPLE_WIDTH = 2
+# Input rates the endpointer accepts; each gives whole 20ms frames
+SAMPLE_RATES = (8000, 16000, 24000, 32000, 44100, 48000)
+
+
+def frame_rms(frame):
+    """RMS level of a little-endian 16-bit PCM frame."""
+    samples = array("h", frame)
+    if sys.byteorder == "big":
+        samples.byteswap()
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(map(mul, samples, samples)) / len(samples))
+
+
+class RingBuffer:
+    """Fixed-capacity byte buffer that overwrites its oldest bytes."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._data = bytearray(capacity)
+        self._end = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def write(self, data):
+        if len(data) >= self.capacity:
+            data = data[-self.capacity:]
+        first = min(len(data), self.capacity - self._end)
+        self._data[self._end:self._end + first] = data[:first]
+        self._data[:len(data) - first] = data[first:]
+        self._end = (self._end + len(data)) % self.capacity
+        self._size = min(self._size + len(data), self.capacity)
+
+    def tail(self, n):
+        """The last `n` bytes written (fewer if the buffer holds less)."""
+        n = min(n, self._size)
+        start = (self._end - n) % self.capacity
+        if start + n <= self.capacity:
+            return bytes(self._data[start:start + n])
+        return bytes(self._data[start:] + self._data[:self._end])
+
+    def clear(self):
+        self._end = 0
+        self._size = 0
+
+
+class Endpointer:
+    """Splits a stream of PCM chunks into utterances.
+
+    `feed()` takes chunks of any size and returns the utterances completed
+    by them as (pcm, trailing_silence_seconds). Memory is bounded by one
+    ring buffer holding the longest allowed utterance plus pre-roll; an
+    utterance that reaches the limit is cut there.
+    """
+
+    def __init__(self, sample_rate=16000, threshold=VAD_ENERGY_THRESHOLD, start_ms=VAD_START_MS,
+                 end_silence_ms=VAD_END_SILENCE_MS, preroll_ms=VAD_PREROLL_MS,
+                 max_utterance_seconds=VAD_MAX_UTTERANCE_SECONDS):
+        if sample_rate not in SAMPLE_RATES:
+            raise ValueError(f"Unsupported sample rate {sample_rate!r}")
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.frame_bytes = sample_rate * VAD_FRAME_MS // 1000 * SAMPLE_WIDTH
+        self.start_frames = max(1, start_ms // VAD_FRAME_MS)
+        self.end_frames = max(1, end_silence_ms // VAD_FRAME_MS)
+        self.preroll_frames = preroll_ms // VAD_FRAME_MS
+        self.max_frames = max(self.start_frames + 1, int(max_utterance_seconds * 1000) // VAD_FRAME_MS)
+        self._ring = RingBuffer((self.max_frames + self.preroll_frames) * self.frame_bytes)
+        self._partial = b""
+        self.reset()
+
+    def reset(self):
+        self.in_speech = False
+        self._voiced_run = 0
+        self._silence_run = 0
+        self._segment_frames = 0
+        self._ring.clear()
+
+    def feed(self, chunk):
+        utterances = []
+        data = self._partial + chunk
+        whole = len(data) - len(data) % self.frame_bytes
+        self._partial = data[whole:]
+        for offset in range(0, whole, self.frame_bytes):
+            utterance = self._frame(data[offset:offset + self.frame_bytes])
+            if utterance is not None:
+                utterances.append(utterance)
+        return utterances
+
+    def flush(self):
+        """End the current utterance now (client said it stopped talking)."""
+        self._partial = b""
+        if not self.in_speech:
+            self.reset()
+            return None
+        return self._finish()
+
+    def _frame(self, frame):
+        self._ring.write(frame)
+        voiced = frame_rms(frame) >= self.threshold
+        if not self.in_speech:
+            self._voiced_run = self._voiced_run + 1 if voiced else 0
+            if self._voiced_run >= self.start_frames:
+                self.in_speech = True
+                self._silence_run = 0
+                self._segment_frames = self._voiced_run + self.preroll_frames
+            return None
+        self._segment_frames += 1
+        self._silence_run = 0 if voiced else self._silence_run + 1
+        if self._silence_run >= self.end_frames or self._segment_frames >= self.max_frames:
+            return self._finish()
+        return None
+
+    def _finish(self):
+        pcm = self._ring.tail(self._segment_frames * self.frame_bytes)
+        silence = self._silence_run * VAD_FRAME_MS / 1000
+        self.reset()
+        return pcm, silence
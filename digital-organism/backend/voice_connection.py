@@ -0,0 +1,211 @@
+import asyncio
+import base64
+import json
+import os
+import time
+from collections import OrderedDict, deque
+
+try:
+    from .metrics import metrics
+    from .voice_frames import encode_audio_frame
+except ImportError:
+    from metrics import metrics
+    from voice_frames import encode_audio_frame
+
+# Turns one /ws/chat connection may have in progress at once
+WS_MAX_INFLIGHT = int(os.environ.get("WS_MAX_INFLIGHT", "4"))
+
+# Frames queued for a client that isn't reading them are capped; past either
+# limit the connection is closed rather than buffering without bound.
+WS_MAX_QUEUE_FRAMES = int(os.environ.get("WS_MAX_QUEUE_FRAMES", "512"))
+WS_MAX_QUEUE_BYTES = int(os.environ.get("WS_MAX_QUEUE_BYTES", str(8 * 1024 * 1024)))
+
+# The server pings every WS_PING_INTERVAL seconds; a connection that has
+# sent nothing (not even a pong) for WS_IDLE_TIMEOUT seconds is closed.
+WS_PING_INTERVAL = float(os.environ.get("WS_PING_INTERVAL", "20"))
+WS_IDLE_TIMEOUT = float(os.environ.get("WS_IDLE_TIMEOUT", "60"))
+
+# Close codes
+CLOSE_IDLE = 1001
+CLOSE_OVERLOADED = 1013
+
+
+class _Outbox:
+    def __init__(self):
+        self.frames = deque()
+        self.closed = False
+
+
+class VoiceConnection:
+    """Outbound side of one /ws/chat socket.
+
+    Everything is queued here and written by a single `writer()` task, so
+    turns never write to the socket themselves. Turns may run concurrently,
+    but their frames are delivered in turn order: a turn's frames wait until
+    every earlier turn has closed. Control frames (hello, aborted, errors)
+    skip ahead of turn frames, followed by the pending state frame, if any.
+    Must be used from a single event loop.
+
+    `on_buffered(delta)` is told whenever the bytes queued here change.
+    """
+
+    def __init__(self, websocket, on_buffered=None, max_queue_frames=WS_MAX_QUEUE_FRAMES,
+                 max_queue_bytes=WS_MAX_QUEUE_BYTES):
+        self.websocket = websocket
+        self.binary_audio = False
+        self.max_queue_frames = max_queue_frames
+        self.max_queue_bytes = max_queue_bytes
+        self.queued_frames = 0
+        self.queued_bytes = 0
+        self.overloaded = False
+        self.last_received = time.monotonic()
+        self._on_buffered = on_buffered
+        self._control = deque()
+        # Newest state broadcast not yet written, and the last one queued
+        self._state = None
+        self._last_state = None
+        self._turns = OrderedDict()
+        self._wakeup = asyncio.Event()
+
+    def touch(self):
+        """Record that the client sent something."""
+        self.last_received = time.monotonic()
+
+    def send_control(self, frame):
+        self._push(self._control, "text", json.dumps(frame))
+
+    def send_state(self, payload):
+        """Queue a pre-serialized state frame, replacing one still unsent.
+
+        Never closes the connection: if the queue is full the frame is
+        dropped, since the next broadcast supersedes it anyway.
+        """
+        if self.overloaded or payload == self._last_state:
+            return
+        if self._state is not None:
+            metrics.incr("voice.state_coalesced")
+            self._account(-1, -len(self._state))
+            self._state = None
+        if self.queued_frames + 1 > self.max_queue_frames or self.queued_bytes + len(payload) > self.max_queue_bytes:
+            metrics.incr("voice.state_dropped")
+            return
+        self._state = payload
+        self._last_state = payload
+        self._account(1, len(payload))
+        self._wakeup.set()
+
+    def open_turn(self, message_id):
+        self._turns[message_id] = _Outbox()
+
+    def send(self, message_id, frame):
+        outbox = self._turns.get(message_id)
+        if outbox is None:
+            # Dropped (interrupted); nothing more goes out for it
+            return
+        self._push(outbox.frames, "text", json.dumps(frame))
+
+    def send_audio(self, message_id, request_id, audio, seq, final, codec):
+        outbox = self._turns.get(message_id)
+        if outbox is None:
+            return
+        if self.binary_audio:
+            # Negotiated clients get raw bytes behind a 12-byte header (see voice_frames)
+            self._push(outbox.frames, "bytes", encode_audio_frame(audio, message_id, seq, codec, final))
+        else:
+            # Legacy clients: base64 inside JSON
+            self._push(outbox.frames, "text", json.dumps({
+                "type": "audio", "request_id": request_id, "message_id": message_id, "seq": seq, "final": final,
+                "codec": codec, "data": base64.b64encode(audio).decode("utf-8"),
+            }))
+
+    def close_turn(self, message_id):
+        outbox = self._turns.get(message_id)
+        if outbox is not None:
+            outbox.closed = True
+            self._wakeup.set()
+
+    def drop_turn(self, message_id):
+        """Forget a turn, including frames queued but not yet written."""
+        outbox = self._turns.pop(message_id, None)
+        if outbox is None:
+            return False
+        for _, payload in outbox.frames:
+            self._account(-1, -len(payload))
+        self._wakeup.set()
+        return True
+
+    def release(self):
+        """Drop everything still queued (the connection is going away)."""
+        for message_id in list(self._turns):
+            self.drop_turn(message_id)
+        for _, payload in self._control:
+            self._account(-1, -len(payload))
+        self._control.clear()
+        if self._state is not None:
+            self._account(-1, -len(self._state))
+            self._state = None
+
+    def _push(self, frames, kind, payload):
+        if self.overloaded:
+            return
+        if self.queued_frames + 1 > self.max_queue_frames or self.queued_bytes + len(payload) > self.max_queue_bytes:
+            # The client isn't keeping up; the writer closes the connection
+            self.overloaded = True
+            metrics.incr("voice.send_queue_overflows")
+        else:
+            frames.append((kind, payload))
+            self._account(1, len(payload))
+        self._wakeup.set()
+
+    def _account(self, frames, size):
+        self.queued_frames += frames
+        self.queued_bytes += size
+        if self._on_buffered is not None:
+            self._on_buffered(size)
+
+    def _next_frame(self):
+        if self._control:
+            return self._control.popleft()
+        if self._state is not None:
+            frame, self._state = ("text", self._state), None
+            return frame
+        while self._turns:
+            message_id, outbox = next(iter(self._turns.items()))
+            if outbox.frames:
+                return outbox.frames.popleft()
+            if not outbox.closed:
+                # Later turns wait for this one
+                return None
+            del self._turns[message_id]
+        return None
+
+    async def writer(self):
+        """Write queued frames until the connection overflows its queue."""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while True:
+                if self.overloaded:
+                    await self.websocket.close(code=CLOSE_OVERLOADED)
+                    return
+                frame = self._next_frame()
+                if frame is None:
+                    break
+                kind, payload = frame
+                try:
+                    if kind == "bytes":
+                        await self.websocket.send_bytes(payload)
+                    else:
+                        await self.websocket.send_text(payload)
+                finally:
+                    self._account(-1, -len(payload))
+
+    async def heartbeat(self, ping_interval=WS_PING_INTERVAL, idle_timeout=WS_IDLE_TIMEOUT):
+        """Ping the client; return (after closing) once it has gone quiet."""
+        while True:
+            await asyncio.sleep(min(ping_interval, idle_timeout))
+            if time.monotonic() - self.last_received > idle_timeout:
+                metrics.incr("voice.idle_closed")
+                await self.websocket.close(code=CLOSE_IDLE)
+                return
+            self.send_control({"type": "ping"})
@@ -0,0 +1,39 @@
+import struct
+
+# Binary audio frame on /ws/chat:
+#   version u8 | codec u8 | flags u8 | reserved u8 | message_id u32 | seq u32
+# followed by the raw audio bytes. All integers big-endian.
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct("!BBBBII")
+
+CODECS = {"mp3": 1, "wav": 2, "pcm16": 3, "opus": 4}
+CODEC_NAMES = {number: name for name, number in CODECS.items()}
+
+FLAG_FINAL = 0x01
+
+
+class FrameError(ValueError):
+    pass
+
+
+def encode_audio_frame(audio, message_id, seq, codec="mp3", final=False):
+    flags = FLAG_FINAL if final else 0
+    return FRAME_HEADER.pack(FRAME_VERSION, CODECS[codec], flags, 0, message_id, seq) + audio
+
+
+def decode_audio_frame(frame):
+    """Split a binary frame into (header dict, audio bytes)."""
+    if len(frame) < FRAME_HEADER.size:
+        raise FrameError("Frame shorter than its header")
+    version, codec, flags, _, message_id, seq = FRAME_HEADER.unpack_from(frame)
+    if version != FRAME_VERSION:
+        raise FrameError(f"Unsupported frame version {version}")
+    if codec not in CODEC_NAMES:
+        raise FrameError(f"Unknown codec {codec}")
+    header = {
+        "codec": CODEC_NAMES[codec],
+        "message_id": message_id,
+        "seq": seq,
+        "final": bool(flags & FLAG_FINAL),
+    }
+    return header, frame[FRAME_HEADER.size:]
@@ -1,20 +1,35 @@
 import asyncio
-import json
 import base64
+import binascii
+import json
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import List
+from contextlib import aclosing
+from typing import Dict, Optional, Set, Tuple
 import logging
-
-# Try importing Chatterbox, handle failure gracefully for now
+import time
+import uuid
 try:
-    # from chatterbox.tts import ChatterboxTTS
-    # model = ChatterboxTTS.from_pretrained(device="cpu") # Use CPU for safety first
-    # For now, we'll mock it until installation completes and we verify it works
-    model = None
-    print("Chatterbox not yet loaded (installation pending).")
+    from .broadcast import Broadcaster
+    from .executor import ExecutorFull
+    from .lanes import LaneFull
+    from .metrics import metrics
+    from .stt import STTService
+    from .tts import TTSService
+    from .tts_cache import AudioCache
+    from .voice_connection import WS_IDLE_TIMEOUT, WS_MAX_INFLIGHT, WS_PING_INTERVAL, VoiceConnection
+    from .vad import SAMPLE_RATES, Endpointer
+    from .voice_frames import CODECS, FRAME_VERSION
 except ImportError:
-    model = None
-    print("Chatterbox not found.")
+    from broadcast import Broadcaster
+    from executor import ExecutorFull
+    from lanes import LaneFull
+    from metrics import metrics
+    from stt import STTService
+    from tts import TTSService
+    from tts_cache import AudioCache
+    from voice_connection import WS_IDLE_TIMEOUT, WS_MAX_INFLIGHT, WS_PING_INTERVAL, VoiceConnection
+    from vad import SAMPLE_RATES, Endpointer
+    from voice_frames import CODECS, FRAME_VERSION
 
 router = APIRouter()
 
@@ -22,87 +37,317 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class ConnectionManager:
+    """Live /ws/chat connections, plus the bytes queued across all of them."""
+
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.active_connections: Set[VoiceConnection] = set()
+        self.buffered_bytes = 0
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket) -> VoiceConnection:
         await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        conn = VoiceConnection(websocket, on_buffered=self._buffered)
+        self.active_connections.add(conn)
+        metrics.set_gauge("voice.connections", len(self.active_connections))
+        return conn
 
-    async def send_text(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
+    def disconnect(self, conn: VoiceConnection):
+        conn.release()
+        self.active_connections.discard(conn)
+        metrics.set_gauge("voice.connections", len(self.active_connections))
 
-    async def send_audio(self, audio_data: bytes, websocket: WebSocket):
-        # Send as binary or base64? Let's use base64 JSON for metadata support
-        encoded = base64.b64encode(audio_data).decode('utf-8')
-        await websocket.send_json({"type": "audio", "data": encoded})
+    def _buffered(self, delta):
+        self.buffered_bytes += delta
+        metrics.set_gauge("voice.buffered_bytes", self.buffered_bytes)
 
 manager = ConnectionManager()
+tts_service = TTSService(cache=AudioCache())
+stt_service = STTService()
+# Mood and sleep state, pushed to connections that subscribe to "state"
+state_broadcaster = Broadcaster("voice.state")
+
+async def run_turn(conn: VoiceConnection, user_id: str, user_text: Optional[str], message_id: int,
+                   request_id: Optional[str], speech: Optional[Tuple[bytes, int, float]] = None):
+    """One turn: the brain's reply, then its audio, sentence by sentence.
+
+    Spoken turns pass `speech` as (pcm, sample_rate, speech_ended_at) instead
+    of text and are transcribed first. Runs as its own task so an interrupt
+    can cancel it at any await. Frames go through the connection's outbox,
+    which delivers turns in order.
+    """
+    brain = conn.websocket.app.state.brain
+    speech_ended_at = None
+    try:
+        if speech is not None:
+            pcm, sample_rate, speech_ended_at = speech
+            try:
+                user_text = await stt_service.transcribe(pcm, sample_rate)
+            except Exception as e:
+                logger.error(f"STT Error: {e}")
+                conn.send(message_id, {
+                    "type": "error", "request_id": request_id, "message_id": message_id,
+                    "content": "Could not transcribe audio.", "status": 500,
+                })
+                return
+            conn.send(message_id, {
+                "type": "transcript", "request_id": request_id, "message_id": message_id, "content": user_text,
+            })
+            if not user_text.strip():
+                return
+
+        # 1. Generate AI Response (Text) via Brain, in this session's lane. If the
+        # turn is cancelled while still queued in the lane it never runs; once
+        # the sampler call has started it finishes and its reply is dropped.
+        lanes = conn.websocket.app.state.chat_lanes
+        executor = conn.websocket.app.state.chat_executor
+        try:
+            result = await lanes.run(user_id, executor.run, brain.process_message, user_id, user_text)
+        except (LaneFull, ExecutorFull) as e:
+            status = 429 if isinstance(e, LaneFull) else 503
+            conn.send(message_id, {
+                "type": "error", "request_id": request_id, "message_id": message_id,
+                "content": "Busy, please retry.", "status": status,
+            })
+            return
+        ai_text = result["response"]
+
+        conn.send(message_id, {
+            "type": "text", "request_id": request_id, "message_id": message_id,
+            "content": ai_text, "mood": result["mood"],
+        })
+
+        # 2. Generate Audio (TTS), sentence by sentence so playback starts
+        # after the first one is synthesized. aclosing() makes a cancel stop
+        # the pipeline too, so sentences synthesizing ahead are dropped.
+        try:
+            started = time.perf_counter()
+            first = True
+            async with aclosing(tts_service.synthesize_stream(ai_text)) as frames:
+                async for seq, audio_bytes, final in frames:
+                    if first:
+                        now = time.perf_counter()
+                        metrics.observe("voice.first_audio_latency", now - started)
+                        if speech_ended_at is not None:
+                            # What a speaking user waits for after going quiet
+                            metrics.observe("voice.speech_to_first_audio", now - speech_ended_at)
+                        first = False
+                    conn.send_audio(message_id, request_id, audio_bytes, seq, final, tts_service.codec)
+            logger.info(f"Sent audio response ({tts_service.engine.name}).")
+        except Exception as e:
+            logger.error(f"TTS Error: {e}")
+    finally:
+        conn.close_turn(message_id)
 
 @router.websocket("/ws/chat")
 async def websocket_endpoint(websocket: WebSocket):
     # No API Key required
-    await manager.connect(websocket)
-    brain = websocket.app.state.brain
-    
-    # Generate a temporary user ID for WebSocket connections if not provided
-    # In a real app, we'd expect a handshake or token.
-    user_id = "voice_user_1" 
-    
-    try:
+    conn = await manager.connect(websocket)
+    # Audio framing: "binary" if asked for via ?audio=binary or a hello message
+    conn.binary_audio = websocket.query_params.get("audio") == "binary"
+    if "state" in websocket.query_params.get("subscribe", "").split(","):
+        state_broadcaster.subscribe(conn)
+
+    # Each socket is its own session, and so its own chat lane, unless the
+    # client resumes one with ?session_id=. Sockets sharing a session are
+    # serialized like /chat calls for it; other users never wait on them.
+    user_id = websocket.query_params.get("session_id") or f"voice-{uuid.uuid4().hex}"
+    message_id = 0
+    # Turns not finished yet: message_id -> (request_id, task), oldest first
+    turns: Dict[int, Tuple[Optional[str], asyncio.Task]] = {}
+
+    # Voice input: PCM16 mono chunks cut into utterances by energy VAD
+    endpointer: Optional[Endpointer] = None
+    audio_request_id = None
+    audio_refused = False
+    # Set by an audio_start we refused: its audio is dropped, not misread
+    audio_rejected = False
+
+    def start_turn(user_text, request_id, speech=None):
+        nonlocal message_id
+        if len(turns) >= WS_MAX_INFLIGHT:
+            metrics.incr("voice.rejected_turns")
+            conn.send_control({
+                "type": "error", "request_id": request_id,
+                "content": "Too many requests in flight, please retry.", "status": 429,
+            })
+            return
+        message_id += 1
+        conn.open_turn(message_id)
+        task = asyncio.create_task(run_turn(conn, user_id, user_text, message_id, request_id, speech))
+        turns[message_id] = (request_id, task)
+        task.add_done_callback(lambda _, turn_id=message_id: turns.pop(turn_id, None))
+
+    def interrupt(target_message_id=None, target_request_id=None):
+        # Stop generation and streaming for the matching turns (all by default)
+        for turn_id, (request_id, task) in list(turns.items()):
+            if target_message_id is not None and turn_id != target_message_id:
+                continue
+            if target_request_id is not None and request_id != target_request_id:
+                continue
+            task.cancel()
+            turns.pop(turn_id, None)
+            conn.drop_turn(turn_id)
+            metrics.incr("voice.interrupted_turns")
+            conn.send_control({"type": "aborted", "request_id": request_id, "message_id": turn_id})
+
+    def bad_audio(content):
+        # Bad input fails on its own; turns in flight carry on
+        conn.send_control({"type": "error", "request_id": audio_request_id, "content": content, "status": 400})
+
+    def start_audio(sample_rate=16000):
+        nonlocal endpointer, audio_refused, audio_rejected
+        if not stt_service.available:
+            if audio_refused:
+                return False
+            audio_refused = True
+            conn.send_control({
+                "type": "error", "request_id": audio_request_id,
+                "content": "Voice input is not available on this server.", "status": 501,
+            })
+            return False
+        if sample_rate not in SAMPLE_RATES or not stt_service.supports(sample_rate):
+            # Refused now rather than after a whole utterance was recorded
+            rates = [rate for rate in SAMPLE_RATES if stt_service.supports(rate)]
+            bad_audio(f"Unsupported sample_rate; use one of {rates}.")
+            endpointer = None
+            audio_rejected = True
+            return False
+        if endpointer is None or endpointer.sample_rate != sample_rate:
+            endpointer = Endpointer(sample_rate)
+        return True
+
+    def end_utterance(pcm, trailing_silence):
+        # The user actually stopped talking `trailing_silence` seconds ago
+        metrics.incr("voice.utterances")
+        speech = (pcm, endpointer.sample_rate, time.perf_counter() - trailing_silence)
+        start_turn(None, audio_request_id, speech)
+
+    def feed_audio(chunk):
+        if audio_rejected or (endpointer is None and not start_audio()):
+            return
+        was_speaking = endpointer.in_speech
+        for pcm, trailing_silence in endpointer.feed(chunk):
+            end_utterance(pcm, trailing_silence)
+            was_speaking = False
+        if endpointer.in_speech and not was_speaking:
+            conn.send_control({"type": "speech_started", "request_id": audio_request_id})
+
+    async def reader():
+        nonlocal audio_request_id, audio_rejected
         while True:
-            data = await websocket.receive_text()
-            # Expecting JSON: {"type": "text"|"audio"|"interrupt", "content": ...}
+            raw = await websocket.receive()
+            if raw["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(raw.get("code", 1000), raw.get("reason"))
+            conn.touch()
+            if raw.get("bytes") is not None:
+                feed_audio(raw["bytes"])
+                continue
+            data = raw.get("text") or ""
+            # Expecting JSON: {"type": "text"|"audio"|"interrupt"|..., "request_id": ..., "content": ...}
             try:
                 message = json.loads(data)
             except json.JSONDecodeError:
                 continue
+            if not isinstance(message, dict):
+                continue
+            message_type = message.get("type")
+            request_id = message.get("request_id")
 
-            if message["type"] == "interrupt":
-                # Stop any current generation/streaming
+            if message_type == "hello":
+                conn.binary_audio = message.get("audio") == "binary"
+                conn.send_control({
+                    "type": "hello",
+                    "request_id": request_id,
+                    "audio": "binary" if conn.binary_audio else "base64",
+                    "frame_version": FRAME_VERSION,
+                    "codecs": list(CODECS),
+                    "max_inflight": WS_MAX_INFLIGHT,
+                })
+                continue
+
+            if message_type in ("subscribe", "unsubscribe"):
+                channels = [c for c in message.get("channels", ["state"]) if c == "state"]
+                if channels:
+                    if message_type == "subscribe":
+                        state_broadcaster.subscribe(conn)
+                    else:
+                        state_broadcaster.unsubscribe(conn)
+                conn.send_control({"type": f"{message_type}d", "request_id": request_id, "channels": channels})
+                continue
+
+            if message_type == "ping":
+                conn.send_control({"type": "pong", "request_id": request_id})
+                continue
+
+            if message_type == "interrupt":
                 logger.info("Interruption signal received.")
-                # TODO: Implement cancellation logic
+                interrupt(message.get("message_id"), message.get("target_request_id"))
+                continue
+
+            if message_type == "text":
+                content = message.get("content")
+                if not isinstance(content, str) or not content.strip():
+                    # A bad message fails on its own; the connection stays up
+                    conn.send_control({
+                        "type": "error", "request_id": request_id,
+                        "content": "A text message needs non-empty content.", "status": 400,
+                    })
+                    continue
+                logger.info(f"Received text: {content}")
+                start_turn(content, request_id)
+                continue
+
+            if message_type == "audio_start":
+                audio_request_id = request_id
+                audio_rejected = False
+                sample_rate = message.get("sample_rate", 16000)
+                if not isinstance(sample_rate, int) or isinstance(sample_rate, bool):
+                    bad_audio("sample_rate must be an integer.")
+                    audio_rejected = True
+                    continue
+                if start_audio(sample_rate):
+                    endpointer.reset()
                 continue
 
-            if message["type"] == "text":
-                user_text = message["content"]
-                logger.info(f"Received text: {user_text}")
-                
-                # 1. Generate AI Response (Text) via Brain
-                result = await brain.process_message_async(user_id, user_text)
-                ai_text = result["response"]
-                
-                await manager.send_text(json.dumps({"type": "text", "content": ai_text, "mood": result["mood"]}), websocket)
-
-                # 2. Generate Audio (TTS)
+            if message_type == "audio":
+                # JSON-only clients: base64 PCM instead of a binary frame
+                if request_id is not None:
+                    audio_request_id = request_id
                 try:
-                    if model:
-                        # Chatterbox implementation (if it ever works)
-                        # wav = model.generate(ai_text)
-                        # audio_bytes = wav.tobytes() 
-                        # await manager.send_audio(audio_bytes, websocket)
-                        pass
-                    else:
-                        # Fallback: gTTS
-                        from gtts import gTTS
-                        import io
-                        
-                        # Generate audio in memory
-                        tts = gTTS(text=ai_text, lang='en')
-                        mp3_fp = io.BytesIO()
-                        tts.write_to_fp(mp3_fp)
-                        mp3_fp.seek(0)
-                        audio_bytes = mp3_fp.read()
-                        
-                        # Send to frontend
-                        await manager.send_audio(audio_bytes, websocket)
-                        logger.info("Sent audio response (gTTS).")
-                        
-                except Exception as e:
-                    logger.error(f"TTS Error: {e}")
-
-    except WebSocketDisconnect:
-        manager.disconnect(websocket)
+                    chunk = base64.b64decode(message.get("data", ""), validate=True)
+                except (binascii.Error, TypeError, ValueError):
+                    bad_audio("audio data must be base64-encoded PCM.")
+                    continue
+                feed_audio(chunk)
+                continue
+
+            if message_type == "audio_end":
+                # Client-side endpointing (e.g. push-to-talk released)
+                if endpointer is not None:
+                    utterance = endpointer.flush()
+                    if utterance is not None:
+                        end_utterance(*utterance)
+
+    # The connection ends when any of these does: the client leaves (reader),
+    # the queue overflows (writer) or the client goes quiet (heartbeat).
+    tasks = [
+        asyncio.create_task(reader()),
+        asyncio.create_task(conn.writer()),
+        asyncio.create_task(conn.heartbeat(WS_PING_INTERVAL, WS_IDLE_TIMEOUT)),
+    ]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if not task.cancelled() and task.exception() is not None \
+                    and not isinstance(task.exception(), WebSocketDisconnect):
+                logger.error(f"Voice connection failed: {task.exception()}")
+    finally:
+        # Runs on every exit path, so no connection or queued frame leaks.
+        # Nothing here awaits: it must finish even if we are being cancelled.
+        for _, task in turns.values():
+            task.cancel()
+        for task in tasks:
+            task.cancel()
+            # Mark any failure as seen; it was logged above or doesn't matter
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        state_broadcaster.unsubscribe(conn)
+        manager.disconnect(conn)
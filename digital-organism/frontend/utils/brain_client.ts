@@ -3,6 +3,11 @@ export class BrainClient {
     private wsUrl: string;
     private ws: WebSocket | null = null;
     private onMessageCallback: ((data: any) => void) | null = null;
+    // Kept across reconnects so the server resumes the same chat session
+    private sessionId = `voice-${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    private reconnectTimer: ReturnType<typeof setTimeout> | null = null;
+    private reconnectAttempts = 0;
+    private closedByUser = false;
 
     constructor(baseUrl: string) {
         // Ensure no trailing slash
@@ -34,27 +39,42 @@ export class BrainClient {
      * Connect to WebSocket for real-time voice/text
      */
     connectWebSocket(onMessage: (data: any) => void, onOpen?: () => void, onClose?: () => void) {
-        if (this.ws) this.ws.close();
+        this.closedByUser = false;
+        this.stopSocket();
 
-        this.ws = new WebSocket(this.wsUrl);
+        const ws = new WebSocket(`${this.wsUrl}?session_id=${encodeURIComponent(this.sessionId)}`);
+        this.ws = ws;
         this.onMessageCallback = onMessage;
 
-        this.ws.onopen = () => {
+        ws.onopen = () => {
             console.log("Connected to Brain via WebSocket");
+            this.reconnectAttempts = 0;
             if (onOpen) onOpen();
         };
 
-        this.ws.onmessage = (event) => {
+        ws.onmessage = (event) => {
             const data = JSON.parse(event.data);
+            if (data.type === "ping") {
+                // Server heartbeat: a socket that doesn't answer is closed as idle
+                ws.send(JSON.stringify({ type: "pong" }));
+                return;
+            }
             if (this.onMessageCallback) this.onMessageCallback(data);
         };
 
-        this.ws.onclose = () => {
+        ws.onclose = () => {
+            if (this.ws !== null && this.ws !== ws) return; // Replaced by a newer socket
             console.log("Disconnected from Brain");
+            this.ws = null;
             if (onClose) onClose();
+            if (this.closedByUser) return;
+            // Reconnect with exponential backoff, capped at 30s
+            const delay = Math.min(30000, 1000 * 2 ** this.reconnectAttempts);
+            this.reconnectAttempts += 1;
+            this.reconnectTimer = setTimeout(() => this.connectWebSocket(onMessage, onOpen, onClose), delay);
         };
 
-        this.ws.onerror = (err) => {
+        ws.onerror = (err) => {
             console.error("WebSocket Error:", err);
         };
     }
@@ -80,9 +100,19 @@ export class BrainClient {
     }
 
     disconnect() {
+        this.closedByUser = true;
+        this.stopSocket();
+    }
+
+    private stopSocket() {
+        if (this.reconnectTimer) {
+            clearTimeout(this.reconnectTimer);
+            this.reconnectTimer = null;
+        }
         if (this.ws) {
-            this.ws.close();
+            const ws = this.ws;
             this.ws = null;
+            ws.close();
         }
     }
 }
@@ -0,0 +1,79 @@
+import unittest
+import sys
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+from sqlite_storage import SQLiteStorage
+from archiver import archive_chat_logs, iter_archived_chat_logs
+
+class TestArchiver(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.archive_dir = os.path.join(self.tmpdir.name, "archive")
+        self.storage = SQLiteStorage(os.path.join(self.tmpdir.name, "organism.db"))
+        self.storage.initialize()
+        self.conn = self.storage.connect()
+
+        # Ten old turns across two days and two users, plus two fresh ones
+        for i in range(10):
+            self.storage.log_chat(self.conn, "bob" if i % 2 else "amy", f"old {i}", "ok", {"adenosine": 0.5})
+            day = "2020-01-01" if i < 6 else "2020-01-02"
+            self.conn.execute("UPDATE chat_logs SET timestamp = ? WHERE id = ?", (f"{day} 10:00:0{i}", i + 1))
+        self.conn.commit()
+        self.storage.log_chat(self.conn, "bob", "new 1", "ok", {"adenosine": 0.1})
+        self.storage.log_chat(self.conn, "bob", "new 2", "ok", {"adenosine": 0.1})
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_archive_moves_old_rows_to_files_and_aggregates(self):
+        archived = archive_chat_logs(self.storage, self.archive_dir, retention_days=30, batch_size=4)
+        self.assertEqual(archived, 10)
+
+        live = [r['message'] for r in self.storage.iter_chat_logs(self.conn)]
+        self.assertEqual(live, ["new 1", "new 2"])
+
+        daily = self.conn.execute(
+            "SELECT user_id, day, turns, adenosine_total FROM chat_log_daily ORDER BY day, user_id"
+        ).fetchall()
+        self.assertEqual([tuple(r) for r in daily], [
+            ("amy", "2020-01-01", 3, 1.5),
+            ("bob", "2020-01-01", 3, 1.5),
+            ("amy", "2020-01-02", 2, 1.0),
+            ("bob", "2020-01-02", 2, 1.0),
+        ])
+
+        partitions = sorted(os.listdir(os.path.join(self.archive_dir, "chat_logs")))
+        self.assertEqual(partitions, ["date=2020-01-01", "date=2020-01-02"])
+
+    def test_reader_streams_archived_rows(self):
+        archive_chat_logs(self.storage, self.archive_dir, retention_days=30, batch_size=4)
+
+        rows = list(iter_archived_chat_logs(self.archive_dir))
+        self.assertEqual([r['id'] for r in rows], list(range(1, 11)))
+
+        bob = list(iter_archived_chat_logs(self.archive_dir, user_id="bob", after_id=4))
+        self.assertEqual([r['id'] for r in bob], [6, 8, 10])
+
+        newest = next(iter_archived_chat_logs(self.archive_dir, newest_first=True))
+        self.assertEqual(newest['id'], 10)
+
+    def test_rerun_is_a_no_op(self):
+        archive_chat_logs(self.storage, self.archive_dir, retention_days=30, batch_size=4)
+        self.assertEqual(archive_chat_logs(self.storage, self.archive_dir, retention_days=30, batch_size=4), 0)
+        self.assertEqual(len(list(iter_archived_chat_logs(self.archive_dir))), 10)
+
+    def test_aware_bounds_compare_as_utc(self):
+        archive_chat_logs(self.storage, self.archive_dir, retention_days=30, batch_size=4)
+
+        # 2020-01-02 12:00 at UTC+2 is 10:00 UTC; ids 7.. were logged from 10:00:06
+        since = datetime(2020, 1, 2, 12, 0, 6, tzinfo=timezone(timedelta(hours=2)))
+        rows = list(iter_archived_chat_logs(self.archive_dir, since=since, until=datetime(2020, 1, 3, tzinfo=timezone.utc)))
+        self.assertEqual([r['id'] for r in rows], [7, 8, 9, 10])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,7 +10,7 @@ from brain import Brain
 
 @pytest.fixture
 def mock_brain():
-    with patch("brain.psycopg2.connect") as mock_connect:
+    with patch("postgres_storage.psycopg2.connect") as mock_connect:
         with patch("brain.tinker.ServiceClient") as mock_service:
             # Mock DB Connection
             mock_conn = MagicMock()
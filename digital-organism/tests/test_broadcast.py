@@ -0,0 +1,86 @@
+import unittest
+import asyncio
+import sys
+import os
+import json
+import threading
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+from broadcast import Broadcaster
+from voice_connection import VoiceConnection
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+class TestBroadcaster(unittest.TestCase):
+    def test_slow_subscriber_gets_only_the_newest_frame(self):
+        async def run():
+            broadcaster = Broadcaster("test")
+            socket = FakeSocket()
+            conn = VoiceConnection(socket)
+            broadcaster.subscribe(conn)
+            # The writer hasn't run yet, so these pile up on the one slot
+            for n in range(5):
+                broadcaster.publish({"type": "state", "n": n})
+            writer = asyncio.create_task(conn.writer())
+            await asyncio.sleep(0.01)
+            writer.cancel()
+            return socket.sent, conn.queued_bytes
+
+        sent, queued = asyncio.run(run())
+        self.assertEqual(sent, [{"type": "state", "n": 4}])
+        self.assertEqual(queued, 0)
+
+    def test_unchanged_state_is_not_resent(self):
+        async def run():
+            broadcaster = Broadcaster("test")
+            socket = FakeSocket()
+            conn = VoiceConnection(socket)
+            broadcaster.subscribe(conn)
+            writer = asyncio.create_task(conn.writer())
+            for frame in ({"n": 1}, {"n": 1}, {"n": 2}, {"n": 2}):
+                broadcaster.publish(frame)
+                await asyncio.sleep(0.01)
+            writer.cancel()
+            return socket.sent
+
+        self.assertEqual(asyncio.run(run()), [{"n": 1}, {"n": 2}])
+
+    def test_publish_from_another_thread(self):
+        async def run():
+            broadcaster = Broadcaster("test")
+            socket = FakeSocket()
+            conn = VoiceConnection(socket)
+            broadcaster.subscribe(conn)
+            writer = asyncio.create_task(conn.writer())
+            thread = threading.Thread(target=broadcaster.publish, args=({"n": 7},))
+            thread.start()
+            await asyncio.to_thread(thread.join)
+            await asyncio.sleep(0.01)
+            writer.cancel()
+            return socket.sent
+
+        self.assertEqual(asyncio.run(run()), [{"n": 7}])
+
+    def test_new_subscriber_starts_from_latest(self):
+        async def run():
+            broadcaster = Broadcaster("test")
+            broadcaster.publish({"n": 3})
+            socket = FakeSocket()
+            conn = VoiceConnection(socket)
+            broadcaster.subscribe(conn)
+            writer = asyncio.create_task(conn.writer())
+            await asyncio.sleep(0.01)
+            writer.cancel()
+            return socket.sent
+
+        self.assertEqual(asyncio.run(run()), [{"n": 3}])
+
+if __name__ == '__main__':
+    unittest.main()
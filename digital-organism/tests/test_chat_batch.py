@@ -0,0 +1,72 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import json
+import tempfile
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+# Mock dependencies before import
+sys.modules['tinker'] = MagicMock()
+sys.modules['tinker.types'] = MagicMock()
+
+_tmpdir = tempfile.TemporaryDirectory()
+with patch.dict(os.environ, {"DATABASE_URL": f"sqlite:///{os.path.join(_tmpdir.name, 'organism.db')}"}):
+    with patch('brain.Brain._initialize_tinker'):
+        import main
+
+from fastapi.testclient import TestClient
+
+class TestChatBatch(unittest.TestCase):
+    """POST /chat/batch against the embedded SQLite backend."""
+
+    def setUp(self):
+        self.client = TestClient(main.app)
+        main.brain.generate_tinker_response = MagicMock(side_effect=lambda name, message, *args: f"echo {message}")
+
+    def post_batch(self, items):
+        response = self.client.post("/chat/batch", json={"items": items})
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    def test_streams_one_line_per_item_in_user_order(self):
+        items = []
+        for user in ("amy", "bob"):
+            items.append({"user_id": f"batch-{user}", "message": f"It's {user}"})
+        for i in range(3):
+            items.append({"user_id": "batch-amy", "message": f"amy {i}"})
+            items.append({"user_id": "batch-bob", "message": f"bob {i}"})
+
+        results = self.post_batch(items)
+        self.assertEqual(sorted(r["index"] for r in results), list(range(len(items))))
+
+        amy = [r["response"] for r in results if r["user_id"] == "batch-amy"]
+        self.assertEqual(amy, ["Hello amy. I remember you.", "echo amy 0", "echo amy 1", "echo amy 2"])
+
+        # Each turn saw the one before it (same connection, no replica lag)
+        conn = main.brain.get_db_connection()
+        history = main.brain.get_recent_chat_history(conn, "amy")
+        self.assertEqual([h["message"] for h in history], ["amy 0", "amy 1", "amy 2"])
+
+    def test_failed_turns_are_reported_per_item(self):
+        main.brain.generate_tinker_response = MagicMock(side_effect=RuntimeError("sampler down"))
+        results = self.post_batch([
+            {"user_id": "batch-cat", "message": "It's cat"},
+            {"user_id": "batch-cat", "message": "hello"},
+        ])
+        by_index = {r["index"]: r for r in results}
+        self.assertEqual(by_index[0]["response"], "Hello cat. I remember you.")
+        self.assertEqual(by_index[1]["status"], 500)
+        self.assertIn("sampler down", by_index[1]["error"])
+
+    def test_rejects_oversized_batches(self):
+        with patch.object(main, "CHAT_BATCH_MAX_ITEMS", 1):
+            response = self.client.post("/chat/batch", json={"items": [
+                {"user_id": "a", "message": "x"}, {"user_id": "b", "message": "y"},
+            ]})
+        self.assertEqual(response.status_code, 413)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import gzip
+import json
+import tempfile
+import threading
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+# Mock dependencies before import
+sys.modules['tinker'] = MagicMock()
+sys.modules['tinker.types'] = MagicMock()
+
+_tmpdir = tempfile.TemporaryDirectory()
+with patch.dict(os.environ, {"DATABASE_URL": f"sqlite:///{os.path.join(_tmpdir.name, 'organism.db')}"}):
+    with patch('brain.Brain._initialize_tinker'):
+        import main
+
+from fastapi.testclient import TestClient
+
+class TestChatLogExport(unittest.TestCase):
+    """GET /admin/chat_logs/export against the embedded SQLite backend."""
+
+    @classmethod
+    def setUpClass(cls):
+        conn = main.brain.get_db_connection()
+        try:
+            for i in range(5):
+                main.brain.storage.log_chat(conn, "export-amy" if i % 2 else "export-bob", f"m{i}", "ok", {"adenosine": 0.1})
+            conn.execute("UPDATE chat_logs SET timestamp = '2020-01-01 10:00:00' WHERE message = 'm0'")
+            conn.commit()
+        finally:
+            main.brain.release_db_connection(conn)
+
+    def setUp(self):
+        self.client = TestClient(main.app)
+        self.headers = {"X-API-Key": main.BRAIN_API_KEY} if main.BRAIN_API_KEY else {}
+
+    def export(self, **params):
+        response = self.client.get("/admin/chat_logs/export", params=params, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    def messages(self, rows):
+        return [r["message"] for r in rows if r["user_id"] in ("export-amy", "export-bob")]
+
+    def test_streams_rows_in_id_order(self):
+        rows = self.export()
+        self.assertEqual([r["id"] for r in rows], sorted(r["id"] for r in rows))
+        self.assertEqual(self.messages(rows), ["m0", "m1", "m2", "m3", "m4"])
+
+    def test_filters(self):
+        self.assertEqual(self.messages(self.export(user_id="export-amy")), ["m1", "m3"])
+
+        rows = self.export(user_id="export-bob")
+        resumed = self.export(user_id="export-bob", after_id=rows[0]["id"])
+        self.assertEqual(self.messages(resumed), ["m2", "m4"])
+
+        self.assertEqual(self.messages(self.export(until="2021-01-01T00:00:00")), ["m0"])
+        self.assertEqual(self.messages(self.export(since="2021-01-01T00:00:00Z", user_id="export-bob")), ["m2", "m4"])
+
+    def test_gzip_body(self):
+        params = {"user_id": "export-amy", "gzip": "true"}
+        with self.client.stream("GET", "/admin/chat_logs/export", params=params, headers=self.headers) as response:
+            self.assertEqual(response.headers["content-encoding"], "gzip")
+            # The body as sent, before the client undoes Content-Encoding
+            raw = b"".join(response.iter_raw())
+        lines = gzip.decompress(raw).decode("utf-8").splitlines()
+        self.assertEqual([json.loads(line)["message"] for line in lines], ["m1", "m3"])
+
+    def test_export_uses_its_own_connection(self):
+        storage = main.brain.storage
+        rows = main.brain.iter_chat_logs(user_id="export-amy", page_size=1)
+        first = next(rows)
+        self.assertEqual(len(storage._dedicated), 1)
+        # Resumed on another thread, as a streamed response would be
+        result = []
+        thread = threading.Thread(target=lambda: result.extend(rows))
+        thread.start()
+        thread.join()
+        self.assertEqual([first["message"]] + [r["message"] for r in result], ["m1", "m3"])
+        self.assertEqual(storage._dedicated, set())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import asyncio
+import sys
+import os
+import threading
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+from executor import BoundedExecutor, ExecutorFull
+from metrics import metrics
+
+class TestBoundedExecutor(unittest.TestCase):
+    def test_runs_calls_on_its_own_threads(self):
+        executor = BoundedExecutor("test_exec", max_workers=2, max_queue=2)
+
+        async def run():
+            return await executor.run(lambda a, b: (a + b, threading.current_thread().name), 1, 2)
+
+        result, thread_name = asyncio.run(run())
+        self.assertEqual(result, 3)
+        self.assertTrue(thread_name.startswith("test_exec"))
+        self.assertIn("test_exec.queue_time", metrics.snapshot()["timings"])
+        executor.shutdown()
+
+    def test_rejects_beyond_workers_plus_queue(self):
+        executor = BoundedExecutor("test_full", max_workers=1, max_queue=1)
+        gate = threading.Event()
+
+        async def run():
+            running = asyncio.ensure_future(executor.run(gate.wait))
+            queued = asyncio.ensure_future(executor.run(gate.wait))
+            await asyncio.sleep(0.05)
+            with self.assertRaises(ExecutorFull):
+                await executor.run(gate.wait)
+            gate.set()
+            await asyncio.gather(running, queued)
+
+        asyncio.run(run())
+        self.assertEqual(executor.pending, 0)
+        self.assertGreaterEqual(metrics.snapshot()["counters"]["test_full.rejected"], 1)
+        executor.shutdown()
+
+    def test_errors_propagate_and_free_the_slot(self):
+        executor = BoundedExecutor("test_err", max_workers=1, max_queue=0)
+
+        def boom():
+            raise ValueError("boom")
+
+        async def run():
+            with self.assertRaises(ValueError):
+                await executor.run(boom)
+            return await executor.run(lambda: "ok")
+
+        self.assertEqual(asyncio.run(run()), "ok")
+        executor.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import sys
+import os
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+from hash_ring import HashRing
+
+class TestHashRing(unittest.TestCase):
+    def setUp(self):
+        self.nodes = ["http://a:8000", "http://b:8000", "http://c:8000"]
+        self.keys = [f"user_{i}" for i in range(2000)]
+
+    def test_same_key_same_node(self):
+        ring = HashRing(self.nodes)
+        self.assertEqual(ring.get_node("alice"), ring.get_node("alice"))
+
+    def test_minimal_rebalance_on_join(self):
+        """Adding a node only moves keys onto the new node."""
+        ring = HashRing(self.nodes)
+        before = {k: ring.get_node(k) for k in self.keys}
+        ring.add_node("http://d:8000")
+        after = {k: ring.get_node(k) for k in self.keys}
+
+        moved = [k for k in self.keys if before[k] != after[k]]
+        for k in moved:
+            self.assertEqual(after[k], "http://d:8000")
+        # Roughly a quarter of the keys should move, never most of them
+        self.assertLess(len(moved), len(self.keys) * 0.4)
+
+    def test_remove_node_keeps_other_keys(self):
+        ring = HashRing(self.nodes)
+        before = {k: ring.get_node(k) for k in self.keys}
+        ring.remove_node("http://b:8000")
+        for k in self.keys:
+            if before[k] != "http://b:8000":
+                self.assertEqual(ring.get_node(k), before[k])
+
+    def test_bounded_load(self):
+        """A hot key spills over once its owner is above capacity."""
+        ring = HashRing(self.nodes, load_factor=1.25)
+        owners = [ring.acquire("hot_user") for _ in range(30)]
+        for node in self.nodes:
+            self.assertLessEqual(ring.loads[node], 13)
+        self.assertGreater(len(set(owners)), 1)
+
+        for node in owners:
+            ring.release(node)
+        self.assertEqual(sum(ring.loads.values()), 0)
+
+    def test_exclude(self):
+        ring = HashRing(self.nodes)
+        owner = ring.get_node("alice")
+        self.assertNotEqual(ring.get_node("alice", exclude={owner}), owner)
+        self.assertIsNone(ring.get_node("alice", exclude=set(self.nodes)))
+
+if __name__ == '__main__':
+    unittest.main()
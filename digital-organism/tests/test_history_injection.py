@@ -127,5 +127,62 @@ class TestHistoryInjection(unittest.TestCase):
         # Since side_effect was consumed, we know it recursed.
         self.assertTrue(True)
 
+    def test_prompt_includes_summary(self):
+        """Summary is injected ahead of the raw turns."""
+        history = [{'message': 'Latest', 'response': 'Sure'}]
+
+        self.brain.generate_tinker_response('Bob', 'New message', history, summary="Bob likes chess.")
+
+        prompt = self.brain.tokenizer.encode.call_args_list[0][0][0]
+        self.assertIn("Earlier in this conversation: Bob likes chess.", prompt)
+        self.assertLess(prompt.index("Bob likes chess."), prompt.index("User (Bob): Latest"))
+
+    @patch('brain.SUMMARY_RAW_TURNS', 4)
+    @patch('brain.SUMMARY_EVERY_N_TURNS', 4)
+    def test_summary_refresh_scheduling(self):
+        """Older turns are handed to the background summarizer, recent ones are kept raw."""
+        self.brain.summary_executor = MagicMock()
+        history = [{'id': i, 'message': str(i), 'response': str(i)} for i in range(1, 8)]
+
+        # Not enough unsummarized turns yet
+        self.assertFalse(self.brain.schedule_summary_refresh('bob', 'Bob', None, history))
+
+        history.append({'id': 8, 'message': '8', 'response': '8'})
+        self.assertTrue(self.brain.schedule_summary_refresh('bob', 'Bob', None, history))
+        args = self.brain.summary_executor.submit.call_args[0]
+        self.assertEqual([t['id'] for t in args[4]], [1, 2, 3, 4])
+
+        # A refresh already in flight for this user is not queued twice
+        self.assertFalse(self.brain.schedule_summary_refresh('bob', 'Bob', None, history))
+
+    def test_recall_memories_cached_and_windowed(self):
+        """Full-text recall skips turns already in the raw window and caches repeat queries."""
+        mock_conn = MagicMock()
+        mock_cur = MagicMock()
+        mock_conn.cursor.return_value.__enter__.return_value = mock_cur
+        mock_cur.fetchall.return_value = [
+            {'id': 40, 'message': 'chess again', 'response': 'yes'},
+            {'id': 7, 'message': 'I love chess', 'response': 'Nice'},
+        ]
+
+        memories = self.brain.recall_memories(mock_conn, 'bob', 'Do you remember chess?', before_id=30)
+        self.assertEqual([m['id'] for m in memories], [7])
+
+        sql = mock_cur.execute.call_args[0][0]
+        self.assertIn("search_vector @@ query", sql)
+        self.assertEqual(mock_cur.execute.call_args[0][1][0], "you | remember | chess")
+
+        # Same question again is served from the cache
+        self.brain.recall_memories(mock_conn, 'bob', 'Do you remember chess?', before_id=30)
+        self.assertEqual(mock_cur.fetchall.call_count, 1)
+
+    def test_prompt_includes_memories(self):
+        memories = [{'message': 'I love chess', 'response': 'Nice'}]
+
+        self.brain.generate_tinker_response('Bob', 'New message', [], memories=memories)
+
+        prompt = self.brain.tokenizer.encode.call_args_list[0][0][0]
+        self.assertIn("Memory: User (Bob): I love chess / Caz: Nice", prompt)
+
 if __name__ == '__main__':
     unittest.main()
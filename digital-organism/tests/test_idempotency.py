@@ -0,0 +1,108 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import asyncio
+import tempfile
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+# Mock dependencies before import
+sys.modules['tinker'] = MagicMock()
+sys.modules['tinker.types'] = MagicMock()
+
+from idempotency import IdempotencyStore, IdempotencyConflict, fingerprint
+
+class TestIdempotencyStore(unittest.TestCase):
+    def test_duplicates_share_one_call_and_replay(self):
+        store = IdempotencyStore(ttl=60)
+        calls = []
+
+        async def work(n):
+            calls.append(n)
+            await asyncio.sleep(0.01)
+            return {"n": n}
+
+        async def run():
+            fp = fingerprint("amy", "hi")
+            first, second = await asyncio.gather(
+                store.run("k", fp, work, 1),
+                store.run("k", fp, work, 2),
+            )
+            third = await store.run("k", fp, work, 3)
+            return first, second, third
+
+        first, second, third = asyncio.run(run())
+        self.assertEqual(calls, [1])
+        self.assertEqual(first, ({"n": 1}, False))
+        self.assertEqual(second, ({"n": 1}, True))
+        self.assertEqual(third, ({"n": 1}, True))
+
+    def test_key_reuse_with_different_request_conflicts(self):
+        store = IdempotencyStore(ttl=60)
+
+        async def work():
+            return "ok"
+
+        async def run():
+            await store.run("k", fingerprint("amy", "hi"), work)
+            await store.run("k", fingerprint("amy", "bye"), work)
+
+        with self.assertRaises(IdempotencyConflict):
+            asyncio.run(run())
+
+    def test_failures_are_not_stored(self):
+        store = IdempotencyStore(ttl=60)
+        attempts = []
+
+        async def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("sampler down")
+            return "ok"
+
+        async def run():
+            with self.assertRaises(RuntimeError):
+                await store.run("k", "fp", flaky)
+            return await store.run("k", "fp", flaky)
+
+        self.assertEqual(asyncio.run(run()), ("ok", False))
+
+class TestChatIdempotencyKey(unittest.TestCase):
+    """Idempotency-Key on POST /chat against the embedded SQLite backend."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        with patch.dict(os.environ, {"DATABASE_URL": f"sqlite:///{os.path.join(cls.tmpdir.name, 'organism.db')}"}):
+            with patch('brain.Brain._initialize_tinker'):
+                import main
+        from fastapi.testclient import TestClient
+        cls.main = main
+        cls.client = TestClient(main.app)
+
+    def test_retry_replays_without_generating_again(self):
+        brain = self.main.brain
+        brain.generate_tinker_response = MagicMock(return_value="Nice to see you.")
+        self.client.post("/chat", json={"user_id": "idem-amy", "message": "It's amy"})
+
+        headers = {"Idempotency-Key": "retry-1"}
+        body = {"user_id": "idem-amy", "message": "How are you?"}
+        first = self.client.post("/chat", json=body, headers=headers)
+        second = self.client.post("/chat", json=body, headers=headers)
+
+        self.assertEqual(first.json(), second.json())
+        self.assertNotIn("Idempotent-Replayed", first.headers)
+        self.assertEqual(second.headers["Idempotent-Replayed"], "true")
+        self.assertEqual(brain.generate_tinker_response.call_count, 1)
+
+        conn = brain.get_db_connection()
+        history = brain.get_recent_chat_history(conn, "amy")
+        self.assertEqual([h["message"] for h in history].count("How are you?"), 1)
+
+        conflict = self.client.post("/chat", json={"user_id": "idem-amy", "message": "Other"}, headers=headers)
+        self.assertEqual(conflict.status_code, 422)
+
+if __name__ == '__main__':
+    unittest.main()
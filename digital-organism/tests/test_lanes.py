@@ -0,0 +1,71 @@
+import unittest
+import asyncio
+import sys
+import os
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+from lanes import UserLanes, LaneFull
+
+class TestUserLanes(unittest.TestCase):
+    def test_same_user_runs_in_order_others_in_parallel(self):
+        lanes = UserLanes("test", max_depth=10)
+        events = []
+
+        async def turn(user, n):
+            events.append(("start", user, n))
+            await asyncio.sleep(0.01)
+            events.append(("end", user, n))
+            return n
+
+        async def run():
+            return await asyncio.gather(
+                lanes.run("amy", turn, "amy", 1),
+                lanes.run("amy", turn, "amy", 2),
+                lanes.run("bob", turn, "bob", 1),
+            )
+
+        self.assertEqual(asyncio.run(run()), [1, 2, 1])
+        amy = [e for e in events if e[1] == "amy"]
+        self.assertEqual(amy, [("start", "amy", 1), ("end", "amy", 1), ("start", "amy", 2), ("end", "amy", 2)])
+        # bob started before amy's first turn finished
+        self.assertLess(events.index(("start", "bob", 1)), events.index(("end", "amy", 1)))
+        self.assertEqual(lanes.depth("amy"), 0)
+
+    def test_overflow_is_shed(self):
+        lanes = UserLanes("test", max_depth=2)
+
+        async def run():
+            gate = asyncio.Event()
+            first = asyncio.ensure_future(lanes.run("amy", gate.wait))
+            second = asyncio.ensure_future(lanes.run("amy", gate.wait))
+            await asyncio.sleep(0)
+            with self.assertRaises(LaneFull):
+                await lanes.run("amy", gate.wait)
+            # Other users are unaffected
+            await lanes.run("bob", asyncio.sleep, 0)
+            gate.set()
+            await asyncio.gather(first, second)
+
+        asyncio.run(run())
+
+    def test_cancelled_caller_keeps_lane_until_work_finishes(self):
+        lanes = UserLanes("test", max_depth=10)
+        events = []
+
+        async def turn(n):
+            await asyncio.sleep(0.02)
+            events.append(n)
+
+        async def run():
+            first = asyncio.ensure_future(lanes.run("amy", turn, 1))
+            await asyncio.sleep(0.005)
+            first.cancel()
+            await lanes.run("amy", turn, 2)
+
+        asyncio.run(run())
+        self.assertEqual(events, [1, 2])
+
+if __name__ == '__main__':
+    unittest.main()
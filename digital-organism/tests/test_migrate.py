@@ -0,0 +1,52 @@
+import unittest
+import sys
+import os
+import shutil
+import sqlite3
+import tempfile
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+from migrate import MIGRATIONS_DIR, load_migrations, migrate, schema_status
+from sqlite_storage import SQLiteStorage
+
+class TestMigrate(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.storage = SQLiteStorage(os.path.join(self.tmpdir.name, "organism.db"))
+        self.conn = self.storage.connect()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_versions_are_contiguous_for_every_dialect(self):
+        for dialect in ("postgres", "sqlite"):
+            versions = [v for v, _, _ in load_migrations(dialect)]
+            self.assertEqual(versions, list(range(1, len(versions) + 1)), dialect)
+
+    def test_migrates_empty_database_once(self):
+        self.assertEqual(schema_status(self.storage), (0, 3))
+        self.assertEqual(migrate(self.storage, target=1), [1])
+        self.assertEqual(migrate(self.storage), [2, 3])
+        self.assertEqual(migrate(self.storage), [])
+        self.assertEqual(schema_status(self.storage), (3, 3))
+
+        # Seeded exactly one biological state row
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM biological_state").fetchone()[0], 1)
+        self.assertIsNotNone(self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'chat_logs_fts'").fetchone())
+
+    def test_failed_migration_leaves_previous_version(self):
+        migrations_dir = os.path.join(self.tmpdir.name, "migrations")
+        shutil.copytree(MIGRATIONS_DIR, migrations_dir)
+        with open(os.path.join(migrations_dir, "sqlite", "0004_broken.sql"), "w") as fh:
+            fh.write("CREATE TABLE half_done (id INTEGER);\nSELECT * FROM no_such_table;\n")
+
+        with self.assertRaises(sqlite3.OperationalError):
+            migrate(self.storage, migrations_dir=migrations_dir)
+
+        self.assertEqual(schema_status(self.storage, migrations_dir), (3, 4))
+        self.assertIsNone(self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'half_done'").fetchone())
+
+if __name__ == '__main__':
+    unittest.main()
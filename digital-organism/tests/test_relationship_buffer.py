@@ -0,0 +1,84 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import tempfile
+import threading
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+# Mock dependencies before import
+sys.modules['tinker'] = MagicMock()
+sys.modules['tinker.types'] = MagicMock()
+
+from brain import Brain
+
+class TestRelationshipBuffer(unittest.TestCase):
+    """Buffered relationship counters on the embedded SQLite backend."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        db_url = f"sqlite:///{os.path.join(self.tmpdir.name, 'organism.db')}"
+        with patch.dict(os.environ, {"DATABASE_URL": db_url}):
+            with patch('brain.Brain._initialize_tinker'):
+                self.brain = Brain()
+        self.conn = self.brain.get_db_connection()
+        # First contact writes the row directly
+        self.brain.update_relationship(self.conn, "bob", affinity_change=1.0)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def stored(self):
+        return self.brain.storage.get_relationship(self.conn, "bob")
+
+    def test_deltas_are_merged_on_read_and_flushed_once(self):
+        self.brain.update_relationship(self.conn, "bob", affinity_change=0.5)
+        rel = self.brain.update_relationship(self.conn, "bob", affinity_change=0.5)
+        self.assertAlmostEqual(rel['affinity'], 2.0)
+        self.assertEqual(rel['interaction_count'], 3)
+        self.assertAlmostEqual(self.stored()['affinity'], 1.0)
+
+        self.assertEqual(self.brain.flush_relationships(), 1)
+        self.assertAlmostEqual(self.stored()['affinity'], 2.0)
+        self.assertEqual(self.stored()['interaction_count'], 3)
+        self.assertEqual(self.brain.relationship_buffer.pending("bob"), (0.0, 0))
+        self.assertEqual(self.brain.flush_relationships(), 0)
+
+    def test_hostility_sees_unflushed_deltas(self):
+        rel = self.brain.update_relationship(self.conn, "bob", affinity_change=-7.0)
+        self.assertLess(rel['affinity'], -5.0)
+
+    def test_failed_flush_keeps_deltas(self):
+        self.brain.update_relationship(self.conn, "bob", affinity_change=0.5)
+        with patch.object(self.brain.storage, 'apply_relationship_deltas', side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError):
+                self.brain.flush_relationships()
+        self.assertEqual(self.brain.relationship_buffer.pending("bob"), (0.5, 1))
+        self.brain.flush_relationships()
+        self.assertAlmostEqual(self.stored()['affinity'], 1.5)
+
+    def test_read_during_flush_counts_each_delta_once(self):
+        self.brain.update_relationship(self.conn, "bob", affinity_change=0.5)
+        apply = self.brain.storage.apply_relationship_deltas
+        seen = []
+
+        def read_concurrently():
+            conn = self.brain.storage.connect()
+            seen.append(self.brain.update_relationship(conn, "bob", affinity_change=0.25)['affinity'])
+
+        def slow_apply(conn, deltas):
+            reader = threading.Thread(target=read_concurrently)
+            reader.start()
+            reader.join(timeout=0.1)  # blocked until this upsert commits
+            apply(conn, deltas)
+            self.reader = reader
+
+        with patch.object(self.brain.storage, 'apply_relationship_deltas', side_effect=slow_apply):
+            self.brain.flush_relationships()
+        self.reader.join()
+        self.assertAlmostEqual(seen[0], 1.75)
+
+if __name__ == '__main__':
+    unittest.main()
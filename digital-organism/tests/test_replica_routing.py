@@ -0,0 +1,61 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+import postgres_storage
+from postgres_storage import PostgresStorage
+
+class TestReplicaRouting(unittest.TestCase):
+    def setUp(self):
+        self.psycopg2 = MagicMock()
+        self.psycopg2.Error = Exception
+        self.conns = {}
+
+        def connect(url):
+            if url in self.conns and isinstance(self.conns[url], Exception):
+                raise self.conns[url]
+            return self.conns.setdefault(url, self._conn(0.0))
+
+        self.psycopg2.connect.side_effect = connect
+        patcher = patch.object(postgres_storage, "psycopg2", self.psycopg2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _conn(self, lag):
+        conn = MagicMock()
+        conn.cursor.return_value.__enter__.return_value.fetchone.return_value = (lag,)
+        return conn
+
+    def test_writes_always_use_primary(self):
+        storage = PostgresStorage("primary", ["replica"])
+        self.assertIs(storage.connect(), self.conns["primary"])
+
+    def test_has_replicas(self):
+        self.assertFalse(PostgresStorage("primary").has_replicas)
+        self.assertTrue(PostgresStorage("primary", ["replica"]).has_replicas)
+
+    def test_read_uses_fresh_replica(self):
+        storage = PostgresStorage("primary", ["replica"])
+        self.assertIs(storage.connect(readonly=True), self.conns["replica"])
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        self.conns["replica"] = self._conn(60.0)
+        storage = PostgresStorage("primary", ["replica"])
+        self.assertIs(storage.connect(readonly=True), self.conns["primary"])
+        self.conns["replica"].close.assert_called_once()
+
+        # The lagging replica is not retried until its check interval passes
+        storage.connect(readonly=True)
+        self.assertEqual(self.psycopg2.connect.call_args_list.count(unittest.mock.call("replica")), 1)
+
+    def test_unreachable_replica_falls_back_to_next(self):
+        self.conns["down"] = Exception("connection refused")
+        storage = PostgresStorage("primary", ["down", "replica"])
+        self.assertIs(storage.connect(readonly=True), self.conns["replica"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+import unittest
+import asyncio
+import sys
+import os
+import tempfile
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+from scheduler import Scheduler, JobAlreadyRunning
+from sqlite_storage import FileLeaderLock, SQLiteStorage
+
+class TestScheduler(unittest.TestCase):
+    def test_run_job_counts_runs_and_failures(self):
+        scheduler = Scheduler()
+        calls = []
+        scheduler.add_job("ok", lambda: calls.append(1), interval=60)
+
+        def boom():
+            raise RuntimeError("boom")
+        scheduler.add_job("bad", boom, interval=60)
+
+        status = asyncio.run(scheduler.run_job("ok"))
+        self.assertEqual(calls, [1])
+        self.assertEqual(status["runs"], 1)
+        self.assertEqual(status["failures"], 0)
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(scheduler.run_job("bad"))
+        bad = scheduler.jobs["bad"].status()
+        self.assertEqual(bad["failures"], 1)
+        self.assertEqual(bad["last_error"], "boom")
+        self.assertFalse(bad["running"])
+
+    def test_run_job_rejects_overlapping_runs(self):
+        scheduler = Scheduler()
+        scheduler.add_job("slow", lambda: None, interval=60)
+        scheduler.jobs["slow"].running = True
+        with self.assertRaises(JobAlreadyRunning):
+            asyncio.run(scheduler.run_job("slow"))
+
+    def test_singleton_jobs_only_run_on_leader(self):
+        class NeverLeader:
+            def try_acquire(self):
+                return False
+            def check(self):
+                return False
+            def release(self):
+                pass
+
+        calls = []
+
+        async def run():
+            scheduler = Scheduler(leader_lock=NeverLeader())
+            scheduler.add_job("single", lambda: calls.append("single"), interval=0.01, singleton=True)
+            scheduler.add_job("everywhere", lambda: calls.append("everywhere"), interval=0.01)
+            scheduler.add_job("paused", lambda: calls.append("paused"), interval=0.01, paused=True)
+            await scheduler.start()
+            await asyncio.sleep(0.1)
+            await scheduler.stop()
+            return scheduler
+
+        scheduler = asyncio.run(run())
+        self.assertFalse(scheduler.is_leader)
+        self.assertIn("everywhere", calls)
+        self.assertNotIn("single", calls)
+        self.assertNotIn("paused", calls)
+
+    def test_pause_is_shared_through_the_store(self):
+        class StoragePauses:
+            def __init__(self, storage):
+                self.storage = storage
+
+            def get_job_pauses(self):
+                conn = self.storage.connect()
+                try:
+                    return self.storage.get_job_pauses(conn)
+                finally:
+                    self.storage.release(conn)
+
+            def set_job_paused(self, name, paused):
+                conn = self.storage.connect()
+                try:
+                    self.storage.set_job_paused(conn, name, paused)
+                finally:
+                    self.storage.release(conn)
+
+            def clear_job_paused(self, name):
+                conn = self.storage.connect()
+                try:
+                    self.storage.clear_job_paused(conn, name)
+                finally:
+                    self.storage.release(conn)
+
+        calls = []
+
+        async def run(storage):
+            store = StoragePauses(storage)
+            # The admin call lands on a worker that doesn't run the job
+            follower = Scheduler(pause_store=store)
+            follower.add_job("archive", lambda: None, interval=60, singleton=True)
+            leader = Scheduler(leader_check_interval=0.01, pause_store=store)
+            leader.add_job("archive", lambda: calls.append("archive"), interval=0.01, singleton=True)
+
+            await follower.pause("archive")
+            await leader.start()
+            await asyncio.sleep(0.1)
+            self.assertEqual(calls, [])
+            self.assertTrue(leader.jobs["archive"].paused)
+
+            await follower.resume("archive")
+            await asyncio.sleep(0.1)
+            await leader.stop()
+            await follower.pause("archive")
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            storage = SQLiteStorage(os.path.join(tmpdir, "organism.db"))
+            storage.initialize()
+            asyncio.run(run(storage))
+            # A restarted worker starts from the stored state
+            restarted = Scheduler(pause_store=StoragePauses(storage))
+            restarted.add_job("archive", lambda: None, interval=60)
+            asyncio.run(restarted._load_pauses())
+            self.assertTrue(restarted.jobs["archive"].paused)
+
+            # Back to the default: nothing stored, the default decides again
+            asyncio.run(restarted.resume("archive"))
+            conn = storage.connect()
+            try:
+                self.assertEqual(storage.get_job_pauses(conn), {})
+            finally:
+                storage.release(conn)
+        self.assertIn("archive", calls)
+
+    def test_pauses_are_read_once_per_interval(self):
+        class CountingPauses:
+            reads = 0
+
+            def get_job_pauses(self):
+                CountingPauses.reads += 1
+                return {}
+
+        async def run():
+            scheduler = Scheduler(leader_check_interval=60, pause_store=CountingPauses())
+            for name in ("a", "b", "c"):
+                scheduler.add_job(name, lambda: None, interval=0.01)
+            await scheduler.start()
+            await asyncio.sleep(0.1)
+            await scheduler.stop()
+            return scheduler
+
+        scheduler = asyncio.run(run())
+        self.assertGreater(min(job.runs for job in scheduler.jobs.values()), 1)
+        self.assertEqual(CountingPauses.reads, 1)
+
+    def test_file_leader_lock_is_exclusive(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "scheduler.lock")
+            first, second = FileLeaderLock(path), FileLeaderLock(path)
+            self.assertTrue(first.try_acquire())
+            self.assertFalse(second.try_acquire())
+            self.assertTrue(first.check())
+            first.release()
+            self.assertTrue(second.try_acquire())
+            second.release()
+
+if __name__ == '__main__':
+    unittest.main()
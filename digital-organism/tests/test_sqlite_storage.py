@@ -0,0 +1,116 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import tempfile
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+# Mock dependencies before import
+sys.modules['tinker'] = MagicMock()
+sys.modules['tinker.types'] = MagicMock()
+
+from brain import Brain
+from sqlite_storage import SQLiteStorage
+from storage import Storage
+
+class TestSQLiteStorage(unittest.TestCase):
+    """Runs the real turn path against the embedded SQLite backend."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        db_url = f"sqlite:///{os.path.join(self.tmpdir.name, 'organism.db')}"
+        with patch.dict(os.environ, {"DATABASE_URL": db_url}):
+            with patch('brain.Brain._initialize_tinker'):
+                self.brain = Brain()
+        self.brain.generate_tinker_response = MagicMock(return_value="Nice to see you.")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_backend_selected_from_url(self):
+        self.assertIsInstance(self.brain.storage, SQLiteStorage)
+        conn = self.brain.get_db_connection()
+        mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+
+    def test_incomplete_backend_fails_at_construction(self):
+        class Partial(Storage):
+            def connect(self, readonly=False):
+                return None
+
+        with self.assertRaises(TypeError):
+            Partial()
+
+    def test_identity_flow_and_logging(self):
+        self.assertEqual(self.brain.process_message("s1", "Hello there!")["response"], "Who is this?")
+        self.assertIn("Tester", self.brain.process_message("s1", "It's Tester")["response"])
+
+        result = self.brain.process_message("s1", "Do you like chess?")
+        self.assertEqual(result, {"response": "Nice to see you.", "mood": "awake"})
+
+        conn = self.brain.get_db_connection()
+        history = self.brain.get_recent_chat_history(conn, "tester")
+        self.assertEqual([h['message'] for h in history], ["Do you like chess?"])
+
+        state = self.brain.get_biological_state(conn)
+        self.assertAlmostEqual(state['adenosine'], 0.05)
+        self.assertFalse(state['sleep_mode'])
+
+    def test_turn_opens_one_connection_without_replicas(self):
+        self.brain.process_message("s1", "It's Tester")
+        with patch.object(self.brain.storage, "connect", wraps=self.brain.storage.connect) as connect:
+            self.assertEqual(self.brain.process_message("s1", "Do you like chess?")["mood"], "awake")
+        connect.assert_called_once_with()
+
+    def test_sleep_and_wake(self):
+        conn = self.brain.get_db_connection()
+        self.brain.update_biological_state(conn, adenosine_change=5.0)
+        self.assertEqual(self.brain.get_biological_state(conn)['adenosine'], 1.0)
+
+        self.brain.process_message("s1", "It's Tester")
+        self.assertEqual(self.brain.process_message("s1", "Hi")["mood"], "asleep")
+
+        self.brain.process_message("s1", "wake up")
+        self.assertEqual(self.brain.get_biological_state(conn)['adenosine'], 0.0)
+
+    def test_session_expiry_and_sweep(self):
+        self.brain.process_message("s1", "It's Tester")
+        self.brain.process_message("s2", "It's Other")
+        conn = self.brain.get_db_connection()
+        conn.execute("UPDATE sessions SET last_active = datetime('now', '-5 hours') WHERE session_id = 's1'")
+        conn.commit()
+
+        # An expired session that comes back loses its identity
+        self.assertEqual(self.brain.process_message("s1", "Hi again")["response"], "Who is this?")
+        self.assertIsNone(self.brain.storage.get_session(conn, "s1")['user_id'])
+
+        conn.execute("UPDATE sessions SET last_active = datetime('now', '-5 hours')")
+        conn.commit()
+        self.brain.process_message("s3", "It's Third")
+        self.assertEqual(self.brain.sweep_expired_sessions(batch_size=1), 2)
+        remaining = [r[0] for r in conn.execute("SELECT session_id FROM sessions")]
+        self.assertEqual(remaining, ["s3"])
+
+    def test_relationship_upsert(self):
+        conn = self.brain.get_db_connection()
+        self.brain.update_relationship(conn, "bob", affinity_change=0.1)
+        rel = self.brain.update_relationship(conn, "bob", affinity_change=0.1)
+        self.assertAlmostEqual(rel['affinity'], 0.2)
+
+    def test_recall_and_export(self):
+        conn = self.brain.get_db_connection()
+        for i in range(5):
+            self.brain.storage.log_chat(conn, "bob", f"message {i}", "ok", {"adenosine": 0.1})
+        self.brain.storage.log_chat(conn, "bob", "I play chess on Sundays", "Fun!", {"adenosine": 0.1})
+
+        memories = self.brain.recall_memories(conn, "bob", "any chess tips?")
+        self.assertEqual(memories[0]['message'], "I play chess on Sundays")
+
+        rows = list(self.brain.iter_chat_logs(user_id="bob", after_id=2, page_size=2))
+        self.assertEqual([r['id'] for r in rows], [3, 4, 5, 6])
+        self.assertEqual(rows[0]['biological_state_snapshot'], {"adenosine": 0.1})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+import asyncio
+import sys
+import os
+import time
+from unittest.mock import patch
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+from stt import STTEngine, STTService, STTTimeout, STTUnavailable, VoskEngine, WhisperEngine, create_stt_engine
+
+class SlowSTT(STTEngine):
+    name = "slow"
+
+    def transcribe(self, pcm, sample_rate):
+        time.sleep(0.2)
+        return "late"
+
+class TestSTT(unittest.TestCase):
+    def test_create_engine(self):
+        with patch.object(WhisperEngine, "available", return_value=False), \
+                patch.object(VoskEngine, "available", return_value=False):
+            self.assertIsNone(create_stt_engine("auto"))
+        with patch.object(WhisperEngine, "available", return_value=False), \
+                patch.object(VoskEngine, "available", return_value=True):
+            self.assertIsInstance(create_stt_engine("auto"), VoskEngine)
+        with self.assertRaises(ValueError):
+            create_stt_engine("siri")
+
+    def test_timeout(self):
+        service = STTService(SlowSTT(), timeout=0.05)
+        with self.assertRaises(STTTimeout):
+            asyncio.run(service.transcribe(b"\x00\x00", 16000))
+        service.shutdown()
+
+    def test_supported_rates(self):
+        service = STTService(SlowSTT())
+        self.assertTrue(service.supports(44100))
+        service.engine = WhisperEngine()
+        self.assertTrue(service.supports(16000))
+        self.assertFalse(service.supports(48000))
+        service.shutdown()
+
+    def test_unavailable(self):
+        service = STTService(SlowSTT())
+        service.engine = None
+        self.assertFalse(service.available)
+        with self.assertRaises(STTUnavailable):
+            asyncio.run(service.transcribe(b"", 16000))
+        service.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
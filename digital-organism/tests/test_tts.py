@@ -0,0 +1,177 @@
+import unittest
+import asyncio
+import sys
+import os
+import stat
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+from metrics import metrics
+from tts import EspeakEngine, GTTSEngine, TTSEngine, TTSService, TTSTimeout, create_engine, split_sentences
+
+class FakeEngine(TTSEngine):
+    name = "fake"
+    codec = "mp3"
+    voice = "fake"
+
+    def __init__(self, func):
+        self.func = func
+
+    def synthesize(self, text):
+        return self.func(text)
+
+def fake_synthesize(text):
+    if text == "slow":
+        time.sleep(0.2)
+    return text.encode("utf-8")
+
+class TestTTSService(unittest.TestCase):
+    def test_synthesis_does_not_block_the_loop(self):
+        service = TTSService(FakeEngine(fake_synthesize), workers=2, max_concurrency=2, timeout=5)
+
+        async def run():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            task = asyncio.create_task(ticker())
+            audio = await service.synthesize("slow")
+            task.cancel()
+            return audio, ticks
+
+        audio, ticks = asyncio.run(run())
+        self.assertEqual(audio, b"slow")
+        self.assertGreater(ticks, 5)
+        service.shutdown()
+
+    def test_timeout(self):
+        service = TTSService(FakeEngine(fake_synthesize), workers=1, max_concurrency=1, timeout=0.05)
+        with self.assertRaises(TTSTimeout):
+            asyncio.run(service.synthesize("slow"))
+        service.shutdown()
+
+    def test_concurrency_is_capped(self):
+        active, peak = 0, 0
+        lock = threading.Lock()
+
+        def counting(text):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+            return b""
+
+        service = TTSService(FakeEngine(counting), workers=4, max_concurrency=2, timeout=5)
+
+        async def run():
+            await asyncio.gather(*(service.synthesize(str(i)) for i in range(6)))
+
+        asyncio.run(run())
+        self.assertEqual(peak, 2)
+        service.shutdown()
+
+class TestSentencePipeline(unittest.TestCase):
+    def test_split_sentences(self):
+        self.assertEqual(
+            split_sentences("Hello there, my friend. How have you been lately? I really missed you a lot!"),
+            ["Hello there, my friend.", "How have you been lately?", "I really missed you a lot!"],
+        )
+        # Short fragments merge into their neighbour
+        self.assertEqual(split_sentences("Hi. Ok. That is a longer sentence."), ["Hi. Ok. That is a longer sentence."])
+        self.assertEqual(split_sentences("That is a longer sentence. Bye!"), ["That is a longer sentence. Bye!"])
+        # Long sentences break at clause boundaries
+        chunks = split_sentences("one two three, four five six, seven eight nine", max_chars=30)
+        self.assertEqual(chunks, ["one two three, four five six,", "seven eight nine"])
+
+    def test_stream_is_ordered_and_bounded(self):
+        active, peak = 0, 0
+        lock = threading.Lock()
+
+        def synth(text):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            # Later chunks finish first
+            time.sleep(0.05 if text.startswith("First") else 0.01)
+            with lock:
+                active -= 1
+            return text.encode("utf-8")
+
+        service = TTSService(FakeEngine(synth), workers=4, max_concurrency=4, timeout=5)
+        text = "First sentence is here. Second sentence is here. Third sentence is here. Fourth sentence is here."
+
+        async def run():
+            return [frame async for frame in service.synthesize_stream(text, depth=2)]
+
+        frames = asyncio.run(run())
+        self.assertEqual([seq for seq, _, _ in frames], [0, 1, 2, 3])
+        self.assertEqual([final for _, _, final in frames], [False, False, False, True])
+        self.assertEqual(frames[0][1], b"First sentence is here.")
+        self.assertLessEqual(peak, 2)
+        service.shutdown()
+
+    def test_failed_last_chunk_still_marks_final(self):
+        def synth(text):
+            if text.startswith("Second"):
+                raise RuntimeError("boom")
+            return b"ok"
+
+        service = TTSService(FakeEngine(synth), workers=2, max_concurrency=2, timeout=5)
+
+        async def run():
+            return [frame async for frame in service.synthesize_stream("First sentence is here. Second sentence is here.")]
+
+        self.assertEqual(asyncio.run(run()), [(0, b"ok", False), (1, b"", True)])
+        service.shutdown()
+
+class TestEngines(unittest.TestCase):
+    def fake_espeak(self, script):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "espeak-ng")
+        with open(path, "w") as fh:
+            fh.write("#!/bin/sh\n" + script)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+        return path
+
+    def test_espeak_reads_text_from_stdin(self):
+        engine = EspeakEngine(binary=self.fake_espeak('printf RIFF; cat\n'))
+        self.assertEqual(engine.synthesize("--help me"), b"RIFF--help me")
+        self.assertEqual(engine.codec, "wav")
+
+    def test_espeak_failure_raises(self):
+        engine = EspeakEngine(binary=self.fake_espeak('echo "no voice" >&2; exit 1\n'))
+        with self.assertRaisesRegex(RuntimeError, "no voice"):
+            engine.synthesize("hi")
+
+    def test_create_engine(self):
+        with patch.object(EspeakEngine, "available", return_value=False):
+            self.assertIsInstance(create_engine("auto"), GTTSEngine)
+        with patch.object(EspeakEngine, "available", return_value=True):
+            self.assertIsInstance(create_engine("auto"), EspeakEngine)
+        with self.assertRaises(ValueError):
+            create_engine("chatterbox")
+
+    def test_latency_is_recorded_per_engine(self):
+        service = TTSService(FakeEngine(fake_synthesize), workers=1)
+        before = metrics.snapshot()["timings"].get("tts.fake.latency", {"count": 0})["count"]
+        asyncio.run(service.synthesize("hi"))
+        self.assertEqual(metrics.snapshot()["timings"]["tts.fake.latency"]["count"], before + 1)
+        self.assertEqual(service.codec, "mp3")
+        service.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
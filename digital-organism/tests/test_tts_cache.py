@@ -0,0 +1,106 @@
+import unittest
+import asyncio
+import sys
+import os
+import tempfile
+import time
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+from metrics import metrics
+from tts import TTSEngine, TTSService
+from tts_cache import AudioCache, cache_key
+
+class FakeEngine(TTSEngine):
+    name = "fake"
+    codec = "mp3"
+    voice = "fake"
+
+    def __init__(self, func):
+        self.func = func
+
+    def synthesize(self, text):
+        return self.func(text)
+
+class TestAudioCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_key_covers_text_voice_and_codec(self):
+        key = cache_key("hi", "gtts:en", "mp3")
+        self.assertEqual(key, cache_key("hi", "gtts:en", "mp3"))
+        self.assertNotEqual(key, cache_key("hi", "gtts:fr", "mp3"))
+        self.assertNotEqual(key, cache_key("hi", "gtts:en", "wav"))
+
+    def test_memory_tier_is_byte_bounded_lru(self):
+        cache = AudioCache(memory_bytes=10, disk_dir=None, disk_bytes=0)
+        cache.remember("a", b"aaaa")
+        cache.remember("b", b"bbbb")
+        cache.get("a")
+        cache.remember("c", b"cccc")
+        self.assertEqual(cache.get("a"), b"aaaa")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), b"cccc")
+
+    def test_disk_hit_survives_a_restart(self):
+        cache = AudioCache(memory_bytes=1024, disk_dir=self.tmp.name, disk_bytes=1024)
+        cache.store("k", b"audio")
+        fresh = AudioCache(memory_bytes=1024, disk_dir=self.tmp.name, disk_bytes=1024)
+        self.assertIsNone(fresh.get("k"))
+        before = metrics.snapshot()["counters"].get("tts.cache.disk_hits", 0)
+        self.assertEqual(fresh.load("k"), b"audio")
+        self.assertEqual(metrics.snapshot()["counters"]["tts.cache.disk_hits"], before + 1)
+        # Promoted into memory
+        self.assertEqual(fresh.get("k"), b"audio")
+
+    def test_disk_tier_evicts_least_recently_used(self):
+        cache = AudioCache(memory_bytes=0, disk_dir=self.tmp.name, disk_bytes=100)
+        cache.persist("old", b"x" * 40)
+        os.utime(os.path.join(self.tmp.name, "old.audio"), (time.time() - 60, time.time() - 60))
+        cache.persist("new", b"y" * 40)
+        cache.persist("newest", b"z" * 40)
+        self.assertIsNone(cache.load("old"))
+        self.assertEqual(cache.load("new"), b"y" * 40)
+        self.assertEqual(cache.load("newest"), b"z" * 40)
+
+    def test_miss_is_counted(self):
+        cache = AudioCache(memory_bytes=1024, disk_dir=self.tmp.name, disk_bytes=1024)
+        before = metrics.snapshot()["counters"].get("tts.cache.misses", 0)
+        self.assertIsNone(cache.load("missing"))
+        self.assertEqual(metrics.snapshot()["counters"]["tts.cache.misses"], before + 1)
+
+class TestCachedService(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+
+        def synthesize(text):
+            self.calls.append(text)
+            return text.encode("utf-8")
+
+        self.cache = AudioCache(memory_bytes=1024, disk_dir=None, disk_bytes=0)
+        self.service = TTSService(FakeEngine(synthesize), cache=self.cache, workers=1)
+        self.addCleanup(self.service.shutdown)
+
+    def test_repeat_is_served_from_cache(self):
+        async def run():
+            return [await self.service.synthesize("hello there") for _ in range(3)]
+
+        self.assertEqual(asyncio.run(run()), [b"hello there"] * 3)
+        self.assertEqual(self.calls, ["hello there"])
+
+    def test_prewarm_fills_the_chunks_replies_use(self):
+        reply = "Zzz... (The organism is sleeping)"
+        asyncio.run(self.service.prewarm([reply]))
+        warmed = len(self.calls)
+        self.assertGreater(warmed, 0)
+
+        async def stream():
+            return [audio async for _, audio, _ in self.service.synthesize_stream(reply)]
+
+        asyncio.run(stream())
+        self.assertEqual(len(self.calls), warmed)
+
+if __name__ == '__main__':
+    unittest.main()
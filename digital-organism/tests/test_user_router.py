@@ -0,0 +1,95 @@
+import unittest
+import sys
+import os
+from unittest.mock import patch
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+import json
+
+import httpx
+from fastapi.testclient import TestClient
+
+import user_router
+from hash_ring import HashRing
+
+NODES = ["http://a:8000", "http://b:8000", "http://c:8000"]
+
+class Stream(httpx.AsyncByteStream):
+    """A streamed reply, like a real replica's (bytes content would be pre-read)."""
+
+    def __init__(self, *chunks, error=None):
+        self.chunks = chunks
+        self.error = error
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+        if self.error is not None:
+            raise self.error
+
+class TestUserRouter(unittest.TestCase):
+    def setUp(self):
+        self.seen = []
+        self.down = set()
+        self.ring = HashRing(NODES)
+        self.upstream = httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
+        for target, value in (("ring", self.ring), ("client", self.upstream)):
+            patcher = patch.object(user_router, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = TestClient(user_router.app)
+
+    def handle(self, request):
+        node = f"{request.url.scheme}://{request.url.host}:{request.url.port}"
+        self.seen.append(node)
+        if node in self.down:
+            raise httpx.ConnectError("connection refused", request=request)
+        if request.url.path == "/broken":
+            # Dies after the first chunk of its reply
+            return httpx.Response(200, stream=Stream(b'{"partial":', error=httpx.ReadError("replica went away")))
+        body = json.dumps({"node": node, "path": request.url.path}).encode("utf-8")
+        return httpx.Response(200, headers={"content-type": "application/json"}, stream=Stream(body))
+
+    def test_user_sticks_to_its_replica(self):
+        owner = self.ring.get_node("alice")
+        for _ in range(3):
+            response = self.client.post("/chat", json={"user_id": "alice", "message": "hi"})
+            self.assertEqual(response.json(), {"node": owner, "path": "/chat"})
+        self.assertEqual(self.ring.loads, {node: 0 for node in NODES})
+
+    def test_overloaded_owner_spills_over(self):
+        owner = self.ring.get_node("alice")
+        # The owner is far past load_factor times the average
+        self.ring.loads[owner] = 10
+        response = self.client.get("/", params={"user_id": "alice"})
+        self.assertNotEqual(response.json()["node"], owner)
+        self.assertEqual(self.ring.loads[owner], 10)
+        self.assertEqual(sum(self.ring.loads.values()), 10)
+
+    def test_unreachable_replica_is_skipped_and_released(self):
+        owner = self.ring.get_node("alice")
+        self.down.add(owner)
+        response = self.client.get("/", params={"user_id": "alice"})
+        self.assertEqual(self.seen[0], owner)
+        self.assertNotEqual(response.json()["node"], owner)
+        self.assertEqual(self.ring.loads, {node: 0 for node in NODES})
+
+        self.down.update(NODES)
+        self.assertEqual(self.client.get("/", params={"user_id": "alice"}).status_code, 502)
+        self.assertEqual(self.ring.loads, {node: 0 for node in NODES})
+
+    def test_failed_stream_releases_its_replica(self):
+        with self.assertRaises(httpx.ReadError):
+            self.client.get("/broken", params={"user_id": "alice"})
+        self.assertEqual(self.ring.loads, {node: 0 for node in NODES})
+
+    def test_replica_admin(self):
+        self.client.post("/router/replicas", json={"url": "http://d:8000/"})
+        self.assertIn("http://d:8000", self.client.get("/router/replicas").json()["replicas"])
+        self.client.delete("/router/replicas", params={"url": "http://d:8000"})
+        self.assertEqual(self.client.get("/router/replicas").json()["replicas"], NODES)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import sys
+import os
+import math
+from array import array
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+from vad import Endpointer, RingBuffer, frame_rms
+
+RATE = 16000
+
+def tone(ms, amplitude=3000):
+    n = RATE * ms // 1000
+    return array("h", (int(amplitude * math.sin(2 * math.pi * 440 * i / RATE)) for i in range(n))).tobytes()
+
+def silence(ms):
+    return bytes(RATE * ms // 1000 * 2)
+
+def feed_in_chunks(endpointer, pcm, size=1234):
+    utterances = []
+    for offset in range(0, len(pcm), size):
+        utterances.extend(endpointer.feed(pcm[offset:offset + size]))
+    return utterances
+
+class TestRingBuffer(unittest.TestCase):
+    def test_keeps_the_newest_bytes(self):
+        ring = RingBuffer(8)
+        ring.write(b"abcde")
+        ring.write(b"fghij")
+        self.assertEqual(len(ring), 8)
+        self.assertEqual(ring.tail(8), b"cdefghij")
+        self.assertEqual(ring.tail(3), b"hij")
+        ring.write(b"0123456789xyz")
+        self.assertEqual(ring.tail(100), b"23456789xyz"[-8:])
+        ring.clear()
+        self.assertEqual(ring.tail(4), b"")
+
+class TestEndpointer(unittest.TestCase):
+    def test_rms(self):
+        self.assertEqual(frame_rms(silence(20)), 0.0)
+        self.assertAlmostEqual(frame_rms(tone(20)), 3000 / math.sqrt(2), delta=50)
+
+    def test_one_utterance_with_preroll(self):
+        endpointer = Endpointer(RATE, end_silence_ms=400, preroll_ms=100)
+        utterances = feed_in_chunks(endpointer, silence(500) + tone(600) + silence(600))
+        self.assertEqual(len(utterances), 1)
+        pcm, trailing = utterances[0]
+        # 100 ms pre-roll + 600 ms of speech + 400 ms of closing silence
+        self.assertEqual(len(pcm), RATE * 2 * 1100 // 1000)
+        self.assertAlmostEqual(trailing, 0.4)
+        self.assertFalse(endpointer.in_speech)
+
+    def test_silence_and_blips_are_ignored(self):
+        endpointer = Endpointer(RATE, start_ms=60)
+        self.assertEqual(feed_in_chunks(endpointer, silence(1000) + tone(20) + silence(1000)), [])
+
+    def test_long_speech_is_cut_at_the_limit(self):
+        endpointer = Endpointer(RATE, preroll_ms=0, max_utterance_seconds=1)
+        utterances = feed_in_chunks(endpointer, tone(2500))
+        self.assertEqual(len(utterances), 2)
+        self.assertEqual(len(utterances[0][0]), RATE * 2)
+
+    def test_flush_ends_the_utterance(self):
+        endpointer = Endpointer(RATE, preroll_ms=0)
+        self.assertEqual(feed_in_chunks(endpointer, tone(300)), [])
+        pcm, trailing = endpointer.flush()
+        self.assertEqual((len(pcm), trailing), (RATE * 2 * 300 // 1000, 0.0))
+        self.assertIsNone(endpointer.flush())
+
+    def test_unsupported_rate_is_rejected(self):
+        for rate in (0, -16000, 11025):
+            with self.assertRaises(ValueError):
+                Endpointer(rate)
+
+if __name__ == '__main__':
+    unittest.main()
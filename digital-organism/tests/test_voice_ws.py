@@ -0,0 +1,356 @@
+import unittest
+import asyncio
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import base64
+import json
+import tempfile
+import threading
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '../backend'))
+
+# Mock dependencies before import
+sys.modules['tinker'] = MagicMock()
+sys.modules['tinker.types'] = MagicMock()
+
+_tmpdir = tempfile.TemporaryDirectory()
+with patch.dict(os.environ, {"DATABASE_URL": f"sqlite:///{os.path.join(_tmpdir.name, 'organism.db')}"}):
+    with patch('brain.Brain._initialize_tinker'):
+        import main
+
+import voice_router
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from metrics import metrics
+from stt import STTEngine, STTService
+from test_vad import silence, tone
+from tts import TTSEngine, TTSService
+from voice_connection import CLOSE_OVERLOADED, VoiceConnection
+from voice_frames import FrameError, decode_audio_frame, encode_audio_frame
+
+class FakeEngine(TTSEngine):
+    name = "fake"
+    codec = "mp3"
+    voice = "fake"
+
+    def __init__(self, func):
+        self.func = func
+
+    def synthesize(self, text):
+        return self.func(text)
+
+# Set to hold synthesis of "Thanks..." sentences until released
+hold_thanks = threading.Event()
+hold_thanks.set()
+
+def fake_synthesize(text):
+    if text.startswith("Thanks"):
+        hold_thanks.wait(5)
+    return f"audio:{text}".encode("utf-8")
+
+class TestVoiceFrames(unittest.TestCase):
+    def test_round_trip(self):
+        frame = encode_audio_frame(b"\x00\x01mp3", message_id=7, seq=3, codec="mp3", final=True)
+        self.assertEqual(len(frame), 12 + 5)
+        header, audio = decode_audio_frame(frame)
+        self.assertEqual(header, {"codec": "mp3", "message_id": 7, "seq": 3, "final": True})
+        self.assertEqual(audio, b"\x00\x01mp3")
+        with self.assertRaises(FrameError):
+            decode_audio_frame(b"\x02" + frame[1:])
+
+class FakeSTT(STTEngine):
+    name = "fake"
+
+    def __init__(self):
+        super().__init__()
+        self.heard = []
+
+    def transcribe(self, pcm, sample_rate):
+        self.heard.append(len(pcm))
+        return "How are you?"
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+        self.closed_with = None
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+    async def send_bytes(self, data):
+        self.sent.append(data)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+class TestVoiceConnection(unittest.TestCase):
+    def test_queue_cap_closes_the_connection(self):
+        buffered = []
+        socket = FakeSocket()
+        conn = VoiceConnection(socket, on_buffered=buffered.append, max_queue_frames=2)
+
+        async def run():
+            for n in range(3):
+                conn.send_control({"type": "ping", "n": n})
+            await asyncio.wait_for(conn.writer(), 1)
+
+        asyncio.run(run())
+        self.assertTrue(conn.overloaded)
+        self.assertEqual(socket.closed_with, CLOSE_OVERLOADED)
+        conn.release()
+        self.assertEqual((conn.queued_frames, conn.queued_bytes, sum(buffered)), (0, 0, 0))
+
+    def test_dropped_turn_releases_its_bytes(self):
+        conn = VoiceConnection(FakeSocket())
+        conn.open_turn(1)
+        conn.send(1, {"type": "text", "content": "x" * 100})
+        self.assertGreater(conn.queued_bytes, 100)
+        conn.drop_turn(1)
+        self.assertEqual((conn.queued_frames, conn.queued_bytes), (0, 0))
+
+class TestVoiceWebSocket(unittest.TestCase):
+    """/ws/chat against the embedded SQLite backend with a fake synthesizer."""
+
+    def setUp(self):
+        self.client = TestClient(main.app)
+        main.brain.generate_tinker_response = MagicMock(
+            return_value="I am doing well today. Thanks for asking me that."
+        )
+        self.tts = TTSService(FakeEngine(fake_synthesize), workers=2, max_concurrency=2, timeout=5)
+        patcher = patch.object(voice_router, "tts_service", self.tts)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tts.shutdown)
+
+    def identify(self, ws):
+        ws.send_text(json.dumps({"type": "text", "content": "It's Vee"}))
+        self.assertEqual(ws.receive_json()["type"], "text")
+        while not self.receive_audio(ws)["final"]:
+            pass
+
+    def receive_audio(self, ws):
+        message = ws.receive()
+        if message.get("bytes") is not None:
+            header, audio = decode_audio_frame(message["bytes"])
+            return dict(header, audio=audio)
+        frame = json.loads(message["text"])
+        self.assertEqual(frame["type"], "audio")
+        return dict(frame, audio=base64.b64decode(frame["data"]))
+
+    def test_base64_audio_by_default(self):
+        with self.client.websocket_connect("/ws/chat") as ws:
+            self.identify(ws)
+            ws.send_text(json.dumps({"type": "text", "content": "How are you?"}))
+            text = ws.receive_json()
+            self.assertEqual(text["content"], "I am doing well today. Thanks for asking me that.")
+            frames = [self.receive_audio(ws), self.receive_audio(ws)]
+
+        self.assertEqual([f["seq"] for f in frames], [0, 1])
+        self.assertEqual([f["final"] for f in frames], [False, True])
+        self.assertEqual({f["message_id"] for f in frames}, {text["message_id"]})
+        self.assertEqual(frames[0]["audio"], b"audio:I am doing well today.")
+
+    def test_binary_audio_after_hello(self):
+        with self.client.websocket_connect("/ws/chat") as ws:
+            ws.send_text(json.dumps({"type": "hello", "audio": "binary"}))
+            self.assertEqual(ws.receive_json()["audio"], "binary")
+            self.identify(ws)
+            ws.send_text(json.dumps({"type": "text", "content": "How are you?"}))
+            ws.receive_json()
+            message = ws.receive()
+
+        header, audio = decode_audio_frame(message["bytes"])
+        self.assertEqual((header["seq"], header["codec"]), (0, "mp3"))
+        self.assertEqual(audio, b"audio:I am doing well today.")
+
+    def test_interrupt_aborts_the_turn(self):
+        self.addCleanup(hold_thanks.set)
+        with self.client.websocket_connect("/ws/chat") as ws:
+            self.identify(ws)
+            hold_thanks.clear()
+            ws.send_text(json.dumps({"type": "text", "request_id": "r1", "content": "How are you?"}))
+            text = ws.receive_json()
+            self.assertEqual(self.receive_audio(ws)["seq"], 0)
+            # Second sentence is stuck in synthesis; barge in
+            ws.send_text(json.dumps({"type": "interrupt"}))
+            self.assertEqual(ws.receive_json(), {"type": "aborted", "request_id": "r1", "message_id": text["message_id"]})
+
+            main.brain.generate_tinker_response.return_value = "Sure, go ahead and ask."
+            ws.send_text(json.dumps({"type": "text", "content": "Can I ask something?"}))
+            next_text = ws.receive_json()
+            frame = self.receive_audio(ws)
+
+        # Nothing from the aborted turn arrives after the abort
+        self.assertEqual(next_text["message_id"], text["message_id"] + 1)
+        self.assertEqual((frame["message_id"], frame["final"]), (next_text["message_id"], True))
+
+    def test_pipelined_requests_reply_in_order(self):
+        with self.client.websocket_connect("/ws/chat") as ws:
+            self.identify(ws)
+            hold_thanks.clear()
+            self.addCleanup(hold_thanks.set)
+            ws.send_text(json.dumps({"type": "text", "request_id": "a", "content": "How are you?"}))
+            ws.send_text(json.dumps({"type": "text", "request_id": "b", "content": "And now?"}))
+            first = ws.receive_json()
+            self.assertEqual(self.receive_audio(ws)["seq"], 0)
+            # "a" is stuck on its second sentence, yet control messages are still read
+            ws.send_text(json.dumps({"type": "hello", "request_id": "h"}))
+            self.assertEqual(ws.receive_json()["request_id"], "h")
+            hold_thanks.set()
+            frames = [self.receive_audio(ws)]
+            second = ws.receive_json()
+            while not frames[-1]["final"] or frames[-1]["message_id"] != second["message_id"]:
+                frames.append(self.receive_audio(ws))
+
+        self.assertEqual((first["request_id"], second["request_id"]), ("a", "b"))
+        self.assertEqual(frames[0]["message_id"], first["message_id"])
+        self.assertTrue(frames[0]["final"])
+        self.assertEqual({f["request_id"] for f in frames[1:]}, {"b"})
+
+    def test_inflight_limit(self):
+        with patch.object(voice_router, "WS_MAX_INFLIGHT", 1), self.client.websocket_connect("/ws/chat") as ws:
+            self.identify(ws)
+            hold_thanks.clear()
+            self.addCleanup(hold_thanks.set)
+            ws.send_text(json.dumps({"type": "text", "request_id": "a", "content": "How are you?"}))
+            ws.receive_json()
+            self.receive_audio(ws)
+            ws.send_text(json.dumps({"type": "text", "request_id": "b", "content": "Still there?"}))
+            error = ws.receive_json()
+            hold_thanks.set()
+
+        self.assertEqual((error["type"], error["request_id"], error["status"]), ("error", "b", 429))
+
+    def test_bad_text_message_keeps_the_connection(self):
+        with self.client.websocket_connect("/ws/chat") as ws:
+            ws.send_text(json.dumps({"type": "text", "request_id": "empty"}))
+            error = ws.receive_json()
+            ws.send_text(json.dumps(["not", "an", "object"]))
+            ws.send_text(json.dumps({"type": "ping", "request_id": "p"}))
+            self.assertEqual(ws.receive_json(), {"type": "pong", "request_id": "p"})
+
+        self.assertEqual((error["type"], error["request_id"], error["status"]), ("error", "empty", 400))
+
+    def test_sockets_do_not_share_a_lane(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        process_message = main.brain.process_message
+        timed_out = []
+
+        def process(session_id, message):
+            if message == "Take your time":
+                timed_out.append(not release.wait(5))
+            return process_message(session_id, message)
+
+        with patch.object(main.brain, "process_message", process), \
+                self.client.websocket_connect("/ws/chat") as slow, \
+                self.client.websocket_connect("/ws/chat") as fast:
+            slow.send_text(json.dumps({"type": "text", "request_id": "s", "content": "Take your time"}))
+            # Several turns past the lane depth, while the slow socket's call is stuck
+            for n in range(main.LANE_MAX_DEPTH + 1):
+                fast.send_text(json.dumps({"type": "text", "request_id": f"f{n}", "content": "It's Vee"}))
+                reply = fast.receive_json()
+                while not self.receive_audio(fast)["final"]:
+                    pass
+                self.assertEqual((reply["type"], reply["request_id"]), ("text", f"f{n}"))
+            release.set()
+            self.assertEqual(slow.receive_json()["request_id"], "s")
+        self.assertEqual(timed_out, [False])
+
+    def test_registry_tracks_connections(self):
+        before = len(voice_router.manager.active_connections)
+        with self.client.websocket_connect("/ws/chat") as ws:
+            ws.send_text(json.dumps({"type": "ping", "request_id": "p"}))
+            self.assertEqual(ws.receive_json(), {"type": "pong", "request_id": "p"})
+            self.assertEqual(len(voice_router.manager.active_connections), before + 1)
+        self.assertEqual(len(voice_router.manager.active_connections), before)
+        self.assertEqual(voice_router.manager.buffered_bytes, 0)
+
+    def test_idle_connection_is_closed(self):
+        with patch.object(voice_router, "WS_PING_INTERVAL", 0.05), \
+                patch.object(voice_router, "WS_IDLE_TIMEOUT", 0.2), \
+                self.client.websocket_connect("/ws/chat") as ws:
+            # Never answer the pings
+            with self.assertRaises(WebSocketDisconnect) as closed:
+                while True:
+                    self.assertEqual(ws.receive_json()["type"], "ping")
+        self.assertEqual(closed.exception.code, 1001)
+
+    def test_state_is_pushed_to_subscribers(self):
+        with self.client.websocket_connect("/ws/chat") as ws:
+            ws.send_text(json.dumps({"type": "subscribe", "request_id": "s", "channels": ["state"]}))
+            self.assertEqual(ws.receive_json(), {"type": "subscribed", "request_id": "s", "channels": ["state"]})
+            # The watch job reads the current state and publishes it
+            main.watch_bio_state()
+            state = ws.receive_json()
+            while state.get("adenosine") != 0.0 or state.get("sleep_mode"):
+                main.wake_organism(authorized=True)
+                state = ws.receive_json()
+
+        self.assertEqual(state, {"type": "state", "adenosine": 0.0, "sleep_mode": False, "mood": "awake"})
+        self.assertEqual(len(voice_router.state_broadcaster.subscribers), 0)
+
+    def test_spoken_turn(self):
+        stt = STTService(FakeSTT())
+        self.addCleanup(stt.shutdown)
+        speech = silence(300) + tone(800) + silence(1000)
+        before = metrics.snapshot()["timings"].get("voice.speech_to_first_audio", {"count": 0})["count"]
+        with patch.object(voice_router, "stt_service", stt), self.client.websocket_connect("/ws/chat") as ws:
+            self.identify(ws)
+            ws.send_text(json.dumps({"type": "audio_start", "request_id": "mic", "sample_rate": 16000}))
+            for offset in range(0, len(speech), 3200):
+                ws.send_bytes(speech[offset:offset + 3200])
+            self.assertEqual(ws.receive_json(), {"type": "speech_started", "request_id": "mic"})
+            transcript = ws.receive_json()
+            reply = ws.receive_json()
+            frames = [self.receive_audio(ws)]
+            while not frames[-1]["final"]:
+                frames.append(self.receive_audio(ws))
+
+        self.assertEqual((transcript["type"], transcript["content"], transcript["request_id"]),
+                         ("transcript", "How are you?", "mic"))
+        self.assertEqual((reply["type"], reply["message_id"]), ("text", transcript["message_id"]))
+        self.assertEqual(len(stt.engine.heard), 1)
+        self.assertEqual(metrics.snapshot()["timings"]["voice.speech_to_first_audio"]["count"], before + 1)
+
+    def test_voice_input_without_a_recognizer(self):
+        stt = STTService(FakeSTT())
+        self.addCleanup(stt.shutdown)
+        # As if neither faster-whisper nor vosk were installed
+        stt.engine = None
+        with patch.object(voice_router, "stt_service", stt), self.client.websocket_connect("/ws/chat") as ws:
+            ws.send_bytes(tone(100))
+            ws.send_bytes(tone(100))
+            ws.send_text(json.dumps({"type": "ping"}))
+            error = ws.receive_json()
+            # Refused once, not once per chunk
+            self.assertEqual(ws.receive_json()["type"], "pong")
+
+        self.assertEqual((error["type"], error["status"]), ("error", 501))
+
+    def test_bad_voice_input_is_refused_not_fatal(self):
+        stt = STTService(FakeSTT())
+        self.addCleanup(stt.shutdown)
+        stt.engine.sample_rates = (16000,)
+        with patch.object(voice_router, "stt_service", stt), self.client.websocket_connect("/ws/chat") as ws:
+            errors = []
+            for start in ({"sample_rate": 0}, {"sample_rate": "fast"}, {"sample_rate": 48000}):
+                ws.send_text(json.dumps(dict(start, type="audio_start", request_id="mic")))
+                errors.append(ws.receive_json())
+            # Audio after a refused start is dropped, not read at some other rate
+            ws.send_bytes(tone(800) + silence(1000))
+            ws.send_text(json.dumps({"type": "audio_start", "request_id": "mic2", "sample_rate": 16000}))
+            ws.send_text(json.dumps({"type": "audio", "data": "not base64!"}))
+            errors.append(ws.receive_json())
+            ws.send_text(json.dumps({"type": "ping", "request_id": "p"}))
+            self.assertEqual(ws.receive_json(), {"type": "pong", "request_id": "p"})
+
+        self.assertEqual([(e["type"], e["status"]) for e in errors], [("error", 400)] * 4)
+        self.assertIn("[16000]", errors[2]["content"])
+        self.assertEqual(errors[3]["request_id"], "mic2")
+        self.assertEqual(stt.engine.heard, [])
+
+if __name__ == '__main__':
+    unittest.main()